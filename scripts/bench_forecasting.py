@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+자산 예측 모델 백테스트 벤치마크
+
+실행 (프로젝트 루트에서):
+    python scripts/bench_forecasting.py --origins 12
+
+스냅샷 이력(net_worth_history)에서 최근 --origins개월의 각 월말을 예측 시점으로 삼아
+그 이전 데이터로만 모델을 적합하고(rolling origin), 이후 스냅샷과 비교한
+  - 적합 시간 (fit ms, 시점 평균)
+  - 예측 거리(3/6/12개월 이내)별 MAPE
+를 소유자(전체·개인)·모델별로 출력합니다. DB는 읽기만 하며 forecast_fits 캐시도 건드리지 않습니다.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from utils.db_handler import DB_PATH, get_asset_history, get_monthly_net_savings  # noqa: E402
+from utils.forecasting import MIN_POINTS, MODELS, fit_params, predict  # noqa: E402
+
+HORIZONS_MONTHS = (3, 6, 12)
+_DAYS_PER_MONTH = 365.25 / 12
+
+
+def _backtest(model: str, days: np.ndarray, values: np.ndarray, savings: pd.DataFrame, origins: list) -> tuple:
+    """각 시점에서 적합·예측 → (평균 fit ms, {horizon: MAPE})."""
+    fit_ms, errors = [], {h: [] for h in HORIZONS_MONTHS}
+    for origin in origins:
+        train = days <= origin
+        if train.sum() < MIN_POINTS:
+            continue
+        started = time.perf_counter()
+        params = fit_params(model, days[train], values[train], savings)
+        fit_ms.append((time.perf_counter() - started) * 1000)
+
+        last = np.flatnonzero(train)[-1]
+        ahead = (days - days[last]).astype(float) / _DAYS_PER_MONTH
+        test = ~train & (ahead <= max(HORIZONS_MONTHS)) & (values != 0)
+        if not test.any():
+            continue
+        preds = predict(model, params, days[last], float(values[last]), days[test])
+        pct = np.abs(preds - values[test]) / np.abs(values[test]) * 100
+        for h in HORIZONS_MONTHS:
+            errors[h].extend(pct[ahead[test] <= h])
+    mape = {h: (float(np.mean(e)) if e else None) for h, e in errors.items()}
+    return (float(np.mean(fit_ms)) if fit_ms else None), mape
+
+
+def main():
+    parser = argparse.ArgumentParser(description="자산 예측 모델 백테스트")
+    parser.add_argument("--origins", type=int, default=12, help="예측 시점 수 (최근 N개월의 월말)")
+    args = parser.parse_args()
+
+    if not os.path.exists(DB_PATH):
+        print(f"❌ DB가 없습니다: {DB_PATH}")
+        sys.exit(1)
+
+    household = get_asset_history('전체')
+    if household.empty:
+        print("❌ 자산 스냅샷 데이터가 없습니다.")
+        sys.exit(1)
+    histories = {'전체': household}
+    per_owner = get_asset_history()
+    for owner, group in per_owner.groupby('owner'):
+        histories[owner] = group
+
+    last_day = pd.to_datetime(household['snapshot_date']).max()
+    origins = [
+        np.datetime64((last_day - pd.DateOffset(months=i)).to_period('M').to_timestamp(how='end').date(), 'D')
+        for i in range(args.origins, 0, -1)
+    ]
+
+    header = " ".join(f"{f'MAPE≤{h}m':>9}" for h in HORIZONS_MONTHS)
+    print(f"origins={len(origins)} ({origins[0]} ~ {origins[-1]})")
+    print(f"{'소유자':<6} {'모델':<10} {'fit(ms)':>8} {header}")
+    for owner, history in histories.items():
+        history = history.sort_values('snapshot_date')
+        days = pd.to_datetime(history['snapshot_date']).values.astype('datetime64[D]')
+        values = history['net_worth'].to_numpy(dtype=float)
+        savings = get_monthly_net_savings(owner)
+        for model in MODELS:
+            fit_ms, mape = _backtest(model, days, values, savings, origins)
+            cells = " ".join(f"{mape[h]:>8.2f}%" if mape[h] is not None else f"{'-':>9}" for h in HORIZONS_MONTHS)
+            fit_cell = f"{fit_ms:>8.2f}" if fit_ms is not None else f"{'-':>8}"
+            print(f"{owner:<6} {model:<10} {fit_cell} {cells}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+LLM 경로 오프라인 처리량 벤치마크
+
+실행 (프로젝트 루트에서):
+    python scripts/bench_llm_pipeline.py --latency-ms 800 --ms-per-token 15 --concurrency 4
+
+INASSET_LLM_BACKEND=fake(utils.fake_llm)로 OpenAI 호출을 대체해 네트워크·비용 없이
+  - 카테고리 재분류 (map_categories, 최근 기간의 고유 description 쌍)
+  - 챗봇 (ask_gpt_finance, 캐시 미사용)
+  - 분석 요약 (generate_analysis_summary)
+의 호출 수·지연 시간(p50/p95)·처리량을 측정합니다. 지연 시간 인자로 실제 API 응답 속도를 흉내 내면
+LLM 대기 시간을 뺀 나머지 파이프라인(SQL·인코딩·프롬프트 구성) 비용을 재현 가능하게 비교할 수 있습니다.
+DB 데이터는 읽기만 하며, fake 백엔드 호출은 llm_usage_log에 기록하지 않습니다.
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("INASSET_LLM_BACKEND", "fake")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from utils.ai_agent import (  # noqa: E402
+    STANDARD_CATEGORIES, ask_gpt_finance, generate_analysis_summary, map_categories,
+)
+from utils.db_handler import (  # noqa: E402
+    DB_PATH, get_few_shot_examples, get_transactions_for_reclassification,
+)
+from utils.llm_client import get_openai_client  # noqa: E402
+
+BENCH_QUESTIONS = [
+    "이번 달 가장 높은 금액의 지출 항목은?",
+    "이번 달 예산 대비 지출 현황 알려줘",
+    "최근 3개월 식비 추이는?",
+    "순자산이 어떻게 변했어?",
+    "최근 6개월 교통비 알려줘",
+    "이번 달 어디서 돈을 제일 많이 썼어?",
+]
+
+# map_categories 1회 호출당 항목 수 (data_management 재분류와 같은 단위로 맞추기 위한 분할)
+_MAPPING_BATCH = 100
+
+
+def _percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * pct
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def _timed(fn, *args) -> float:
+    started = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - started) * 1000
+
+
+def _run(name: str, jobs: list, concurrency: int):
+    """jobs: [(fn, args), ...]를 concurrency개 스레드로 실행하고 결과 한 줄을 출력합니다."""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+        latencies = list(executor.map(lambda job: _timed(job[0], *job[1]), jobs))
+    wall = time.perf_counter() - started
+    if not latencies:
+        print(f"{name:<12} {'(데이터 없음)':>8}")
+        return
+    print(
+        f"{name:<12} {len(latencies):>6} {_percentile(latencies, 0.5):>9,.0f} "
+        f"{_percentile(latencies, 0.95):>9,.0f} {len(latencies) / wall:>9.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="오프라인 LLM 경로 벤치마크")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="가짜 LLM 호출당 고정 지연 (ms)")
+    parser.add_argument("--ms-per-token", type=float, default=0.0, help="가짜 LLM 출력 토큰당 지연 (ms)")
+    parser.add_argument("--concurrency", type=int, default=1, help="동시 실행 수")
+    parser.add_argument("--rounds", type=int, default=3, help="질문 목록 반복 횟수")
+    parser.add_argument("--recat-days", type=int, default=90, help="재분류 대상 기간 (일)")
+    args = parser.parse_args()
+
+    if not os.path.exists(DB_PATH):
+        print(f"❌ DB가 없습니다: {DB_PATH}")
+        sys.exit(1)
+
+    os.environ["INASSET_FAKE_LLM_LATENCY_MS"] = str(args.latency_ms)
+    os.environ["INASSET_FAKE_LLM_MS_PER_TOKEN"] = str(args.ms_per_token)
+    client = get_openai_client()
+
+    today = datetime.date.today()
+    pairs = get_transactions_for_reclassification(
+        str(today - datetime.timedelta(days=args.recat_days)), str(today)
+    )
+    expense = pairs[pairs['tx_type'] == '지출'][['description', 'category_1']].reset_index(drop=True)
+    few_shot = get_few_shot_examples(tx_type='지출')
+    mapping_jobs = [
+        (map_categories, (client, expense.iloc[i:i + _MAPPING_BATCH], few_shot, STANDARD_CATEGORIES))
+        for i in range(0, len(expense), _MAPPING_BATCH)
+    ]
+    chat_jobs = [
+        (ask_gpt_finance, (client, [{"role": "user", "content": q}], False))
+        for _ in range(args.rounds) for q in BENCH_QUESTIONS
+    ]
+    summary_jobs = [(generate_analysis_summary, (client, None, None)) for _ in range(args.rounds)]
+
+    print(f"backend={type(client).__name__} latency={args.latency_ms:.0f}ms "
+          f"+{args.ms_per_token:.0f}ms/token concurrency={args.concurrency}")
+    print(f"{'단계':<12} {'호출':>6} {'p50(ms)':>9} {'p95(ms)':>9} {'처리량/s':>9}")
+    _run("재분류", mapping_jobs, args.concurrency)
+    _run("챗봇", chat_jobs, args.concurrency)
+    _run("분석 요약", summary_jobs, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+챗봇 tool 결과 인코딩 토큰 비교 벤치마크
+
+실행 (프로젝트 루트에서):
+    python scripts/bench_result_encoding.py
+
+예시 질문에서 GPT가 주로 작성하는 SQL을 실제 DB에 실행하고,
+기존 형식(df.to_string + "1,234원")과 utils.result_encoder 형식의 토큰 수를 비교합니다.
+"""
+import os
+import sqlite3
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from utils.db_handler import DB_PATH  # noqa: E402
+from utils.result_encoder import encode_result  # noqa: E402
+from utils.token_utils import estimate_tokens  # noqa: E402
+
+_CATEGORY = "COALESCE(NULLIF(refined_category_1, ''), category_1)"
+
+# (질문, GPT가 작성하는 대표 SQL)
+BENCH_QUERIES = [
+    (
+        "이번 달 가장 높은 금액의 지출 항목은?",
+        f"""SELECT date, description, {_CATEGORY} AS category, amount, owner FROM transactions
+            WHERE tx_type = '지출' AND strftime('%Y-%m', date) = strftime('%Y-%m', 'now')
+            ORDER BY ABS(amount) DESC LIMIT 10""",
+    ),
+    (
+        "이번 달 가장 많이 쓴 카테고리는?",
+        f"""SELECT {_CATEGORY} AS category, SUM(ABS(amount)) AS total FROM transactions
+            WHERE tx_type = '지출' AND strftime('%Y-%m', date) = strftime('%Y-%m', 'now')
+            GROUP BY category ORDER BY total DESC""",
+    ),
+    (
+        "최근 3개월 간 불필요한 지출이 있나요?",
+        f"""SELECT date, description, {_CATEGORY} AS category, amount, source, owner FROM transactions
+            WHERE tx_type = '지출' AND date >= date('now', '-3 months')
+            ORDER BY date DESC""",
+    ),
+    (
+        "올해와 작년 식비를 소유자별로 비교해줘",
+        f"""SELECT strftime('%Y', date) AS year, owner, SUM(ABS(amount)) AS total FROM transactions
+            WHERE tx_type = '지출' AND {_CATEGORY} = '식비'
+              AND date >= date('now', 'start of year', '-1 year')
+            GROUP BY year, owner""",
+    ),
+]
+
+
+def _legacy_format(df: pd.DataFrame, max_rows: int = 200) -> str:
+    """변경 전 execute_query_safe 출력 형식."""
+    suffix = ""
+    if len(df) > max_rows:
+        df = df.head(max_rows)
+        suffix = f"\n(전체 결과 중 상위 {max_rows}건만 표시)"
+    df = df.copy()
+    for col in df.columns:
+        if col in ('amount', 'total') and pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = df[col].apply(lambda x: f"{int(x):,}원" if pd.notna(x) else "")
+    return df.to_string(index=False) + suffix
+
+
+def main():
+    if not os.path.exists(DB_PATH):
+        print(f"❌ DB가 없습니다: {DB_PATH}")
+        sys.exit(1)
+
+    total_before, total_after = 0, 0
+    print(f"{'질문':<28} {'행':>5} {'기존':>8} {'압축':>8} {'감소율':>7}")
+    with sqlite3.connect(DB_PATH) as conn:
+        for question, sql in BENCH_QUERIES:
+            df = pd.read_sql_query(sql, conn)
+            before = estimate_tokens(_legacy_format(df))
+            truncated = len(df) > 200
+            after = estimate_tokens(encode_result(df.head(200), truncated=truncated))
+            total_before += before
+            total_after += after
+            pct = (1 - after / before) * 100 if before else 0
+            print(f"{question[:26]:<28} {len(df):>5} {before:>8,} {after:>8,} {pct:>6.1f}%")
+
+    pct = (1 - total_after / total_before) * 100 if total_before else 0
+    print(f"{'합계':<28} {'':>5} {total_before:>8,} {total_after:>8,} {pct:>6.1f}%")
+
+
+if __name__ == "__main__":
+    main()
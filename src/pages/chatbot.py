@@ -1,7 +1,37 @@
 import streamlit as st
-import os
-from openai import OpenAI
-from utils.ai_agent import ask_gpt_finance
+from utils.ai_agent import ask_gpt_finance, get_sql_cache_stats
+from utils.llm_client import get_openai_client
+
+
+def _format_trace(trace: dict) -> str:
+    """ask_gpt_finance 실행 정보(캐시 적중, 쿼리 건수·소요 시간)를 한 줄 캡션으로 만듭니다."""
+    if trace.get('answer_cache') == 'hit':
+        return "⚡ 저장된 답변 (데이터 변경 없음)"
+    parts = []
+    queries = trace.get('queries', [])
+    if queries:
+        slowest = max(q['elapsed_ms'] for q in queries)
+        total = sum(q['elapsed_ms'] for q in queries)
+        parts.append(
+            f"🔎 쿼리 {len(queries)}건 | 최장 {slowest:,.0f}ms · 합계 {total:,.0f}ms "
+            f"· 실제 대기 {trace.get('query_wall_ms', 0):,.0f}ms"
+        )
+    if trace.get('sql_cache') == 'hit':
+        parts.append("♻️ 저장된 SQL 재사용")
+    prompt_tokens = trace.get('prompt_tokens', [])
+    if prompt_tokens:
+        history = trace.get('history') or {}
+        summary_note = (
+            f" (이전 {history['summarized_turns']}턴 요약)" if history.get('summarized_turns') else ""
+        )
+        cached_tokens = sum(trace.get('cached_tokens', []))
+        cache_note = f" · 캐시 {cached_tokens:,}" if cached_tokens else ""
+        parts.append(
+            f"📝 입력 토큰 {prompt_tokens[0]:,}/호출 · GPT {len(prompt_tokens)}회 합계 "
+            f"{sum(prompt_tokens):,}{cache_note}{summary_note}"
+        )
+    return " | ".join(parts)
+
 
 def render():
     # ChatGPT 스타일 CSS
@@ -144,20 +174,17 @@ def render():
     st.markdown('<div class="chat-header">AI 자산 컨설턴트</div>', unsafe_allow_html=True)
     st.markdown('<div class="chat-subtitle">자연어로 질문하고 AI가 데이터를 분석하여 답변합니다</div>', unsafe_allow_html=True)
     
-    # 1. OpenAI API 키 확인
-    api_key = os.getenv("OPENAI_API_KEY")
-    
-    if not api_key:
-        st.error("⚠️ OPENAI_API_KEY가 설정되지 않았습니다.")
-        st.info("`.env` 파일에 `OPENAI_API_KEY=sk-...` 형식으로 추가해주세요.")
-        st.stop()
-    
-    # 2. OpenAI 클라이언트 초기화
+    # 1~2. OpenAI 클라이언트 (프로세스 공용, 연결 재사용 / INASSET_LLM_BACKEND=fake면 오프라인 대체)
     try:
-        client = OpenAI(api_key=api_key)
+        client = get_openai_client()
     except Exception as e:
         st.error(f"OpenAI 클라이언트 초기화 실패: {str(e)}")
         st.stop()
+
+    if client is None:
+        st.error("⚠️ OPENAI_API_KEY가 설정되지 않았습니다.")
+        st.info("`.env` 파일에 `OPENAI_API_KEY=sk-...` 형식으로 추가해주세요.")
+        st.stop()
     
     # 3. 세션 상태 초기화
     if "messages" not in st.session_state:
@@ -192,6 +219,8 @@ def render():
         for message in st.session_state.messages:
             with st.chat_message(message["role"]):
                 st.markdown(message["content"])
+                if message.get("caption"):
+                    st.caption(message["caption"])
     
     # 6. 사용자 입력 처리
     user_input = None
@@ -220,16 +249,19 @@ def render():
             with st.spinner("🔍 AI가 데이터를 분석하고 있습니다..."):
                 try:
                     # AI가 필요한 쿼리를 직접 생성·실행 후 답변
-                    response = ask_gpt_finance(
+                    response, trace = ask_gpt_finance(
                         client=client,
                         chat_history=st.session_state.chat_history
                     )
+                    caption = _format_trace(trace)
                     
                     # 응답 표시
                     st.markdown(response)
+                    if caption:
+                        st.caption(caption)
                     
                     # 응답 저장
-                    st.session_state.messages.append({"role": "assistant", "content": response})
+                    st.session_state.messages.append({"role": "assistant", "content": response, "caption": caption})
                     st.session_state.chat_history.append({"role": "assistant", "content": response})
                     
                 except Exception as e:
@@ -251,6 +283,11 @@ def render():
                 unsafe_allow_html=True
             )
         
+        with col2:
+            sql_stats = get_sql_cache_stats()
+            if sql_stats['hits'] + sql_stats['misses'] > 0:
+                st.caption(f"♻️ SQL 캐시 {sql_stats['hits']}/{sql_stats['hits'] + sql_stats['misses']} 적중")
+        
         with col3:
             st.markdown('<div class="reset-button">', unsafe_allow_html=True)
             if st.button("🔄 대화 초기화", use_container_width=True, key="reset_chat"):
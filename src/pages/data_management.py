@@ -7,27 +7,33 @@ import io
 import shutil
 import time
 
-from openai import OpenAI
 
 from utils.db_handler import (
     save_transactions, save_asset_snapshot, clear_all_data,
     sync_categories_from_transactions, mark_file_processed, get_processed_filenames,
     has_transactions_in_range, get_few_shot_examples,
     get_transactions_for_reclassification, update_refined_categories,
+    get_llm_usage_summary, get_job, get_job_result, list_jobs,
+    get_owner_rules, save_owner_rules, reapply_owner_rules, get_data_version,
 )
 from utils.file_handler import (
     process_uploaded_zip, process_uploaded_excel,
     extract_snapshot_date, extract_date_range, scan_docs_folder, detect_owner_from_filename, DOCS_DIR,
 )
 from utils.ai_agent import map_categories, STANDARD_CATEGORIES, INCOME_CATEGORIES
+from utils.analysis_summary import schedule_analysis_summary
+from utils.analytics import refresh_spending_anomalies
+from utils.job_runner import submit_job
+from utils.llm_client import KRW_RATE, estimate_cost_usd, get_openai_client
 
 _OWNER_PASSWORDS = {'형준': '0979', '윤희': '1223'}
 UPDATED_DIR = os.path.join(DOCS_DIR, "updated")
 
-# GPT-4o 가격 기준 (2025)
-_INPUT_PRICE_PER_TOKEN  = 2.50  / 1_000_000   # USD
-_OUTPUT_PRICE_PER_TOKEN = 10.00 / 1_000_000   # USD
-_KRW_RATE = 1_350                              # 1 USD = 1,350 KRW
+# 소유자 규칙 대상 필드 표시명
+_OWNER_RULE_FIELDS = {'source': '결제수단', 'description': '내용'}
+
+# LLM 사용량 화면의 기능 표시명
+_CALL_TYPE_LABELS = {'chat': '챗봇', 'mapping': '카테고리 분류', 'summary': '분석 요약'}
 
 
 def _add_usage(a: dict, b: dict) -> dict:
@@ -45,8 +51,8 @@ def _show_usage(usage: dict):
         return
     inp  = usage.get('input_tokens', 0)
     out  = usage.get('output_tokens', 0)
-    usd  = inp * _INPUT_PRICE_PER_TOKEN + out * _OUTPUT_PRICE_PER_TOKEN
-    krw  = usd * _KRW_RATE
+    usd  = estimate_cost_usd(usage.get('model', 'gpt-4o'), inp, out)
+    krw  = usd * KRW_RATE
     st.caption(
         f"🤖 모델: **{usage.get('model', 'gpt-4o')}** | "
         f"입력 {inp:,} + 출력 {out:,} = {inp + out:,} 토큰 | "
@@ -54,6 +60,68 @@ def _show_usage(usage: dict):
     )
 
 
+def _show_owner_rules():
+    """소유자 귀속 규칙 편집 + 기존 거래에 일괄 재적용."""
+    st.caption("결제수단·내용에 패턴이 포함된 거래를 지정한 소유자로 귀속합니다. (대소문자 무시, 새로 저장하는 거래에 자동 적용)")
+    rules = get_owner_rules()
+    edited = st.data_editor(
+        rules.drop(columns=['id']),
+        column_config={
+            'field': st.column_config.SelectboxColumn(
+                '대상', options=list(_OWNER_RULE_FIELDS), required=True, default='source',
+                help=" / ".join(f"{k}: {v}" for k, v in _OWNER_RULE_FIELDS.items()),
+            ),
+            'pattern': st.column_config.TextColumn('패턴', required=True),
+            'owner': st.column_config.SelectboxColumn(
+                '소유자', options=sorted(set(_OWNER_PASSWORDS) | set(rules['owner'])), required=True,
+            ),
+            'priority': st.column_config.NumberColumn('우선순위', default=0, step=1),
+        },
+        num_rows="dynamic", hide_index=True, use_container_width=True, key="owner_rules_editor",
+    )
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("규칙 저장", use_container_width=True, key="owner_rules_save_btn"):
+            try:
+                save_owner_rules(edited)
+                st.success("규칙을 저장했습니다. 기존 거래에는 '기존 거래에 다시 적용'을 눌러 반영하세요.")
+            except ValueError as e:
+                st.error(f"저장 실패: {e}")
+    with col2:
+        if st.button("기존 거래에 다시 적용", use_container_width=True, key="owner_rules_apply_btn"):
+            with st.spinner("소유자 규칙 적용 중..."):
+                changed = reapply_owner_rules()
+                if changed:
+                    refresh_spending_anomalies()
+                    schedule_analysis_summary()
+            st.success(f"소유자가 바뀐 거래 {changed:,}건")
+
+
+def _show_llm_usage_ledger():
+    """llm_usage_log 원장 기준 월 × 기능별 호출 수·지연 시간(p50/p95)·토큰·비용 표."""
+    summary = get_llm_usage_summary(months=3)
+    if summary.empty:
+        st.caption("기록된 LLM 호출이 없습니다.")
+        return
+    view = pd.DataFrame({
+        '월': summary['month'],
+        '기능': summary['call_type'].map(_CALL_TYPE_LABELS).fillna(summary['call_type']),
+        '호출': summary['calls'],
+        '실패': summary['failures'],
+        '재시도': summary['retries'],
+        'p50 (ms)': summary['p50_ms'].round(0),
+        'p95 (ms)': summary['p95_ms'].round(0),
+        '입력 토큰': summary['prompt_tokens'],
+        '캐시 토큰': summary['cached_tokens'],
+        '출력 토큰': summary['completion_tokens'],
+        '비용 (원)': (summary['cost_usd'] * KRW_RATE).round(0),
+    })
+    st.dataframe(view, hide_index=True, use_container_width=True)
+    monthly = summary.groupby('month')['cost_usd'].sum().sort_index(ascending=False)
+    st.caption(" · ".join(f"{m}: ${usd:.2f} (약 ₩{usd * KRW_RATE:,.0f})" for m, usd in monthly.items()))
+
+
 def _two_months_before(d: datetime.date) -> datetime.date:
     """end_date 기준 2개월 전 같은 날을 반환합니다. (월말 초과 시 해당 월 말일로 보정)"""
     month = d.month - 2
@@ -185,6 +253,7 @@ def _run_batch(items: list, is_docs: bool = False) -> list:
         progress_bar.progress((i + 1) / len(sorted_items))
 
     sync_categories_from_transactions()
+    schedule_analysis_summary()
     progress_bar.empty()
     return results
 
@@ -221,7 +290,9 @@ def _parse_batch_only(items: list) -> list:
         parsed_data.append({
             'tx_df': tx_df,
             'asset_df': asset_df,
-            'item': {**item, 'start_date': str(actual_start), 'snapshot_date': str(actual_end)},
+            # 파일 객체는 파싱 후 필요 없으므로 제외 (작업 결과로 저장됨)
+            'item': {**{k: v for k, v in item.items() if k != 'file'},
+                     'start_date': str(actual_start), 'snapshot_date': str(actual_end)},
             'error': error,
         })
     return parsed_data
@@ -319,6 +390,8 @@ def _apply_mapping_and_save(parsed_data: list, mapping_df: pd.DataFrame) -> list
     )
 
     results = []
+    saved_ranges = []
+    base_version = get_data_version()  # 이상 지출 워터마크를 이어서 올려도 되는지 판단용
     for pd_item in parsed_data:
         item = pd_item['item']
         tx_df = pd_item['tx_df']
@@ -340,6 +413,7 @@ def _apply_mapping_and_save(parsed_data: list, mapping_df: pd.DataFrame) -> list
                     lambda r: mapping_dict.get((r['내용'], r['대분류']), r['대분류']), axis=1
                 )
             tx_count = save_transactions(tx_df, owner=owner, filename=filename)
+            saved_ranges.append((item['start_date'], item['snapshot_date']))
 
         asset_count = 0
         if asset_df is not None and not asset_df.empty:
@@ -353,6 +427,11 @@ def _apply_mapping_and_save(parsed_data: list, mapping_df: pd.DataFrame) -> list
         })
 
     sync_categories_from_transactions()
+    if saved_ranges:
+        refresh_spending_anomalies(
+            min(r[0] for r in saved_ranges), max(r[1] for r in saved_ranges), base_version=base_version
+        )
+    schedule_analysis_summary()  # 분석 페이지 요약을 백그라운드에서 미리 생성
     return results
 
 
@@ -423,6 +502,164 @@ def _build_recat_mapping_df(client, tx_df: pd.DataFrame) -> tuple:
     return result, total_usage
 
 
+def _finalize_docs_files(parsed_data: list):
+    """docs/ 파일 저장 후 처리 이력을 남기고 Updated/ 폴더로 이동합니다."""
+    processed = get_processed_filenames()
+    for pd_item in parsed_data:
+        it = pd_item['item']
+        if not pd_item.get('error'):
+            status = 'updated' if it['filename'] in processed else 'new'
+            mark_file_processed(it['filename'], it['owner'], it['snapshot_date'], status)
+            _move_to_updated(it['filename'])
+
+
+# ── 백그라운드 작업 (utils.job_runner) ──────────────────────
+# 작업 함수는 완료 시 session_state에 넣을 {키: 값} dict를 반환하고, 페이지가 폴링해 반영합니다.
+
+def _job_parse_and_map(ctx, client, items: list, section: str) -> dict:
+    """파일 파싱 + GPT 매핑. 매핑할 항목이 없으면 바로 저장까지 합니다. section: 'upload' | 'docs'"""
+    ctx.progress(0.05, f"파일 {len(items)}개 분석 중")
+    parsed_data = _parse_batch_only(items)
+    errors = [p['item']['filename'] for p in parsed_data if p['error']]
+    ctx.log(f"파싱 완료 {len(parsed_data) - len(errors)}개" + (f", 오류 {len(errors)}개" if errors else ""))
+
+    ctx.progress(0.4, "GPT가 카테고리를 분류하고 있습니다")
+    mapping_df, usage = _build_mapping_df(client, parsed_data)
+    ctx.log(f"고유 항목 {len(mapping_df)}개 분류 완료")
+
+    if mapping_df.empty:
+        ctx.progress(0.8, "DB 저장 중")
+        results = _apply_mapping_and_save(parsed_data, mapping_df)
+        if section == 'docs':
+            _finalize_docs_files(parsed_data)
+        return {f'{section}_results': results, f'{section}_pending': None}
+    return {
+        f'{section}_review': {'parsed_data': parsed_data, 'mapping_df': mapping_df, 'usage': usage},
+        f'{section}_pending': None,
+    }
+
+
+def _job_apply_and_save(ctx, parsed_data: list, mapping_df: pd.DataFrame, section: str) -> dict:
+    """검수된 매핑을 적용해 DB에 저장합니다."""
+    ctx.progress(0.1, f"파일 {len(parsed_data)}개 저장 중")
+    results = _apply_mapping_and_save(parsed_data, mapping_df)
+    if section == 'docs':
+        _finalize_docs_files(parsed_data)
+    ctx.log(f"저장 완료 {len(results)}개 파일")
+    return {f'{section}_results': results}
+
+
+def _job_recat_mapping(ctx, client, start_date: str, end_date: str, incremental: bool = True) -> dict:
+    """
+    기간 내 기존 거래의 고유 항목을 GPT로 재분류합니다.
+    incremental이면 마지막 재분류 이후 새로 생겼거나 거래가 바뀐 항목(is_stale)만 보냅니다.
+    """
+    ctx.progress(0.05, "DB에서 거래 내역을 조회하는 중")
+    tx_df = get_transactions_for_reclassification(start_date, end_date)
+    if tx_df.empty:
+        raise ValueError(f"해당 기간 (`{start_date}` ~ `{end_date}`)에 거래 내역이 없습니다.")
+    skipped_items = 0
+    if incremental:
+        stale = tx_df[tx_df['is_stale'] == 1]
+        skipped_items = len(tx_df) - len(stale)
+        ctx.log(f"변경 없는 항목 {skipped_items}개 건너뜀")
+        if stale.empty:
+            return {'recat_results': {
+                'updated_rows': 0, 'changed_items': 0, 'total_items': 0,
+                'skipped_items': skipped_items, 'usage': {},
+            }}
+        tx_df = stale
+    ctx.progress(0.2, f"{len(tx_df)}개 고유 항목을 GPT로 분류 중")
+    mapping_df, usage = _build_recat_mapping_df(client, tx_df)
+    ctx.log(f"고유 항목 {len(mapping_df)}개 분류 완료")
+    return {'recat_review': {
+        'mapping_df': mapping_df, 'start_date': start_date, 'end_date': end_date, 'usage': usage,
+        'skipped_items': skipped_items,
+    }}
+
+
+def _job_recat_apply(ctx, mapping_dict: dict, start_date: str, end_date: str, summary: dict) -> dict:
+    """검수된 재분류 결과를 DB에 반영합니다."""
+    ctx.progress(0.1, f"{len(mapping_dict)}개 항목 반영 중")
+    base_version = get_data_version()
+    updated_rows = update_refined_categories(mapping_dict, start_date, end_date)
+    if updated_rows:
+        refresh_spending_anomalies(start_date, end_date, base_version=base_version)
+        schedule_analysis_summary()
+    ctx.log(f"거래 {updated_rows}건 업데이트")
+    return {'recat_results': {**summary, 'updated_rows': updated_rows}}
+
+
+def _finish_job(state_key: str, job: dict | None):
+    """완료된 작업 결과를 session_state에 반영하고 작업 키를 정리합니다."""
+    st.session_state.pop(state_key, None)
+    if job is None:
+        return
+    if job['status'] == 'done':
+        for key, value in (get_job_result(job['job_id']) or {}).items():
+            if value is None:
+                st.session_state.pop(key, None)
+            else:
+                st.session_state[key] = value
+    else:
+        st.session_state[f'{state_key}_error'] = job['error'] or '알 수 없는 오류'
+
+
+def _render_job_poller(state_key: str):
+    """session_state[state_key]의 작업을 1초마다 폴링해 진행률을 보여주고, 끝나면 결과를 반영합니다."""
+    job_id = st.session_state[state_key]
+
+    @st.fragment(run_every=1.0)
+    def _poll():
+        job = get_job(job_id)
+        if job is None or job['status'] in ('done', 'failed'):
+            _finish_job(state_key, job)
+            st.rerun()
+        st.progress(job['progress'] or 0.0, text=f"{job['label']} — {job['message'] or ''}")
+        logs = (job['logs'] or '').strip().splitlines()
+        if logs:
+            st.caption(logs[-1])
+        st.caption("⏳ 백그라운드에서 실행 중입니다. 다른 작업을 하거나 탭을 닫아도 계속 진행됩니다.")
+
+    _poll()
+
+
+def _show_job_error(state_key: str):
+    error = st.session_state.pop(f'{state_key}_error', None)
+    if error:
+        st.error(f"작업 실패: {error}")
+
+
+_JOB_STATUS_LABELS = {'queued': '⏸ 대기', 'running': '▶ 실행 중', 'done': '✅ 완료', 'failed': '❌ 실패'}
+
+
+def _show_job_list():
+    """최근 백그라운드 작업 목록. 완료된 작업의 결과를 현재 화면으로 다시 불러올 수 있습니다."""
+    jobs = list_jobs(limit=10)
+    if jobs.empty:
+        st.caption("실행한 작업이 없습니다.")
+        return
+    view = pd.DataFrame({
+        '작업': jobs['label'],
+        '상태': jobs['status'].map(_JOB_STATUS_LABELS).fillna(jobs['status']),
+        '진행률': (jobs['progress'].fillna(0) * 100).round(0).astype(int).astype(str) + '%',
+        '요청 시각': jobs['created_at'],
+        '오류': jobs['error'].fillna(''),
+    })
+    st.dataframe(view, hide_index=True, use_container_width=True)
+
+    done = jobs[jobs['status'] == 'done']
+    if not done.empty:
+        options = dict(zip(done['label'] + ' (' + done['created_at'] + ')', done['job_id']))
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            picked = st.selectbox("완료된 작업 결과", list(options), key="job_reload_pick", label_visibility="collapsed")
+        with col2:
+            if st.button("결과 불러오기", use_container_width=True, key="job_reload_btn"):
+                _finish_job('_job_reload', get_job(options[picked]))
+                st.rerun()
+
+
 def render():
     st.markdown("""
         <style>
@@ -439,8 +676,7 @@ def render():
     st.markdown('<div class="page-header">데이터 관리 (ETL/EDA)</div>', unsafe_allow_html=True)
     st.markdown('<div class="page-subtitle">가계부 데이터 업로드 및 카테고리 관리</div>', unsafe_allow_html=True)
 
-    api_key = os.getenv("OPENAI_API_KEY")
-    client = OpenAI(api_key=api_key) if api_key else None
+    client = get_openai_client()  # 키가 없으면 None
 
     def _make_editor(df, cats, key):
         display = df.copy()
@@ -470,8 +706,13 @@ def render():
 
     upload_results = st.session_state.get('upload_results')
     upload_review = st.session_state.get('upload_review')
+    _show_job_error('upload_job')
+
+    if st.session_state.get('upload_job'):
+        # 파싱·GPT 분류·저장 작업 진행 중
+        _render_job_poller('upload_job')
 
-    if upload_results is not None:
+    elif upload_results is not None:
         # State 3: 저장 완료 결과 표시
         _show_results(upload_results)
         if st.button("↩ 새 업로드로 이동", key="reset_upload_btn", use_container_width=True):
@@ -513,8 +754,10 @@ def render():
         with col1:
             if st.button("검수 완료 & DB 저장", use_container_width=True):
                 combined_edited = pd.concat([edited_exp, edited_inc], ignore_index=True)
-                results = _apply_mapping_and_save(upload_review['parsed_data'], combined_edited)
-                st.session_state['upload_results'] = results
+                st.session_state['upload_job'] = submit_job(
+                    'upload_save', f"업로드 저장 ({len(upload_review['parsed_data'])}개 파일)",
+                    _job_apply_and_save, upload_review['parsed_data'], combined_edited, 'upload',
+                )
                 st.session_state.pop('upload_review', None)
                 st.rerun()
         with col2:
@@ -547,19 +790,12 @@ def render():
             processable = [it for it in items if it['owner']]
             if processable:
                 if st.button("카테고리 재분류 (GPT 기반)", use_container_width=True):
-                    with st.spinner("파일 분석 중..."):
-                        parsed_data = _parse_batch_only(processable)
-                    with st.spinner("GPT가 카테고리를 분류하고 있습니다..."):
-                        mapping_df, usage = _build_mapping_df(client, parsed_data)
-                    if mapping_df.empty:
-                        results = _apply_mapping_and_save(parsed_data, mapping_df)
-                        st.session_state['upload_results'] = results
-                    else:
-                        st.session_state['upload_review'] = {
-                            'parsed_data': parsed_data,
-                            'mapping_df': mapping_df,
-                            'usage': usage,
-                        }
+                    # 업로드 객체는 rerun 후 사라질 수 있으므로 바이트로 복사해 작업에 넘김
+                    job_items = [{**it, 'file': io.BytesIO(it['file'].getvalue())} for it in processable]
+                    st.session_state['upload_job'] = submit_job(
+                        'upload_mapping', f"업로드 분류 ({len(job_items)}개 파일)",
+                        _job_parse_and_map, client, job_items, 'upload',
+                    )
                     st.rerun()
 
     st.divider()
@@ -572,8 +808,12 @@ def render():
     docs_results = st.session_state.get('docs_results')
     docs_review = st.session_state.get('docs_review')
     docs_pending = st.session_state.get('docs_pending')
+    _show_job_error('docs_job')
+
+    if st.session_state.get('docs_job'):
+        _render_job_poller('docs_job')
 
-    if docs_results is not None:
+    elif docs_results is not None:
         _show_results(docs_results)
         if st.button("↩ 다시 확인", key="docs_reset_btn", use_container_width=True):
             st.session_state.pop('docs_results', None)
@@ -614,15 +854,10 @@ def render():
         with col1:
             if st.button("검수 완료 & DB 저장", use_container_width=True, key="docs_rev_save_btn"):
                 combined_edited = pd.concat([edited_exp, edited_inc], ignore_index=True)
-                results = _apply_mapping_and_save(docs_review['parsed_data'], combined_edited)
-                processed = get_processed_filenames()
-                for pd_item in docs_review['parsed_data']:
-                    it = pd_item['item']
-                    if not pd_item.get('error'):
-                        status = 'updated' if it['filename'] in processed else 'new'
-                        mark_file_processed(it['filename'], it['owner'], it['snapshot_date'], status)
-                        _move_to_updated(it['filename'])
-                st.session_state['docs_results'] = results
+                st.session_state['docs_job'] = submit_job(
+                    'docs_save', f"메일 파일 저장 ({len(docs_review['parsed_data'])}개 파일)",
+                    _job_apply_and_save, docs_review['parsed_data'], combined_edited, 'docs',
+                )
                 st.session_state.pop('docs_review', None)
                 st.rerun()
         with col2:
@@ -661,31 +896,14 @@ def render():
                 processable = [it for it in docs_pending if it['owner']]
                 if processable:
                     if st.button("카테고리 재분류 (GPT 기반)", key="docs_batch_btn", use_container_width=True):
-                        with st.spinner("파일 분석 중..."):
-                            items_with_files = []
-                            for it in processable:
-                                with open(os.path.join(DOCS_DIR, it['filename']), 'rb') as f:
-                                    items_with_files.append({**it, 'file': io.BytesIO(f.read())})
-                            parsed_data = _parse_batch_only(items_with_files)
-                        with st.spinner("GPT가 카테고리를 분류하고 있습니다..."):
-                            mapping_df, usage = _build_mapping_df(client, parsed_data)
-                        if mapping_df.empty:
-                            results = _apply_mapping_and_save(parsed_data, mapping_df)
-                            processed = get_processed_filenames()
-                            for pd_item in parsed_data:
-                                it = pd_item['item']
-                                if not pd_item.get('error'):
-                                    status = 'updated' if it['filename'] in processed else 'new'
-                                    mark_file_processed(it['filename'], it['owner'], it['snapshot_date'], status)
-                                    _move_to_updated(it['filename'])
-                            st.session_state['docs_results'] = results
-                        else:
-                            st.session_state['docs_review'] = {
-                                'parsed_data': parsed_data,
-                                'mapping_df': mapping_df,
-                                'usage': usage,
-                            }
-                        st.session_state.pop('docs_pending', None)
+                        items_with_files = []
+                        for it in processable:
+                            with open(os.path.join(DOCS_DIR, it['filename']), 'rb') as f:
+                                items_with_files.append({**it, 'file': io.BytesIO(f.read())})
+                        st.session_state['docs_job'] = submit_job(
+                            'docs_mapping', f"메일 파일 분류 ({len(items_with_files)}개 파일)",
+                            _job_parse_and_map, client, items_with_files, 'docs',
+                        )
                         st.rerun()
 
     st.divider()
@@ -696,12 +914,18 @@ def render():
 
     recat_results = st.session_state.get('recat_results')
     recat_review = st.session_state.get('recat_review')
+    _show_job_error('recat_job')
+
+    if st.session_state.get('recat_job'):
+        _render_job_poller('recat_job')
 
-    if recat_results is not None:
+    elif recat_results is not None:
         # State C: 완료
         col_m1, col_m2 = st.columns(2)
         col_m1.metric("업데이트된 거래 건수", f"{recat_results['updated_rows']:,}건")
         col_m2.metric("변경된 항목 수", f"{recat_results['changed_items']}개 / {recat_results['total_items']}개")
+        if recat_results.get('skipped_items'):
+            st.caption(f"⏭ 지난 재분류 이후 거래가 바뀌지 않은 {recat_results['skipped_items']}개 항목은 건너뛰었습니다.")
         _show_usage(recat_results.get('usage', {}))
         if st.button("↩ 다시 실행", key="recat_reset_btn", use_container_width=True):
             st.session_state.pop('recat_results', None)
@@ -723,6 +947,8 @@ def render():
             f"지출 **{len(exp_df)}개** · 수입 **{len(inc_df)}개** 고유 항목 / GPT 변경 제안 **{changed_count}개**  \n"
             f"'새 분류' 열을 직접 수정한 후 저장하세요."
         )
+        if recat_review.get('skipped_items'):
+            st.caption(f"⏭ 변경 없는 {recat_review['skipped_items']}개 항목은 제외되었습니다. (전체 재분류 시 포함)")
         _show_usage(recat_review.get('usage', {}))
 
         def _make_recat_editor(df, cats, key):
@@ -769,14 +995,14 @@ def render():
                     (row['description'], row['category_1']): row['refined_category_1']
                     for _, row in combined_edited.iterrows()
                 }
-                updated_rows = update_refined_categories(mapping_dict, start_date_str, end_date_str)
                 changed_items = int((combined_edited['refined_category_1'] != combined_edited['current_refined']).sum())
-                st.session_state['recat_results'] = {
-                    'updated_rows': updated_rows,
-                    'changed_items': changed_items,
-                    'total_items': len(combined_edited),
-                    'usage': recat_review.get('usage', {}),
-                }
+                st.session_state['recat_job'] = submit_job(
+                    'recat_apply', f"재분류 반영 ({start_date_str} ~ {end_date_str})",
+                    _job_recat_apply, mapping_dict, start_date_str, end_date_str,
+                    {'changed_items': changed_items, 'total_items': len(combined_edited),
+                     'skipped_items': recat_review.get('skipped_items', 0),
+                     'usage': recat_review.get('usage', {})},
+                )
                 st.session_state.pop('recat_review', None)
                 st.rerun()
         with col2:
@@ -796,6 +1022,11 @@ def render():
             with col2:
                 end_date = st.date_input("종료일", value=today, key="recat_end_date")
 
+            full_recat = st.checkbox(
+                "전체 재분류 (변경 없는 항목 포함)", value=False, key="recat_full",
+                help="기본은 지난 재분류 이후 새로 생겼거나 거래가 바뀐 항목만 GPT로 분류합니다.",
+            )
+
             if not client:
                 st.warning("⚠️ OPENAI_API_KEY가 설정되지 않아 GPT 분류 없이 원본 카테고리가 표시됩니다.")
 
@@ -803,21 +1034,14 @@ def render():
                 if start_date > end_date:
                     st.error("시작일이 종료일보다 늦을 수 없습니다.")
                 else:
-                    with st.spinner("DB에서 거래 내역을 조회하는 중..."):
-                        tx_df = get_transactions_for_reclassification(str(start_date), str(end_date))
-
-                    if tx_df.empty:
-                        st.warning(f"해당 기간 (`{start_date}` ~ `{end_date}`)에 거래 내역이 없습니다.")
-                    else:
-                        with st.spinner(f"{len(tx_df)}개 고유 항목을 GPT로 분류 중..."):
-                            mapping_df, usage = _build_recat_mapping_df(client, tx_df)
-                        st.session_state['recat_review'] = {
-                            'mapping_df': mapping_df,
-                            'start_date': str(start_date),
-                            'end_date': str(end_date),
-                            'usage': usage,
-                        }
-                        st.rerun()
+                    st.session_state['recat_job'] = submit_job(
+                        'recat_mapping', f"{'전체 ' if full_recat else ''}재분류 ({start_date} ~ {end_date})",
+                        _job_recat_mapping, client, str(start_date), str(end_date), not full_recat,
+                    )
+                    st.rerun()
+
+    with st.expander("🗂 백그라운드 작업 (최근 10개)"):
+        _show_job_list()
 
     st.divider()
 
@@ -847,7 +1071,8 @@ def render():
                     try:
                         clear_all_data()
                         for _k in ['upload_results', 'docs_results', 'docs_pending', '_upload_filenames',
-                                   'recat_results', 'recat_review', 'docs_review']:
+                                   'recat_results', 'recat_review', 'docs_review',
+                                   'upload_job', 'docs_job', 'recat_job']:
                             st.session_state.pop(_k, None)
                         st.success("초기화 완료! 잠시 후 새로고침 됩니다.")
                         time.sleep(1.5)
@@ -862,4 +1087,10 @@ def render():
         if st.button("DB 데이터 초기화", type="primary", use_container_width=True):
             open_delete_modal()
 
+        with st.expander("👤 소유자 귀속 규칙"):
+            _show_owner_rules()
+
+        with st.expander("🤖 LLM 사용량 · 지연 시간 (최근 3개월)"):
+            _show_llm_usage_ledger()
+
     st.markdown("<div style='margin-bottom: 40px;'></div>", unsafe_allow_html=True)
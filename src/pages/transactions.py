@@ -2,7 +2,62 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
-from utils.db_handler import get_analyzed_transactions
+from utils.db_handler import (
+    get_owner_monthly_flows, get_transaction_facets, get_transaction_page, get_transaction_totals,
+)
+
+# 상세 내역 페이지당 행 수 (고정)
+DETAIL_PAGE_SIZE = 50
+
+_KPI_COLUMNS = ['income', 'expense', 'expense_ex', 'fixed', 'variable', 'variable_ex']
+_EMPTY_KPI = pd.Series(0.0, index=_KPI_COLUMNS)
+
+
+def _owner_kpis(flows: pd.DataFrame, current_ym: str) -> dict:
+    """
+    소유자 × 월 합계 → {owner: (이번 달 합계, 과거 동기간 월평균)}. '전체'는 소유자 합산입니다.
+    평균의 분모는 12로 고정하지 않고 실제 데이터가 있는 개월 수를 씁니다. (데이터가 3개월치뿐일 수도 있으므로)
+    """
+    total = flows.groupby('year_month', as_index=False)[_KPI_COLUMNS].sum().assign(owner='전체')
+    flows = pd.concat([flows, total], ignore_index=True)
+    is_current = flows['year_month'] == current_ym
+    current = flows[is_current].groupby('owner')[_KPI_COLUMNS].sum()
+    past = flows[~is_current].groupby('owner')
+    average = past[_KPI_COLUMNS].sum().div(past['year_month'].nunique().clip(lower=1), axis=0)
+    return {
+        owner: (
+            current.loc[owner] if owner in current.index else _EMPTY_KPI,
+            average.loc[owner] if owner in average.index else _EMPTY_KPI,
+        )
+        for owner in flows['owner'].unique()
+    }
+
+
+def _detail_page(owner: str, filters: dict) -> tuple:
+    """
+    상세 내역의 현재 페이지를 가져옵니다. session_state의 커서 스택 마지막 원소가 현재 페이지의
+    시작 커서(첫 페이지는 None)이며, 필터가 바뀌면 첫 페이지로 돌아갑니다.
+
+    Returns:
+        (page_df, stack_key, next_after)
+    """
+    stack_key, filter_key = f"tx_page_cursors_{owner}", f"tx_page_filters_{owner}"
+    signature = repr(sorted(filters.items()))
+    if st.session_state.get(filter_key) != signature or stack_key not in st.session_state:
+        st.session_state[filter_key] = signature
+        st.session_state[stack_key] = [None]
+    page_df, next_after = get_transaction_page(filters, st.session_state[stack_key][-1], DETAIL_PAGE_SIZE)
+    return page_df, stack_key, next_after
+
+
+def _next_detail_page(stack_key: str, after: tuple):
+    st.session_state[stack_key].append(after)
+
+
+def _prev_detail_page(stack_key: str):
+    if len(st.session_state[stack_key]) > 1:
+        st.session_state[stack_key].pop()
+
 
 def render():
     st.markdown("""
@@ -20,31 +75,24 @@ def render():
     st.markdown('<div class="page-header">수입/지출 현황</div>', unsafe_allow_html=True)
     st.markdown('<div class="page-subtitle">표준화된 카테고리로 정리된 상세 내역입니다.</div>', unsafe_allow_html=True)
 
-    df_analyzed = get_analyzed_transactions()
+    # 선택기·필터 목록은 일별 롤업의 조합만 읽고, 거래 원본은 상세 내역의 현재 페이지만 조회
+    facets = get_transaction_facets()
 
-    if df_analyzed.empty:
+    if facets.empty:
         st.info("데이터가 없습니다. 먼저 [1. 가계부 업로드] 메뉴에서 엑셀 파일을 저장해주세요.")
     else:
-        # 1. 날짜 변환 및 전처리
-        df_analyzed_dt = df_analyzed.copy()
-        df_analyzed_dt['date'] = pd.to_datetime(df_analyzed_dt['date'])
-
-        # owner 변경 적용
-        mask_yunhee = df_analyzed_dt['source'].str.contains('Mega|페이코', case=False, na=False)
-        if mask_yunhee.any():
-            df_analyzed_dt.loc[mask_yunhee, 'owner'] = '윤희'
+        # 1. 연/월 분리
+        facets['year'] = facets['year_month'].str[:4].astype(int)
+        facets['month'] = facets['year_month'].str[5:7].astype(int)
 
         # 2. 연/월 선택기 (타이틀 바로 아래)
-        available_years = sorted(df_analyzed_dt['date'].dt.year.unique(), reverse=True)
+        available_years = sorted(facets['year'].unique(), reverse=True)
 
         _, sel_col1, sel_col2, _ = st.columns([2, 1, 1, 2])
         with sel_col1:
             sel_year = st.selectbox("연도", available_years, index=0, key="tx_year")
 
-        available_months = sorted(
-            df_analyzed_dt[df_analyzed_dt['date'].dt.year == sel_year]['date'].dt.month.unique(),
-            reverse=True
-        )
+        available_months = sorted(facets.loc[facets['year'] == sel_year, 'month'].unique(), reverse=True)
         with sel_col2:
             sel_month = st.selectbox("월", available_months, index=0, key="tx_month",
                                      format_func=lambda m: f"{m}월")
@@ -52,78 +100,48 @@ def render():
         # 3. 선택 연월 기준 날짜 계산
         this_month_start = datetime(sel_year, sel_month, 1)
         # 해당 월의 데이터 최대 날짜 (미완성 월이면 실제 최대 날짜, 완료 월이면 말일)
-        month_data = df_analyzed_dt[
-            (df_analyzed_dt['date'].dt.year == sel_year) &
-            (df_analyzed_dt['date'].dt.month == sel_month)
-        ]
-        latest_date = month_data['date'].max() if not month_data.empty else this_month_start
+        month_data = facets[(facets['year'] == sel_year) & (facets['month'] == sel_month)]
+        latest_date = pd.Timestamp(month_data['last_date'].max() if not month_data.empty else this_month_start)
         current_day = latest_date.day
 
         # 비교 기준: 선택 월 기준 과거 1년 (선택 월 제외)
         one_year_ago = this_month_start - relativedelta(years=1)
 
+        # 모든 탭의 KPI를 소유자 × 월 롤업 한 번으로 집계
+        # 이번 달(1일~latest_date)과 과거 1년 동기간(매월 1일~current_day일)을 같은 쿼리로 가져옴
+        flows = get_owner_monthly_flows(one_year_ago.strftime('%Y-%m-%d'), latest_date.strftime('%Y-%m-%d'), current_day)
+        kpis = _owner_kpis(flows, this_month_start.strftime('%Y-%m'))
+
         st.subheader("총 내역")
 
         # 탭 설정
-        owners = ['전체'] + sorted(df_analyzed_dt['owner'].unique().tolist())
+        owners = ['전체'] + sorted(facets['owner'].dropna().unique().tolist())
         tabs = st.tabs([f"{owner}님" if owner != '전체' else '전체' for owner in owners])
         
         for idx, owner in enumerate(owners):
             with tabs[idx]:
-                # Owner 필터링
+                # Owner 필터링 (필터 목록용 조합)
                 if owner == '전체':
-                    display_owner_df = df_analyzed_dt.copy()
+                    owner_facets = facets
                 else:
-                    display_owner_df = df_analyzed_dt[df_analyzed_dt['owner'] == owner]
+                    owner_facets = facets[facets['owner'] == owner]
                 
-                # --- [A] 이번 달 데이터 집계 ---
-                current_df = display_owner_df[
-                    (display_owner_df['date'] >= this_month_start) &
-                    (display_owner_df['date'] <= latest_date)
-                ]
-
+                # --- [A] 이번 달 / [B] 최근 1년 동기간 평균 (탭 진입 전 한 번에 집계한 값 사용) ---
                 exclude_key = f"exclude_yebibee_{owner}"
                 exclude_yebibee = st.session_state.get(exclude_key, False)
+                current_kpi, average_kpi = kpis.get(owner, (_EMPTY_KPI, _EMPTY_KPI))
+                expense_col = 'expense_ex' if exclude_yebibee else 'expense'
+                variable_col = 'variable_ex' if exclude_yebibee else 'variable'
 
-                _cur_expense_df = current_df[current_df['amount'] < 0]
-                _cur_variable_df = current_df[current_df['expense_type'] == '변동 지출']
-                if exclude_yebibee:
-                    _cur_expense_df = _cur_expense_df[_cur_expense_df['category_1'] != '예비비']
-                    _cur_variable_df = _cur_variable_df[_cur_variable_df['category_1'] != '예비비']
-
-                cur_income = current_df[current_df['amount'] > 0]['amount'].sum()
-                cur_expense = _cur_expense_df['amount'].sum()
-                cur_fixed = current_df[current_df['expense_type'] == '고정 지출']['amount'].sum()
-                cur_variable = _cur_variable_df['amount'].sum()
-
-                # --- [B] 최근 1년 동기간 평균 계산 (핵심 로직 변경) ---
-                # 1. 기간 필터: 1년 전 ~ 이번 달 시작 전까지
-                past_year_df = display_owner_df[
-                    (display_owner_df['date'] >= one_year_ago) & 
-                    (display_owner_df['date'] < this_month_start)
-                ]
-
-                # 2. 일자 필터: 매월 1일 ~ 현재 일수(current_day) 까지만 포함
-                # 예: 오늘이 10일이면, 작년 5월달 데이터 중에서도 1일~10일 데이터만 살림
-                past_year_filtered = past_year_df[past_year_df['date'].dt.day <= current_day]
-
-                # 3. 평균 계산을 위한 분모(개월 수) 계산
-                # 12로 고정하지 않고, 실제 데이터가 있는 월의 개수를 셉니다 (데이터가 3개월치 밖에 없을 수도 있으므로)
-                unique_months = past_year_filtered['date'].dt.to_period('M').nunique()
-                if unique_months == 0:
-                    unique_months = 1 # 0으로 나누기 방지
-
-                # 4. 항목별 평균 산출 (총합 / 개월 수)
-                _avg_expense_df = past_year_filtered[past_year_filtered['amount'] < 0]
-                _avg_variable_df = past_year_filtered[past_year_filtered['expense_type'] == '변동 지출']
-                if exclude_yebibee:
-                    _avg_expense_df = _avg_expense_df[_avg_expense_df['category_1'] != '예비비']
-                    _avg_variable_df = _avg_variable_df[_avg_variable_df['category_1'] != '예비비']
-
-                avg_income = past_year_filtered[past_year_filtered['amount'] > 0]['amount'].sum() / unique_months
-                avg_expense = _avg_expense_df['amount'].sum() / unique_months
-                avg_fixed = past_year_filtered[past_year_filtered['expense_type'] == '고정 지출']['amount'].sum() / unique_months
-                avg_variable = _avg_variable_df['amount'].sum() / unique_months
+                cur_income = current_kpi['income']
+                cur_expense = current_kpi[expense_col]
+                cur_fixed = current_kpi['fixed']
+                cur_variable = current_kpi[variable_col]
+
+                avg_income = average_kpi['income']
+                avg_expense = average_kpi[expense_col]
+                avg_fixed = average_kpi['fixed']
+                avg_variable = average_kpi[variable_col]
 
                 # --- [C] 델타 계산 함수 (기존 유지) ---
                 def calc_delta(current, average):
@@ -184,7 +202,7 @@ def render():
                 
                 with f_col1:
                     # 카테고리 선택 (다중 선택 가능)
-                    unique_tx = sorted(display_owner_df['tx_type'].dropna().unique())
+                    unique_tx = sorted(owner_facets['tx_type'].dropna().unique())
                     selected_tx = st.multiselect(
                         "수입/지출", 
                         unique_tx,
@@ -194,7 +212,7 @@ def render():
 
                 with f_col2:
                     # 카테고리 선택 (다중 선택 가능)
-                    unique_cats = sorted(display_owner_df['category_1'].dropna().unique())
+                    unique_cats = sorted(owner_facets['category'].dropna().unique())
                     selected_cats = st.multiselect(
                         "대분류", 
                         unique_cats,
@@ -204,7 +222,7 @@ def render():
                 
                 with f_col3:
                     # 지출 유형 선택 (고정/변동)
-                    unique_types = sorted(display_owner_df['expense_type'].dropna().unique())
+                    unique_types = sorted(owner_facets['expense_type'].dropna().unique())
                     selected_types = st.multiselect(
                         "지출 유형",
                         unique_types,
@@ -220,49 +238,29 @@ def render():
                         key=f"search_input_{owner}"
                     )
 
-                # 2. 필터링 로직 적용
-                filtered_df = display_owner_df.copy()
-
-                # [Step 1] 기간 필터 적용 (캘린더 기준)
+                # 2. 필터 → SQL 조건 (기간은 캘린더 기준)
+                filters = {
+                    'owner': owner,
+                    'tx_types': selected_tx,
+                    'categories': selected_cats,
+                    'expense_types': selected_types,
+                    'search': search_text.strip() or None,
+                }
                 if selected_period == "이번 주":
-                    # latest_date가 포함된 주의 월요일 계산
-                    # weekday(): 월(0) ~ 일(6)
-                    days_to_subtract = latest_date.weekday() 
-                    start_of_week = latest_date - pd.Timedelta(days=days_to_subtract)
-                    # 시간까지 00:00:00으로 초기화하고 싶다면:
-                    start_of_week = start_of_week.replace(hour=0, minute=0, second=0)
-                    
-                    filtered_df = filtered_df[filtered_df['date'] >= start_of_week]
+                    # latest_date가 포함된 주의 월요일부터 (weekday(): 월(0) ~ 일(6))
+                    start_of_week = latest_date - pd.Timedelta(days=latest_date.weekday())
+                    filters['start_date'] = start_of_week.strftime('%Y-%m-%d')
 
                 elif selected_period == "선택 월":
-                    start_of_month = datetime(sel_year, sel_month, 1)
-                    filtered_df = filtered_df[
-                        (filtered_df['date'] >= start_of_month) &
-                        (filtered_df['date'] <= latest_date)
-                    ]
-
-                # [Step 2] 카테고리/유형/검색어 필터 적용
-                if selected_tx:
-                    filtered_df = filtered_df[filtered_df['tx_type'].isin(selected_tx)]
-
-                if selected_cats:
-                    filtered_df = filtered_df[filtered_df['category_1'].isin(selected_cats)]
-                
-                if selected_types:
-                    filtered_df = filtered_df[filtered_df['expense_type'].isin(selected_types)]
-                    
-                if search_text:
-                    # 대소문자 구분 없이 검색 (case=False), NaN 값은 제외 (na=False)
-                    filtered_df = filtered_df[filtered_df['description'].str.contains(search_text, case=False, na=False)]
-
-                # 3. 데이터프레임 표시
+                    filters['start_date'] = this_month_start.strftime('%Y-%m-%d')
+                    filters['end_date'] = latest_date.strftime('%Y-%m-%d')
 
-                # 날짜 포맷팅 후 표시
-                show_df = filtered_df.copy()
-                show_df['date'] = show_df['date'].dt.strftime('%Y-%m-%d')
+                # 3. 현재 페이지만 조회해 표시 (date, time, id 내림차순 키셋 페이지네이션)
+                show_df, stack_key, next_after = _detail_page(owner, filters)
+                totals = get_transaction_totals(filters)
 
                 st.dataframe(
-                    show_df.sort_values(by=['date', 'time'], ascending=False),
+                    show_df.drop(columns=['id']),
                     use_container_width=True,
                     hide_index=True,
                     column_config={
@@ -282,16 +280,34 @@ def render():
                     }
                 )
 
-                # 합계 표시
-                if not filtered_df.empty:
-                    income_filtered = filtered_df[filtered_df['amount'] > 0]['amount'].sum()
-                    expense_filtered = filtered_df[filtered_df['amount'] < 0]['amount'].sum()
-
+                # 합계 표시 (필터 전체 기준, SQL 집계)
+                if totals['count']:
                     st.markdown(
                         f"<div style='text-align: left; color: gray; font-size: 1rem; margin-top: -20px;'>"
-                        f"총 수입: <b>{income_filtered:,.0f}원</b> / 지출: <b>{expense_filtered:,.0f}원</b>"
+                        f"총 수입: <b>{totals['income']:,.0f}원</b> / 지출: <b>{totals['expense']:,.0f}원</b>"
                         f"</div>", 
                         unsafe_allow_html=True
                     )
+
+                    # 페이지 이동
+                    page_no = len(st.session_state[stack_key])
+                    page_count = -(-totals['count'] // DETAIL_PAGE_SIZE)
+                    nav1, nav2, nav3 = st.columns([1, 2, 1])
+                    with nav1:
+                        st.button(
+                            "◀ 이전", key=f"tx_prev_{owner}", use_container_width=True,
+                            disabled=page_no == 1, on_click=_prev_detail_page, args=(stack_key,),
+                        )
+                    with nav2:
+                        st.markdown(
+                            f"<div style='text-align: center; color: gray; padding-top: 0.4rem;'>"
+                            f"{page_no} / {page_count} 페이지 · 총 {totals['count']:,}건</div>",
+                            unsafe_allow_html=True,
+                        )
+                    with nav3:
+                        st.button(
+                            "다음 ▶", key=f"tx_next_{owner}", use_container_width=True,
+                            disabled=next_after is None, on_click=_next_detail_page, args=(stack_key, next_after),
+                        )
                 else:
-                    st.warning("조건에 맞는 내역이 없습니다.")
\ No newline at end of file
+                    st.warning("조건에 맞는 내역이 없습니다.")
@@ -1,8 +1,17 @@
+import hashlib
 import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
 import pandas as pd
 from openai import OpenAI
 
+from utils.chat_history import build_prompt_history
+from utils.llm_client import LLMUnavailableError, chat_completion
+from utils.token_utils import estimate_tokens
+
 STANDARD_CATEGORIES = [
     '식비', '교통비', '고정비', '주거비', '금융', '보험',
     '생활비', '활동비', '친목비', '꾸밈비', '차량비', '여행비',
@@ -11,43 +20,47 @@ STANDARD_CATEGORIES = [
 
 INCOME_CATEGORIES = ['근로소득', '투자소득', '추가수입', '캐쉬백/포인트', '미분류']
 
+# 한 턴에 여러 도구 호출이 오면 동시에 실행할 최대 스레드 수
+_MAX_PARALLEL_QUERIES = 4
+
+# SQL/도구 인자에 날짜 리터럴('2025-03' 등)이 있으면 날짜가 바뀐 뒤에는 재사용하지 않음
+_DATE_LITERAL_RE = re.compile(r"['\"]\d{4}(-\d{2})?")
+
+# 생성 SQL 캐시 적중/미스 카운터 (프로세스 단위)
+_sql_cache_stats = {'hits': 0, 'misses': 0}
+_sql_cache_lock = threading.Lock()
+
+# 정적 스키마 설명 — 컬럼 타입·예시는 생략하고 의미와 규칙만 남김 (프롬프트 캐시 접두부)
 DB_SCHEMA = """
 [DB 스키마 — SQLite]
+transactions: date(YYYY-MM-DD), time(HH:MM), tx_type(수입/지출/이체), category_1(원본 대분류),
+  refined_category_1(표준화 대분류, NULL·'' 가능), category_2(소분류), description(내용/상호명),
+  amount(원, 지출 음수·수입 양수), currency, source(결제수단), memo, owner(형준/윤희/공동)
+  ※ 카테고리는 항상 COALESCE(NULLIF(refined_category_1, ''), category_1) 로 필터·집계
+asset_snapshots: snapshot_date, balance_type(자산/부채), asset_type, account_name, amount(부채도 양수), owner
+budgets: category, monthly_amount(0=미설정), is_fixed_cost(1=고정/0=변동)
+monthly_spend_summary: year_month, tx_type(수입/지출), category(표준화 적용), owner, amount(지출 음수), tx_count
+monthly_merchant_summary: year_month, description, category, owner, amount(음수), tx_count
+net_worth_history: snapshot_date, owner(소유자 또는 '전체'=직전 스냅샷 이월 가구 합계), total_asset, total_debt, net_worth
+  ※ 월 단위 집계는 transactions 대신 요약 테이블 사용 (이체 이미 제외됨)
+"""
 
-테이블: transactions (거래 내역)
-  - date TEXT               : 날짜 (YYYY-MM-DD)
-  - time TEXT               : 시간 (HH:MM)
-  - tx_type TEXT            : 타입 — 수입 / 지출 / 이체
-  - category_1 TEXT         : 원본 대분류 (뱅크샐러드 그대로)
-  - refined_category_1 TEXT : 표준화 대분류 (GPT 재분류값, 없으면 NULL 또는 빈 문자열)
-  - category_2 TEXT         : 소분류
-  - description TEXT        : 내용/상호명
-  - amount INTEGER          : 금액 (원 단위). 지출은 음수(-50000), 수입은 양수(+3000000)로 저장됨
-  - currency TEXT           : 화폐
-  - source TEXT             : 결제수단
-  - memo TEXT               : 메모
-  - owner TEXT              : 소유자 — 형준 / 윤희 / 공동
-
-[중요] 카테고리 조회 규칙:
-  - 카테고리별 집계/필터링 시 항상 아래 표현식을 사용해야 합니다:
-      COALESCE(NULLIF(refined_category_1, ''), category_1)
-  - 예시: WHERE COALESCE(NULLIF(refined_category_1, ''), category_1) = '식비'
-  - 예시: GROUP BY COALESCE(NULLIF(refined_category_1, ''), category_1)
-
-테이블: asset_snapshots (자산 스냅샷)
-  - snapshot_date TEXT : 스냅샷 날짜 (YYYY-MM-DD)
-  - balance_type TEXT  : 구분 — 자산 / 부채
-  - asset_type TEXT    : 항목 (현금 자산, 투자성 자산 등)
-  - account_name TEXT  : 상품명
-  - amount INTEGER     : 금액 (원 단위, 부채는 양수로 저장됨)
-  - owner TEXT         : 소유자 — 형준 / 윤희 / 공동
-
-테이블: budgets (카테고리별 월 예산)
-  - category       TEXT : 카테고리명 (transactions의 대분류와 동일)
-  - monthly_amount INT  : 월 예산 (원 단위, 0이면 미설정)
-  - is_fixed_cost  INT  : 고정비 여부 — 1=고정 지출 / 0=변동 지출
+# 매 호출 동일한 시스템 프롬프트 — 날짜 등 가변 정보는 _dynamic_context()로 뒤에 따로 붙임
+SYSTEM_PROMPT = f"""너는 꼼꼼한 가계부 분석 비서야. 부부(형준/윤희)의 가계 데이터를 분석한다.
+{DB_SCHEMA}
+[규칙]
+- 반드시 도구로 필요한 데이터를 먼저 조회해
+- 월별 지출·상위 가맹점·예산 현황·순자산 추이는 전용 도구(monthly_spend, top_merchants,
+  budget_status, net_worth_history)를 먼저 쓰고, 그 밖의 질문만 query_database로 SQL을 작성해
+- 질문 범위에 딱 맞게 조회하고, 이체(tx_type='이체')는 항상 제외해
+- 기간이 명시되지 않으면 [현재 상황]의 이번 달 기준으로 조회해
+- 지출 크기 비교·정렬·합계는 ABS(amount) 또는 -amount 사용 (예: ORDER BY ABS(amount) DESC)
+- 여러 데이터가 필요하면 도구를 한 번에 여러 개 호출해도 돼 (동시에 실행됨)
+- 도구 결과는 TSV 원본 숫자이고, 행이 많으면 합계·건수·상위 행 요약으로 와
+- 답변은 친근하고 명확한 한국어로, 금액은 1,234원 형식으로 써줘
 """
 
+
 _TOOLS = [
     {
         "type": "function",
@@ -64,11 +77,73 @@ _TOOLS = [
                     "sql": {
                         "type": "string",
                         "description": "실행할 SELECT SQL 쿼리 (SELECT 또는 WITH 로 시작해야 함)"
+                    },
+                    "count_total": {
+                        "type": "boolean",
+                        "description": "결과가 200행을 넘어 잘릴 때 전체 행 수도 필요하면 true (기본 false)"
                     }
                 },
                 "required": ["sql"]
             }
         }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "monthly_spend",
+            "description": "최근 N개월(이번 달 포함)의 월별 지출 합계(양수)와 건수. 카테고리·소유자로 좁힐 수 있음.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "category": {"type": "string", "description": "대분류 (예: 식비). 생략 시 전체"},
+                    "owner": {"type": "string", "description": "형준 / 윤희 / 공동. 생략 시 전체"},
+                    "months": {"type": "integer", "description": "조회 개월 수 (기본 6)"}
+                }
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "top_merchants",
+            "description": "기간 내 지출 금액 상위 가맹점(내용)과 카테고리·금액(양수)·건수.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "period": {"type": "string", "description": "YYYY-MM, YYYY 또는 YYYY-MM~YYYY-MM"},
+                    "owner": {"type": "string", "description": "형준 / 윤희 / 공동. 생략 시 전체"},
+                    "limit": {"type": "integer", "description": "상위 개수 (기본 10)"}
+                },
+                "required": ["period"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "budget_status",
+            "description": "한 달의 카테고리별 예산·지출·잔여·소진율(%).",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "month": {"type": "string", "description": "YYYY-MM. 생략 시 이번 달"}
+                }
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "net_worth_history",
+            "description": "최근 N개월 스냅샷 날짜별 총자산·총부채·순자산 추이.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "owner": {"type": "string", "description": "형준 / 윤희 / 공동 / 전체(가구 합계). 생략 시 모두"},
+                    "months": {"type": "integer", "description": "조회 개월 수 (기본 12)"}
+                }
+            }
+        }
     }
 ]
 
@@ -140,7 +215,8 @@ JSON 형식으로만 응답해:
 - 어느 카테고리도 맞지 않으면 '미분류' 사용"""
 
     try:
-        response = client.chat.completions.create(
+        response = chat_completion(
+            client, "mapping",
             model="gpt-4o",
             messages=[{"role": "user", "content": prompt}],
             response_format={"type": "json_object"},
@@ -159,7 +235,7 @@ JSON 형식으로만 응답해:
             'output_tokens': usage.completion_tokens,
         }
     except Exception:
-        usage_dict = _zero_usage  # 오류 시 기본값(category_1) 유지
+        usage_dict = _zero_usage  # 오류·타임아웃·회로 차단 시 기본값(category_1) 유지
 
     return result_df, usage_dict
 
@@ -174,8 +250,8 @@ def generate_analysis_summary(
 
     Args:
         client           : OpenAI 클라이언트
-        anomaly_metrics  : _compute_anomaly_metrics() 반환값 (None이면 데이터 부족)
-        burnrate_metrics : _compute_burnrate_metrics() 반환값 (None이면 데이터 없음)
+        anomaly_metrics  : analytics.AnomalyReport.to_metrics() 반환값 (None이면 데이터 부족)
+        burnrate_metrics : analytics.Burnrate.to_metrics() 반환값 (None이면 데이터 없음)
 
     Returns:
         str: 2~3문장 한국어 요약. 오류 시 빈 문자열 반환.
@@ -224,7 +300,8 @@ def generate_analysis_summary(
 - 순수 텍스트로만 응답 (마크다운, 이모지 없이)"""
 
     try:
-        response = client.chat.completions.create(
+        response = chat_completion(
+            client, "summary",
             model="gpt-4o",
             messages=[{"role": "user", "content": prompt}],
             max_tokens=200,
@@ -234,72 +311,323 @@ def generate_analysis_summary(
         return ""
 
 
-def ask_gpt_finance(client: OpenAI, chat_history: list) -> str:
+def normalize_question(question: str) -> str:
+    """
+    캐시 키용으로 질문을 정규화합니다.
+    이모지·문장부호를 제거하고, 소문자화 및 공백을 하나로 합칩니다.
+    예) "💰 이번 달 가장 높은 금액의 지출 항목은?" → "이번 달 가장 높은 금액의 지출 항목은"
+    """
+    text = re.sub(r'[^\w\s]', ' ', question.lower())
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def question_fingerprint(question: str) -> str:
+    """정규화된 질문의 해시 (캐시 키)."""
+    return hashlib.sha1(normalize_question(question).encode('utf-8')).hexdigest()[:16]
+
+
+def _is_standalone_question(chat_history: list) -> bool:
+    """이전 대화 맥락 없이 단독으로 답할 수 있는 질문(대화의 첫 질문)인지 확인합니다."""
+    return len(chat_history) == 1 and chat_history[0].get('role') == 'user'
+
+
+def _is_query_error(result: str) -> bool:
+    """execute_query_safe 결과가 오류 메시지인지 확인합니다."""
+    return result.startswith(("오류:", "쿼리 실행 오류", "쿼리 중단", "데이터베이스가 없습니다"))
+
+
+def get_sql_cache_stats() -> dict:
+    """생성 SQL 캐시의 적중/미스 횟수와 적중률을 반환합니다."""
+    with _sql_cache_lock:
+        stats = dict(_sql_cache_stats)
+    total = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / total * 100, 1) if total else 0.0
+    return stats
+
+
+def _count_sql_cache(hit: bool):
+    with _sql_cache_lock:
+        _sql_cache_stats['hits' if hit else 'misses'] += 1
+
+
+def _frame_result(df: pd.DataFrame) -> str:
+    """집계 도구 결과 DataFrame을 query_database와 같은 압축 형식으로 변환합니다."""
+    from utils.result_encoder import encode_result
+
+    if df is None or df.empty:
+        return "조회 결과가 없습니다."
+    return encode_result(df)
+
+
+def _tool_query_database(args: dict) -> str:
+    from utils.db_handler import execute_query_safe
+    return execute_query_safe(args.get("sql", ""), count_total=bool(args.get("count_total")))
+
+
+def _tool_monthly_spend(args: dict) -> str:
+    from utils.db_handler import get_monthly_spend
+    return _frame_result(get_monthly_spend(args.get("category"), args.get("owner"), args.get("months", 6)))
+
+
+def _tool_top_merchants(args: dict) -> str:
+    from utils.db_handler import get_top_merchants
+    return _frame_result(get_top_merchants(args.get("period", ""), args.get("owner"), args.get("limit", 10)))
+
+
+def _tool_budget_status(args: dict) -> str:
+    from utils.db_handler import get_budget_status
+    return _frame_result(get_budget_status(args.get("month")))
+
+
+def _tool_net_worth_history(args: dict) -> str:
+    from utils.db_handler import get_net_worth_history
+    return _frame_result(get_net_worth_history(args.get("owner"), args.get("months", 12)))
+
+
+# 도구 이름 → 실행 함수 (인자 dict를 받아 결과 문자열 반환)
+_TOOL_HANDLERS = {
+    "query_database": _tool_query_database,
+    "monthly_spend": _tool_monthly_spend,
+    "top_merchants": _tool_top_merchants,
+    "budget_status": _tool_budget_status,
+    "net_worth_history": _tool_net_worth_history,
+}
+
+
+def _describe_call(name: str, args: dict) -> str:
+    """trace·캐시 표시용 호출 설명. query_database는 SQL 그대로, 나머지는 name(인자)."""
+    if name == "query_database":
+        return args.get("sql", "")
+    return f"{name}({json.dumps(args, ensure_ascii=False)})"
+
+
+def _run_tool_timed(call: tuple) -> tuple:
+    """(도구 이름, 인자 dict)를 실행하고 (결과 문자열, 소요 ms)를 반환합니다."""
+    name, args = call
+    started = time.perf_counter()
+    handler = _TOOL_HANDLERS.get(name)
+    if handler is None:
+        result = f"오류: 알 수 없는 도구입니다 ({name})"
+    else:
+        try:
+            result = handler(args)
+        except (ValueError, TypeError) as e:
+            result = f"오류: {e}"
+        except Exception as e:
+            result = f"쿼리 실행 오류: {e}"
+    return result, (time.perf_counter() - started) * 1000
+
+
+def _run_queries_concurrently(call_list: list) -> list:
+    """
+    여러 도구 호출을 읽기 전용 연결 풀 위에서 동시에 실행합니다.
+    결과는 입력 순서대로 [(결과 문자열, 소요 ms), ...] 로 반환됩니다.
+    """
+    if len(call_list) <= 1:
+        return [_run_tool_timed(call) for call in call_list]
+    with ThreadPoolExecutor(max_workers=min(len(call_list), _MAX_PARALLEL_QUERIES)) as executor:
+        return list(executor.map(_run_tool_timed, call_list))
+
+
+def _execute_tool_calls(calls: list, messages: list, trace: dict) -> list:
+    """
+    [(tool_call_id, 도구 이름, 인자 dict), ...]을 동시에 실행하고,
+    결과를 원래 순서대로 tool 메시지로 추가합니다. 실행 결과 문자열 목록을 반환합니다.
+    """
+    wall_started = time.perf_counter()
+    results = _run_queries_concurrently([(name, args) for _, name, args in calls])
+    trace['query_wall_ms'] += (time.perf_counter() - wall_started) * 1000
+
+    outputs = []
+    for (tool_call_id, name, args), (query_result, elapsed_ms) in zip(calls, results):
+        trace['queries'].append({
+            'sql': _describe_call(name, args), 'tool': name, 'args': args,
+            'elapsed_ms': round(elapsed_ms, 1),
+        })
+        outputs.append(query_result)
+        messages.append({
+            "role": "tool",
+            "tool_call_id": tool_call_id,
+            "content": query_result,
+        })
+    return outputs
+
+
+def _dynamic_context(today: str) -> str:
+    """매 호출 바뀔 수 있는 정보(오늘 날짜, 이번 달, 최신 거래일)만 담은 짧은 시스템 메시지."""
+    from utils.db_handler import get_latest_transaction_date
+
+    latest = get_latest_transaction_date() or "없음"
+    return (
+        f"[현재 상황] 오늘: {today} / 이번 달: {today[:7]} / "
+        f"가구: 형준·윤희(공동 포함) / 최신 거래 데이터: {latest}"
+    )
+
+
+def ask_gpt_finance(client: OpenAI, chat_history: list, use_cache: bool = True) -> tuple:
     """
     Function Calling으로 GPT가 필요한 쿼리를 직접 작성·실행하고 답변을 생성합니다.
+    한 턴에 여러 tool call이 오면 동시에 실행하고, 결과는 원래 순서대로 messages에 추가합니다.
 
     Args:
         client      : OpenAI 클라이언트
         chat_history: 대화 이력 (최신 user 메시지 포함)
+        use_cache   : False면 답변·SQL 캐시를 조회·저장하지 않음 (벤치마크용)
 
     Returns:
-        str: GPT 최종 답변
+        (answer, trace)
+        answer: GPT 최종 답변
+        trace : {'queries': [{'sql', 'tool', 'args', 'elapsed_ms'}, ...], 'query_wall_ms': 턴별 병렬 실행 시간 합,
+                 'answer_cache': 'hit' | 'miss' | None, 'sql_cache': 'hit' | 'miss' | None,
+                 'prompt_tokens': [GPT 호출별 실제 입력 토큰],
+                 'cached_tokens': [GPT 호출별 제공자 프롬프트 캐시 적중 토큰],
+                 'history': build_prompt_history 통계}
+
+    시스템 프롬프트는 정적 접두부(SYSTEM_PROMPT: 스키마·규칙)와 작은 가변 메시지(날짜·데이터 현황)로
+    나눠 보내므로, 반복 호출 시 정적 부분은 OpenAI 프롬프트 캐시로 처리됩니다.
+
+    대화 이력은 build_prompt_history로 최근 N턴 원문 + 이전 턴 요약으로 줄여 토큰 예산 안에서 보냅니다.
+
+    대화의 첫 질문은 두 단계 캐시를 사용합니다.
+      1) 답변 캐시: (정규화 질문, 오늘 날짜, data_version) → 최종 답변. 데이터가 바뀌면 무효화.
+      2) SQL 캐시 : 질문 지문 → 첫 tool 라운드의 검증된 도구 호출(SQL 또는 집계 도구 인자). 최신 데이터로
+         재실행한 결과를 첫 턴에 넣어 GPT의 첫 번째(쿼리 작성) 호출을 생략합니다.
+         이후 라운드 호출은 앞 결과에서 가져온 값(가맹점명 등)이 리터럴로 박혀 있어 저장하지 않습니다.
     """
-    from utils.db_handler import execute_query_safe
+    from utils.db_handler import (
+        get_data_version, get_cached_answer, save_cached_answer,
+        get_cached_sql, save_cached_sql, delete_cached_sql,
+    )
 
     today = date.today().strftime('%Y-%m-%d')
+    trace = {
+        'queries': [], 'query_wall_ms': 0.0, 'answer_cache': None, 'sql_cache': None,
+        'prompt_tokens': [], 'cached_tokens': [], 'history': None,
+    }
 
-    system_prompt = f"""너는 꼼꼼한 가계부 분석 비서야. 부부(형준/윤희)의 가계 데이터를 분석한다.
-
-오늘 날짜: {today}
-
-{DB_SCHEMA}
-
-[규칙]
-- 질문에 답하기 위해 반드시 query_database 도구로 필요한 데이터를 먼저 조회해
-- 질문 범위에 딱 맞는 쿼리를 작성해 (불필요한 데이터 로딩 금지)
-- 이체(tx_type='이체')는 항상 WHERE 조건에서 제외해
-- 기간이 명시되지 않으면 이번 달 기준으로 조회해
-- 금액은 원 단위 정수야. 지출은 음수(-), 수입은 양수(+)로 저장됨
-- 지출 금액 크기 비교·정렬 시 반드시 ABS(amount) 또는 -amount를 사용해
-  예) 가장 큰 지출: ORDER BY ABS(amount) DESC  /  지출 합계: SUM(ABS(amount))
-- 답변은 친근하고 명확하게 한국어로 해줘
-"""
-
+    cache_key = None
+    if use_cache and _is_standalone_question(chat_history):
+        question = chat_history[0]['content']
+        cache_key = question_fingerprint(question)
+        data_version = get_data_version()
+        cached = get_cached_answer(cache_key, today, data_version)
+        if cached is not None:
+            trace['answer_cache'] = 'hit'
+            return cached['answer'], trace
+        trace['answer_cache'] = 'miss'
+
+    dynamic_prompt = _dynamic_context(today)
+    history, trace['history'] = build_prompt_history(
+        chat_history, reserved_tokens=estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(dynamic_prompt)
+    )
+    # 정적 프롬프트(+도구 정의)가 항상 맨 앞에 같은 내용으로 와야 제공자 측 프롬프트 캐시가 적중함
     messages = [
-        {"role": "system", "content": system_prompt},
-        *chat_history
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "system", "content": dynamic_prompt},
+        *history
     ]
-
+    query_results = []
+
+    # 저장된 도구 호출이 있으면 최신 데이터로 재실행하여 첫 번째 tool 턴을 대신함
+    if cache_key is not None:
+        cached_calls = get_cached_sql(cache_key, today)
+        if cached_calls:
+            calls = [
+                # 예전 형식(SQL 문자열)과 {'name', 'arguments'} 형식을 모두 지원
+                (f"cached_sql_{i}", "query_database", {"sql": entry}) if isinstance(entry, str)
+                else (f"cached_sql_{i}", entry["name"], entry["arguments"])
+                for i, entry in enumerate(cached_calls)
+            ]
+            replay_messages = [{
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [
+                    {
+                        "id": call_id,
+                        "type": "function",
+                        "function": {
+                            "name": name,
+                            "arguments": json.dumps(args, ensure_ascii=False),
+                        },
+                    }
+                    for call_id, name, args in calls
+                ],
+            }]
+            replay_trace = {'queries': [], 'query_wall_ms': 0.0}
+            replay_results = _execute_tool_calls(calls, replay_messages, replay_trace)
+            if any(_is_query_error(r) for r in replay_results):
+                # 스키마 변경 등으로 더 이상 유효하지 않은 SQL → 폐기하고 일반 흐름으로
+                delete_cached_sql(cache_key)
+                trace['sql_cache'] = 'miss'
+            else:
+                messages.extend(replay_messages)
+                trace['queries'].extend(replay_trace['queries'])
+                trace['query_wall_ms'] += replay_trace['query_wall_ms']
+                query_results.extend(replay_results)
+                trace['sql_cache'] = 'hit'
+        else:
+            trace['sql_cache'] = 'miss'
+        _count_sql_cache(trace['sql_cache'] == 'hit')
+
+    first_round_calls = None  # 첫 tool 라운드의 호출 수 (SQL 캐시 저장 범위)
     max_iterations = 5  # 무한 루프 방지
     try:
         for _ in range(max_iterations):
-            response = client.chat.completions.create(
+            response = chat_completion(
+                client, "chat",
                 model="gpt-4o",
                 messages=messages,
                 tools=_TOOLS,
                 tool_choice="auto",
             )
             response_message = response.choices[0].message
+            if response.usage is not None:
+                trace['prompt_tokens'].append(response.usage.prompt_tokens)
+                details = getattr(response.usage, 'prompt_tokens_details', None)
+                trace['cached_tokens'].append(getattr(details, 'cached_tokens', 0) or 0)
 
             # tool_call이 없으면 최종 답변 반환
             if not response_message.tool_calls:
-                return response_message.content
-
-            # tool_call 실행: 요청된 쿼리를 모두 처리하고 결과를 messages에 추가
+                answer = response_message.content
+                if cache_key is not None:
+                    validated_calls = [
+                        {'name': q['tool'], 'arguments': q['args']}
+                        for q, r in zip(trace['queries'][:first_round_calls], query_results[:first_round_calls])
+                        if not _is_query_error(r)
+                    ]
+                    if validated_calls and trace['sql_cache'] != 'hit':
+                        has_date_literal = any(
+                            _DATE_LITERAL_RE.search(json.dumps(c['arguments'], ensure_ascii=False))
+                            for c in validated_calls
+                        )
+                        save_cached_sql(cache_key, today if has_date_literal else '', validated_calls)
+
+                    cacheable = (
+                        answer and query_results
+                        and not any(_is_query_error(r) for r in query_results)
+                    )
+                    if cacheable:
+                        save_cached_answer(
+                            cache_key, today, data_version, question,
+                            json.dumps([q['sql'] for q in trace['queries']], ensure_ascii=False),
+                            json.dumps(query_results, ensure_ascii=False),
+                            answer,
+                        )
+                return answer, trace
+
+            # tool_call 실행: 요청된 도구를 동시에 처리하고 결과를 원래 순서대로 messages에 추가
             messages.append(response_message)
-            for tool_call in response_message.tool_calls:
-                if tool_call.function.name == "query_database":
-                    args = json.loads(tool_call.function.arguments)
-                    sql = args.get("sql", "")
-                    query_result = execute_query_safe(sql)
-                    messages.append({
-                        "role": "tool",
-                        "tool_call_id": tool_call.id,
-                        "content": query_result,
-                    })
-
-        return "죄송해요, 데이터 조회가 너무 복잡해서 답변을 완성하지 못했어요. 질문을 조금 더 구체적으로 해주시겠어요?"
-
+            calls = [
+                (tc.id, tc.function.name, json.loads(tc.function.arguments or "{}"))
+                for tc in response_message.tool_calls
+            ]
+            query_results.extend(_execute_tool_calls(calls, messages, trace))
+            if first_round_calls is None:
+                first_round_calls = len(query_results)
+
+        return "죄송해요, 데이터 조회가 너무 복잡해서 답변을 완성하지 못했어요. 질문을 조금 더 구체적으로 해주시겠어요?", trace
+
+    except LLMUnavailableError as e:
+        return str(e), trace  # 회로 차단 중: GPT 호출 없이 바로 안내
     except Exception as e:
-        return f"AI 응답 중 오류가 발생했습니다: {str(e)}"
+        return f"AI 응답 중 오류가 발생했습니다: {str(e)}", trace
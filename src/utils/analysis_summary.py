@@ -0,0 +1,75 @@
+"""
+분석 리포트 GPT 요약의 백그라운드 생성·저장.
+
+분석 페이지는 메트릭 해시로 analysis_summaries 테이블을 조회해 바로 그리고,
+요약이 없거나 수치가 바뀐 경우에만 schedule_analysis_summary()로 백그라운드 생성을 요청합니다.
+데이터 적재·재분류 직후에도 같은 함수를 호출해, 사용자가 페이지를 열기 전에 요약을 미리 만들어 둡니다.
+같은 해시에 대한 생성은 동시에 한 번만 실행됩니다.
+"""
+import json
+import threading
+
+from utils.ai_agent import generate_analysis_summary
+from utils.analytics import get_spending_analytics
+from utils.db_handler import get_analysis_summary, save_analysis_summary
+from utils.llm_client import get_openai_client
+
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+
+
+def compute_current_metrics() -> tuple:
+    """(anomaly_metrics, burnrate_metrics, 해시). 데이터가 없으면 (None, None, None)."""
+    engine = get_spending_analytics()
+    if engine.is_empty:
+        return None, None, None
+    return engine.summary_metrics()
+
+
+def is_generating(key: str) -> bool:
+    with _in_flight_lock:
+        return key in _in_flight
+
+
+def _generate(key: str, anomaly: dict | None, burnrate: dict | None):
+    try:
+        client = get_openai_client()
+        if client is None:
+            return
+        summary = generate_analysis_summary(client, anomaly, burnrate)
+        if summary:  # 실패(타임아웃·회로 차단)한 빈 요약은 저장하지 않아 다음 요청 때 다시 시도
+            save_analysis_summary(key, summary, json.dumps([anomaly, burnrate], ensure_ascii=False, default=str))
+    finally:
+        with _in_flight_lock:
+            _in_flight.discard(key)
+
+
+def _claim(key: str) -> bool:
+    """이미 저장됐거나 생성 중이면 False, 아니면 생성 중으로 표시하고 True."""
+    if get_analysis_summary(key) is not None:
+        return False
+    with _in_flight_lock:
+        if key in _in_flight:
+            return False
+        _in_flight.add(key)
+    return True
+
+
+def _refresh_from_db():
+    anomaly, burnrate, key = compute_current_metrics()
+    if key is not None and _claim(key):
+        _generate(key, anomaly, burnrate)
+
+
+def schedule_analysis_summary(anomaly=None, burnrate=None, key: str = None):
+    """
+    현재 메트릭의 요약이 저장되어 있지 않으면 백그라운드 스레드에서 생성합니다.
+    메트릭과 해시를 넘기지 않으면(적재·재분류 직후) 메트릭 계산까지 백그라운드에서 합니다.
+    """
+    if key is None:
+        threading.Thread(target=_refresh_from_db, name="analysis-summary", daemon=True).start()
+        return
+    if _claim(key):
+        threading.Thread(
+            target=_generate, args=(key, anomaly, burnrate), name="analysis-summary", daemon=True
+        ).start()
@@ -0,0 +1,494 @@
+"""
+분석 리포트 지출 분석 엔진 (Streamlit 비의존).
+
+거래 DataFrame에서 지출 행의 날짜 변환·월 구분·일별/월별 집계를 한 번만 만들고,
+이상 지출(AnomalyReport)과 지출 예측(Burnrate)을 타입이 있는 결과로 돌려줍니다.
+pages.analysis의 요약 카드·차트와 백그라운드 요약 생성(utils.analysis_summary)이
+같은 엔진을 쓰므로 화면과 저장된 요약이 항상 같은 수치를 기준으로 하고,
+get_spending_analytics()는 data_version·날짜가 같으면 만들어 둔 엔진을 재사용합니다.
+"""
+import calendar
+import hashlib
+import json
+import threading
+from dataclasses import dataclass, field
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from utils.db_handler import (
+    get_analyzed_transactions, get_anomaly_watermark, get_budgets, get_data_version, get_monthly_category_spend,
+    get_same_period_spend_stats, get_spending_anomalies, replace_spending_anomalies, set_anomaly_watermark,
+)
+
+# 이상 지출 판단 기준: |이번 달 - 과거 평균| > ANOMALY_SIGMA × 표준편차
+ANOMALY_SIGMA = 2
+# 비교에 쓰는 과거 개월 수와 최소 개월 수
+LOOKBACK_MONTHS = 12
+MIN_PAST_MONTHS = 3
+# 월말 지출 몬테카를로 시뮬레이션 경로 수와 시드 (같은 데이터면 같은 결과)
+SIMULATION_PATHS = 5000
+SIMULATION_SEED = 42
+
+
+@dataclass(frozen=True)
+class Anomaly:
+    """이상 지출 카테고리 1건 (이번 달 1일~오늘 누적 vs 과거 같은 구간 평균)."""
+    category: str
+    current: int
+    mean: int
+    diff: int
+    pct: float
+
+    @property
+    def direction(self) -> str:
+        return "over" if self.diff > 0 else "under"
+
+    def to_dict(self) -> dict:
+        return {
+            "category": self.category, "current": self.current, "mean": self.mean,
+            "diff": self.diff, "pct": self.pct, "direction": self.direction,
+        }
+
+
+@dataclass(frozen=True)
+class AnomalyReport:
+    """이상 지출 탐지 결과. past_months < MIN_PAST_MONTHS이면 데이터 부족."""
+    past_months: int
+    today_day: int
+    has_current: bool
+    anomalies: tuple = ()
+
+    @property
+    def enough_history(self) -> bool:
+        return self.past_months >= MIN_PAST_MONTHS
+
+    def to_metrics(self) -> dict | None:
+        """GPT 요약·해시용 dict. 데이터 부족 시 None."""
+        if not self.enough_history:
+            return None
+        return {"anomalies": [a.to_dict() for a in self.anomalies], "past_months": self.past_months}
+
+
+@dataclass(frozen=True, eq=False)
+class MonthEndSimulation:
+    """과거 일별 지출을 날짜(일)별로 재표본해 만든 월말 지출 분포."""
+    paths: int
+    p10: int
+    p50: int
+    p90: int
+    exceed_prob: float | None                  # 예산 초과 확률 (예산 미설정이면 None)
+    bands: pd.DataFrame = field(repr=False)    # date, p10, p50, p90 (오늘~월말 누적)
+
+
+def simulate_month_end(
+    past_daily: pd.DataFrame,
+    today: date,
+    current_total: int,
+    budget_total: int = 0,
+    paths: int = SIMULATION_PATHS,
+    seed: int = SIMULATION_SEED,
+) -> MonthEndSimulation | None:
+    """
+    남은 날마다 과거 달 중 하나의 같은 날짜 지출을 무작위로 뽑아 월말 누적 지출 경로를 paths개 만듭니다.
+    (경로 × 남은 날) 난수 행렬 한 번으로 모든 경로를 동시에 계산합니다.
+
+    Args:
+        past_daily: [year_month, day_of_month, amount_abs] — 과거 달의 일별 지출 (선택 카테고리 기준)
+        today     : 기준일 (다음 날부터 월말까지 시뮬레이션)
+    """
+    months = past_daily['year_month'].unique()
+    if len(months) == 0:
+        return None
+    days_in_month = calendar.monthrange(today.year, today.month)[1]
+    remaining_days = np.arange(today.day + 1, days_in_month + 1)
+
+    # 과거 달 × 날짜(1~31) 행렬. 그 달에 없는 날짜(2월 30일 등)는 NaN으로 두고 뽑지 않음
+    matrix = (
+        past_daily.groupby(['year_month', 'day_of_month'])['amount_abs'].sum()
+        .unstack(fill_value=0).reindex(index=months, columns=range(1, 32), fill_value=0)
+        .to_numpy(dtype=float, copy=True)
+    )
+    month_lengths = np.array([m.days_in_month for m in months])
+    matrix[np.arange(1, 32)[None, :] > month_lengths[:, None]] = np.nan
+
+    if len(remaining_days):
+        columns = matrix[:, remaining_days - 1]
+        # 열마다 유효한 값을 앞으로 모은 뒤, 유효 개수 범위에서 인덱스를 뽑음
+        packed = np.take_along_axis(columns, np.argsort(np.isnan(columns), axis=0, kind='stable'), axis=0)
+        valid = (~np.isnan(columns)).sum(axis=0)
+        rng = np.random.default_rng(seed)
+        draws = (rng.random((paths, len(remaining_days))) * valid).astype(int)
+        samples = np.nan_to_num(packed[draws, np.arange(len(remaining_days))])
+        cumulative = current_total + samples.cumsum(axis=1)
+    else:
+        cumulative = np.full((paths, 0), float(current_total))
+
+    month_end = cumulative[:, -1] if cumulative.shape[1] else np.full(paths, float(current_total))
+    p10, p50, p90 = np.percentile(month_end, [10, 50, 90])
+    band_values = np.percentile(cumulative, [10, 50, 90], axis=0) if cumulative.shape[1] else np.empty((3, 0))
+    bands = pd.DataFrame({
+        'date': [pd.Timestamp(today)] + [pd.Timestamp(date(today.year, today.month, int(d))) for d in remaining_days],
+        'p10': np.concatenate([[current_total], band_values[0]]).round(),
+        'p50': np.concatenate([[current_total], band_values[1]]).round(),
+        'p90': np.concatenate([[current_total], band_values[2]]).round(),
+    })
+    return MonthEndSimulation(
+        paths=paths,
+        p10=int(round(p10)), p50=int(round(p50)), p90=int(round(p90)),
+        exceed_prob=float((month_end > budget_total).mean()) if budget_total > 0 else None,
+        bands=bands,
+    )
+
+
+@dataclass(frozen=True, eq=False)
+class Burnrate:
+    """이번 달 누적 지출과 과거 일별 패턴 기반 월말 예측."""
+    category: str
+    current_total: int
+    projected_total: int
+    budget_total: int
+    last_month_total: int                 # 지난달 1일~오늘 날짜까지 누적
+    past_months: int                      # 예측에 쓴 과거 개월 수
+    daily: pd.DataFrame = field(repr=False)             # date, amount, cumulative (1일~오늘)
+    forecast: pd.DataFrame = field(repr=False)          # date, cumulative (오늘~월말)
+    last_month_curve: pd.DataFrame = field(repr=False)  # date, cumulative (이번 달 날짜축)
+    simulation: MonthEndSimulation | None = field(default=None, repr=False)
+
+    @property
+    def budget_pct(self) -> float:
+        return (self.current_total / self.budget_total * 100) if self.budget_total > 0 else 0
+
+    @property
+    def will_exceed(self) -> bool:
+        return self.projected_total > self.budget_total if self.budget_total > 0 else False
+
+    @property
+    def is_empty(self) -> bool:
+        return self.current_total == 0 and self.projected_total == 0
+
+    def to_metrics(self) -> dict | None:
+        """GPT 요약·해시용 dict. 이번 달 지출과 예측이 모두 0이면 None."""
+        if self.is_empty:
+            return None
+        return {
+            "current_total": self.current_total,
+            "projected_total": self.projected_total,
+            "budget_total": self.budget_total,
+            "budget_pct": round(self.budget_pct, 1),
+            "will_exceed": self.will_exceed,
+        }
+
+
+class SpendingAnalytics:
+    """
+    지출 집계를 한 번 만들어 두고 이상 지출·지출 예측 결과를 계산합니다.
+
+    Args:
+        df_all    : get_analyzed_transactions() 결과
+        budgets_df: get_budgets() 결과
+        today     : 기준일 (기본: 오늘)
+    """
+
+    def __init__(self, df_all: pd.DataFrame, budgets_df: pd.DataFrame, today: date = None):
+        self.today = today or date.today()
+        self.current_period = pd.Period(self.today, 'M')
+        self.budgets = budgets_df
+        self.is_empty = df_all.empty
+
+        columns = ['date', 'category_1', 'description', 'source', 'owner', 'amount']
+        expenses = (
+            df_all.loc[df_all['tx_type'] == '지출', columns] if not df_all.empty
+            else pd.DataFrame(columns=columns)
+        ).copy()
+        expenses['date'] = pd.to_datetime(expenses['date'])
+        expenses['amount_abs'] = expenses['amount'].abs()
+        expenses['year_month'] = expenses['date'].dt.to_period('M')
+        self.expenses = expenses
+
+        # 일 × 카테고리 합계 — 이후 계산은 모두 이 표(행 수 ≪ 거래 수)에서 출발
+        daily = expenses.groupby(['date', 'category_1'], as_index=False)['amount_abs'].sum()
+        daily['year_month'] = daily['date'].dt.to_period('M')
+        daily['day_of_month'] = daily['date'].dt.day
+        self.daily = daily
+
+        self._anomalies = None
+        self._burnrates = {}
+
+    # ── 이상 지출 ─────────────────────────────────────────
+    def anomalies(self) -> AnomalyReport:
+        """
+        카테고리별 이번 달 1일~오늘 누적을 과거 12개월 같은 구간의 평균·표준편차와 비교합니다.
+        통계는 daily_spend_summary에서 SQL로 계산하므로 카테고리 수만큼의 행만 읽습니다.
+        """
+        if self._anomalies is not None:
+            return self._anomalies
+
+        today_day = self.today.day
+        stats, past_months = get_same_period_spend_stats(
+            self.current_period.strftime('%Y-%m'), today_day, LOOKBACK_MONTHS
+        )
+        report = AnomalyReport(past_months=past_months, today_day=today_day, has_current=not stats.empty)
+
+        if report.enough_history and not stats.empty:
+            # 과거 데이터도 동일 구간(1일~당일)으로 한정하여 공정 비교 (표본 표준편차, 1개월뿐이면 제외)
+            merged = stats.set_index('category').dropna(subset=['mean', 'var'])
+            merged['std'] = np.sqrt(merged['var'].astype(float).clip(lower=0))
+            flagged = merged[
+                (merged['std'] > 0)
+                & ((merged['current_amount'] - merged['mean']).abs() > ANOMALY_SIGMA * merged['std'])
+            ]
+            anomalies = []
+            for category, row in flagged.iterrows():
+                diff = row['current_amount'] - row['mean']
+                pct = (diff / row['mean'] * 100) if row['mean'] > 0 else 0
+                anomalies.append(Anomaly(
+                    category=category, current=int(row['current_amount']), mean=int(row['mean']),
+                    diff=int(diff), pct=round(float(pct), 1),
+                ))
+            report = AnomalyReport(past_months, today_day, True, tuple(anomalies))
+
+        self._anomalies = report
+        return report
+
+    def current_month_detail(self, category: str) -> pd.DataFrame:
+        """이번 달 해당 카테고리 지출 행 (date, description, amount_abs, source)."""
+        exp = self.expenses
+        return exp.loc[
+            (exp['year_month'] == self.current_period) & (exp['category_1'] == category),
+            ['date', 'description', 'amount_abs', 'source'],
+        ]
+
+    # ── 지출 예측 ─────────────────────────────────────────
+    def _budget_total(self, category: str) -> int:
+        if self.budgets.empty:
+            return 0
+        if category == "전체":
+            return int(self.budgets['monthly_amount'].sum())
+        row = self.budgets[self.budgets['category'] == category]
+        return int(row['monthly_amount'].iloc[0]) if not row.empty else 0
+
+    def burnrate(self, category: str = "전체", exclude: tuple = ()) -> Burnrate:
+        """
+        이번 달 누적 지출과 과거 12개월 일별 평균 패턴으로 월말 지출을 예측합니다.
+
+        Args:
+            category: "전체" 또는 카테고리명
+            exclude : category가 "전체"일 때 제외할 카테고리 (예: ('예비비',))
+        """
+        cache_key = (category, tuple(exclude))
+        if cache_key in self._burnrates:
+            return self._burnrates[cache_key]
+
+        today = self.today
+        first_of_month = today.replace(day=1)
+        days_in_month = calendar.monthrange(today.year, today.month)[1]
+
+        daily = self.daily
+        if category != "전체":
+            daily = daily[daily['category_1'] == category]
+        elif exclude:
+            daily = daily[~daily['category_1'].isin(exclude)]
+
+        # 이번 달 일별 합산 → 누적합
+        month = daily[(daily['date'] >= pd.Timestamp(first_of_month)) & (daily['date'] <= pd.Timestamp(today))]
+        date_range = pd.date_range(start=first_of_month, end=today)
+        month_daily = (
+            month.groupby('date')['amount_abs'].sum()
+            .reindex(date_range, fill_value=0).rename('amount')
+            .rename_axis('date').reset_index()
+        )
+        month_daily['cumulative'] = month_daily['amount'].cumsum()
+        current_total = int(month_daily['cumulative'].iloc[-1]) if not month_daily.empty else 0
+
+        # 과거 12개월 일별 평균 패턴으로 비선형 예측
+        past = daily[
+            (daily['year_month'] < self.current_period)
+            & (daily['year_month'] >= self.current_period - LOOKBACK_MONTHS)
+        ]
+        past_months = past['year_month'].nunique()
+        pattern = (
+            past.groupby('day_of_month')['amount_abs'].sum().div(past_months)
+            if past_months else pd.Series(dtype=float)
+        )
+        remaining_days = list(range(today.day + 1, days_in_month + 1))
+        remaining = pattern.reindex(remaining_days, fill_value=0)
+        projected_total = current_total + int(remaining.sum())
+        forecast = pd.DataFrame({
+            'date': [pd.Timestamp(today)] + [pd.Timestamp(date(today.year, today.month, d)) for d in remaining_days],
+            'cumulative': [current_total] + (current_total + remaining.cumsum()).round().tolist(),
+        })
+
+        # 지난달 실제 지출 (이번 달 날짜축에 겹쳐 그림)
+        last = daily[daily['year_month'] == self.current_period - 1]
+        last_month_total = int(last.loc[last['day_of_month'] <= today.day, 'amount_abs'].sum())
+        last_month_curve = pd.DataFrame(columns=['date', 'cumulative'])
+        if not last.empty:
+            by_day = last.groupby('day_of_month')['amount_abs'].sum().reindex(range(1, days_in_month + 1), fill_value=0)
+            last_month_curve = pd.DataFrame({
+                'date': [pd.Timestamp(date(today.year, today.month, d)) for d in by_day.index],
+                'cumulative': by_day.cumsum().round().tolist(),
+            })
+
+        budget_total = self._budget_total(category)
+        result = Burnrate(
+            category=category,
+            current_total=current_total,
+            projected_total=projected_total,
+            budget_total=budget_total,
+            last_month_total=last_month_total,
+            past_months=past_months,
+            daily=month_daily,
+            forecast=forecast,
+            last_month_curve=last_month_curve,
+            simulation=simulate_month_end(past, today, current_total, budget_total),
+        )
+        self._burnrates[cache_key] = result
+        return result
+
+    # ── 요약용 메트릭 ─────────────────────────────────────
+    def summary_metrics(self) -> tuple:
+        """(anomaly_metrics, burnrate_metrics, 해시) — GPT 요약 카드 입력."""
+        anomaly = self.anomalies().to_metrics()
+        burnrate = self.burnrate().to_metrics()
+        return anomaly, burnrate, metrics_hash(anomaly, burnrate)
+
+
+# ── 전체 기간 월별 이상 지출 (히트맵) ─────────────────────
+
+def compute_spending_anomalies(monthly: pd.DataFrame, owner_first_months: dict, end_ym: str) -> pd.DataFrame:
+    """
+    모든 (월, 카테고리, 소유자)에 대해 직전 12개월 평균 ± 2σ 검정을 한 번에 계산합니다.
+    월 × (소유자, 카테고리) 행렬을 만들고 shift(1).rolling(12)으로 모든 열의 통계를 동시에 구하며,
+    소유자별 합산인 '전체' 열도 함께 계산합니다.
+
+    Args:
+        monthly           : [year_month, category, owner, amount] (get_monthly_category_spend 결과)
+        owner_first_months: {owner: 첫 지출 월} — 이전 월은 0이 아니라 '데이터 없음'으로 취급
+        end_ym            : 계산할 마지막 월 (완료된 월까지만)
+
+    Returns:
+        [year_month, category, owner, amount, mean, std, z, is_anomaly]
+        직전 이력이 MIN_PAST_MONTHS개월 이상인 셀만 포함합니다.
+    """
+    columns = ['year_month', 'category', 'owner', 'amount', 'mean', 'std', 'z', 'is_anomaly']
+    monthly = monthly[monthly['year_month'] <= end_ym]
+    if monthly.empty:
+        return pd.DataFrame(columns=columns)
+
+    household = monthly.groupby(['year_month', 'category'], as_index=False)['amount'].sum().assign(owner='전체')
+    matrix = pd.concat([monthly, household]).pivot_table(
+        index='year_month', columns=['owner', 'category'], values='amount', aggfunc='sum',
+    )
+    months = pd.period_range(matrix.index.min(), end_ym, freq='M').strftime('%Y-%m')
+    matrix = matrix.reindex(months).fillna(0.0)
+
+    # 소유자 데이터 시작 전 월은 NaN (0으로 두면 평균을 끌어내림)
+    first_months = {**owner_first_months, '전체': min(owner_first_months.values(), default=months[0])}
+    starts = np.array([first_months.get(o, months[0]) for o in matrix.columns.get_level_values('owner')])
+    matrix = matrix.where(np.asarray(months)[:, None] >= starts[None, :])
+
+    history = matrix.shift(1).rolling(LOOKBACK_MONTHS, min_periods=MIN_PAST_MONTHS)
+    mean, std = history.mean(), history.std()
+    deviation = matrix - mean
+    z = deviation / std.where(std > 0)
+    is_anomaly = (std > 0) & (deviation.abs() > ANOMALY_SIGMA * std)
+
+    # 행렬 → 긴 형식 (월 × 열 순서로 평탄화)
+    n_months, n_cols = matrix.shape
+    result = pd.DataFrame({
+        'year_month': np.repeat(matrix.index.to_numpy(), n_cols),
+        'owner': np.tile(matrix.columns.get_level_values('owner').to_numpy(), n_months),
+        'category': np.tile(matrix.columns.get_level_values('category').to_numpy(), n_months),
+        'amount': matrix.to_numpy().ravel(),
+        'mean': mean.to_numpy().ravel(),
+        'std': std.to_numpy().ravel(),
+        'z': z.to_numpy().ravel(),
+        'is_anomaly': is_anomaly.to_numpy().ravel().astype(int),
+    })
+    result = result[result['mean'].notna() & result['amount'].notna()]
+    result = result[(result['amount'] > 0) | (result['mean'] > 0)]
+    result['amount'] = result['amount'].round().astype(int)
+    return result[columns].reset_index(drop=True)
+
+
+def _last_complete_month() -> str:
+    return (pd.Period(date.today(), 'M') - 1).strftime('%Y-%m')
+
+
+def refresh_spending_anomalies(start_date: str = None, end_date: str = None, base_version: int = None):
+    """
+    spending_anomalies 테이블을 갱신합니다. 기간이 주어지면(적재·재분류 직후) 그 기간과,
+    그 월들을 비교 기준으로 쓰는 이후 12개월만 다시 계산합니다.
+    끝나면 워터마크(data_version, 반영된 마지막 월)를 기록해 load_spending_anomalies가 재계산을 건너뛰게 합니다.
+
+    base_version: 호출자가 데이터를 바꾸기 전의 data_version. 기간 갱신은 기존 워터마크가 이 버전이었을 때만
+    (= 그 사이 바뀐 건 이번 기간뿐일 때만) 워터마크를 현재 버전으로 올립니다. 아니면 그대로 두어 다음 조회 때 전체 재계산.
+    """
+    version = get_data_version()
+    previous = get_anomaly_watermark()
+    end_ym = _last_complete_month()
+    if start_date is None or end_date is None:
+        start_ym = '0000-00'
+    else:
+        start_ym = str(start_date)[:7]
+        end_ym = min(end_ym, (pd.Period(str(end_date)[:7], 'M') + LOOKBACK_MONTHS).strftime('%Y-%m'))
+    if start_ym > end_ym:
+        return
+    load_from = None if start_date is None else (pd.Period(start_ym, 'M') - LOOKBACK_MONTHS).strftime('%Y-%m')
+    monthly, first_months = get_monthly_category_spend(load_from, end_ym)
+    result = compute_spending_anomalies(monthly, first_months, end_ym)
+    replace_spending_anomalies(result[result['year_month'] >= start_ym], start_ym, end_ym)
+
+    if start_date is None:
+        set_anomaly_watermark(version, end_ym)
+    elif previous is not None and base_version is not None and previous[0] == base_version:
+        # 기존 반영 범위와 이어지는 구간을 계산했을 때만 범위를 늘림 (사이에 빈 월이 생기지 않도록)
+        covered = previous[1]
+        contiguous = start_ym <= (pd.Period(covered, 'M') + 1).strftime('%Y-%m')
+        set_anomaly_watermark(version, max(covered, end_ym) if contiguous else covered)
+
+
+def load_spending_anomalies(owner: str = '전체') -> pd.DataFrame:
+    """
+    히트맵용 이상 지출 결과. 워터마크로 최신 여부를 판단합니다. (이력이 짧아 결과가 비어 있어도 재계산하지 않음)
+      - 워터마크가 없거나 data_version이 다르면 전체 재계산
+      - 같은 버전인데 지난달까지 닿지 않으면(달이 바뀜) 빠진 월만 계산
+    """
+    watermark = get_anomaly_watermark()
+    last_month = _last_complete_month()
+    if watermark is None or watermark[0] != get_data_version():
+        refresh_spending_anomalies()
+    elif watermark[1] < last_month:
+        refresh_spending_anomalies(
+            f"{(pd.Period(watermark[1], 'M') + 1).strftime('%Y-%m')}-01", f"{last_month}-28", base_version=watermark[0]
+        )
+    return get_spending_anomalies(owner)
+
+
+_engine_cache = {'key': None, 'engine': None}
+_engine_lock = threading.Lock()
+
+
+def get_spending_analytics() -> SpendingAnalytics:
+    """
+    현재 데이터 기준 분석 엔진. data_version과 날짜가 같으면 만들어 둔 엔진을 재사용하므로
+    페이지 재실행·요약 생성 스레드가 거래 전체를 다시 읽고 집계하지 않습니다.
+    """
+    key = (get_data_version(), date.today())
+    with _engine_lock:
+        if _engine_cache['key'] == key:
+            return _engine_cache['engine']
+    engine = SpendingAnalytics(get_analyzed_transactions(), get_budgets())
+    with _engine_lock:
+        _engine_cache['key'] = key
+        _engine_cache['engine'] = engine
+    return engine
+
+
+def metrics_hash(anomaly_metrics: dict | None, burnrate_metrics: dict | None) -> str:
+    """두 메트릭의 내용 해시. 같은 수치면 같은 값이므로 요약 재생성 여부 판단에 사용합니다."""
+    return hashlib.md5(
+        json.dumps([anomaly_metrics, burnrate_metrics], sort_keys=True, default=str).encode()
+    ).hexdigest()[:16]
@@ -0,0 +1,121 @@
+"""
+챗봇 대화 이력 관리.
+
+chatbot.render는 모든 user/assistant 메시지를 st.session_state.chat_history에 쌓습니다.
+GPT에 보낼 때는 최근 N턴만 원문으로 보내고, 그 이전 턴은 짧은 요약 한 덩어리로 접어
+대화가 길어져도 프롬프트 크기가 토큰 예산을 넘지 않도록 합니다.
+"""
+import os
+import re
+
+from utils.token_utils import estimate_message_tokens, estimate_tokens
+
+# 원문 그대로 보낼 최근 턴 수 (1턴 = user 질문 + assistant 답변)
+HISTORY_KEEP_TURNS = int(os.getenv("CHAT_HISTORY_KEEP_TURNS", "4"))
+
+# 시스템 프롬프트 + 대화 이력 전체에 대한 토큰 예산
+PROMPT_TOKEN_BUDGET = int(os.getenv("CHAT_PROMPT_TOKEN_BUDGET", "4000"))
+
+# 요약에서 턴당 남길 최대 글자 수
+_SUMMARY_QUESTION_CHARS = 60
+_SUMMARY_ANSWER_CHARS = 100
+
+
+def _split_turns(chat_history: list) -> list:
+    """메시지 목록을 user 메시지 기준의 턴 단위 리스트로 묶습니다."""
+    turns = []
+    for message in chat_history:
+        if message.get('role') == 'user' or not turns:
+            turns.append([message])
+        else:
+            turns[-1].append(message)
+    return turns
+
+
+def _clip(text: str, limit: int) -> str:
+    text = re.sub(r'\s+', ' ', text or '').strip()
+    return text if len(text) <= limit else text[:limit - 1] + '…'
+
+
+def _first_sentence(text: str) -> str:
+    """답변의 첫 문장만 남깁니다. (마크다운 기호 제거)"""
+    text = re.sub(r'[#*`>|_-]+', ' ', text or '')
+    match = re.search(r'.+?[.!?。](\s|$)', text.strip())
+    return match.group(0) if match else text
+
+
+def _summarize_turn(turn: list) -> str:
+    """한 턴을 'Q: … / A: …' 한 줄로 요약합니다."""
+    question = next((m.get('content', '') for m in turn if m.get('role') == 'user'), '')
+    answer = next((m.get('content', '') for m in turn if m.get('role') == 'assistant'), '')
+    line = f"- Q: {_clip(question, _SUMMARY_QUESTION_CHARS)}"
+    if answer:
+        line += f" / A: {_clip(_first_sentence(answer), _SUMMARY_ANSWER_CHARS)}"
+    return line
+
+
+def _summary_message(lines: list) -> dict:
+    return {
+        "role": "system",
+        "content": "[이전 대화 요약]\n" + "\n".join(lines),
+    }
+
+
+def build_prompt_history(
+    chat_history: list,
+    reserved_tokens: int = 0,
+    keep_turns: int = HISTORY_KEEP_TURNS,
+    token_budget: int = PROMPT_TOKEN_BUDGET,
+) -> tuple:
+    """
+    GPT에 보낼 대화 이력을 토큰 예산 안으로 줄입니다.
+
+    Args:
+        chat_history   : 전체 대화 이력 (마지막은 최신 user 메시지)
+        reserved_tokens: 시스템 프롬프트 등 이력 외에 이미 사용하는 토큰 수
+        keep_turns     : 원문 그대로 유지할 최근 턴 수
+        token_budget   : 전체 프롬프트 토큰 예산
+
+    Returns:
+        (messages, stats)
+        messages: [이전 대화 요약 system 메시지(있을 때)] + 최근 턴 원문
+        stats   : {'kept_turns', 'summarized_turns', 'dropped_turns', 'history_tokens'}
+
+    예산이 부족하면 오래된 원문 턴부터 요약으로 넘기고, 그래도 넘치면 오래된 요약 줄부터 버립니다.
+    최신 user 메시지는 항상 원문으로 남깁니다.
+    """
+    turns = _split_turns(chat_history)
+    history_budget = max(token_budget - reserved_tokens, 0)
+
+    split = max(len(turns) - max(keep_turns, 1), 0)
+    old_turns, recent_turns = turns[:split], turns[split:]
+
+    def _recent_tokens():
+        return estimate_message_tokens([m for t in recent_turns for m in t])
+
+    # 1) 원문 턴이 예산을 넘으면 오래된 것부터 요약으로 이동 (최신 턴은 유지)
+    while len(recent_turns) > 1 and _recent_tokens() > history_budget:
+        old_turns.append(recent_turns.pop(0))
+
+    # 2) 남은 예산 안에서 최근 요약 줄부터 채움
+    summary_lines = []
+    remaining = history_budget - _recent_tokens() - estimate_tokens("[이전 대화 요약]\n")
+    for turn in reversed(old_turns):
+        line = _summarize_turn(turn)
+        cost = estimate_tokens(line) + 1
+        if cost > remaining:
+            break
+        summary_lines.insert(0, line)
+        remaining -= cost
+
+    messages = [m for t in recent_turns for m in t]
+    if summary_lines:
+        messages = [_summary_message(summary_lines)] + messages
+
+    stats = {
+        'kept_turns': len(recent_turns),
+        'summarized_turns': len(summary_lines),
+        'dropped_turns': len(old_turns) - len(summary_lines),
+        'history_tokens': estimate_message_tokens(messages),
+    }
+    return messages, stats
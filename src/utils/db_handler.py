@@ -1,11 +1,39 @@
+import functools
+import json
+import pickle
 import sqlite3
 import pandas as pd
 import os
+import queue
 import re
+import time
+from contextlib import contextmanager
+
+from utils.result_encoder import encode_result
 
 # DB 경로 및 파일명 변경 (InAsset의 아이덴티티 반영)
 DB_PATH = "data/inasset_v1.db"
 
+# 챗봇 쿼리용 읽기 전용 연결 풀 (동시 tool call 실행 시 연결 재사용)
+_RO_POOL_SIZE = 4
+_ro_pool: queue.LifoQueue = queue.LifoQueue(maxsize=_RO_POOL_SIZE)
+
+# 챗봇 쿼리 비용 제한 — 폭주 쿼리(교차 조인, 무한 재귀 CTE 등)를 조기에 중단
+_QUERY_TIMEOUT_MS = 2000           # 쿼리당 wall-clock 제한 (VM 단계 한도를 못 거르는 경우의 최후 방어선)
+# 쿼리당 SQLite VM 명령 수 제한 — 약 3만 steps/ms 기준 300ms 안팎에서 중단.
+# 32만 행 전체 기간 GROUP BY(약 600만 steps)는 통과하고, 그 이상의 폭주 쿼리는 시간 한도 전에 끊음
+_QUERY_MAX_VM_STEPS = 10_000_000
+_PROGRESS_INTERVAL = 10_000        # progress handler 호출 간격 (VM 명령 수)
+
+# 챗봇 쿼리에서 읽기를 허용하는 테이블 (authorizer 화이트리스트)
+_CHATBOT_READABLE_TABLES = {
+    'transactions', 'asset_snapshots', 'budgets',
+    'monthly_spend_summary', 'monthly_merchant_summary', 'net_worth_history',
+    'sqlite_master', 'sqlite_schema',
+}
+_CHATBOT_ALLOWED_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+_CHATBOT_DENIED_FUNCTIONS = {'load_extension', 'readfile', 'writefile', 'fts3_tokenizer'}
+
 def _init_db():
     directory = os.path.dirname(DB_PATH)
     if not os.path.exists(directory):
@@ -30,7 +58,8 @@ def _init_db():
                 currency TEXT,      -- 화폐
                 source TEXT,        -- 결제수단
                 memo TEXT,          -- 메모
-                owner TEXT,         -- 소유자 (남편/아내/공동)
+                owner TEXT,         -- 소유자 (남편/아내/공동) — owner_rules 적용 결과
+                source_owner TEXT,  -- 업로드한 파일의 소유자 (재업로드 시 기간 삭제 기준)
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """)
@@ -89,6 +118,280 @@ def _init_db():
         except Exception:
             pass
 
+        # 5. 앱 메타 정보 (data_version 등 key-value)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS app_meta (
+                key   TEXT PRIMARY KEY,
+                value TEXT
+            )
+        """)
+        cursor.execute("INSERT OR IGNORE INTO app_meta (key, value) VALUES ('data_version', '0')")
+
+        # 6. 챗봇 답변 캐시 — (정규화 질문, 날짜, data_version) 단위
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS chat_answer_cache (
+                question_key TEXT,
+                date_bucket  TEXT,     -- 질문 시점 날짜 (YYYY-MM-DD)
+                data_version INTEGER,  -- 캐시 생성 시점의 data_version
+                question     TEXT,     -- 원본 질문 (확인용)
+                sql          TEXT,     -- 실행된 SQL 목록 (JSON)
+                result       TEXT,     -- SQL 결과 문자열 목록 (JSON)
+                answer       TEXT,
+                hits         INTEGER DEFAULT 0,
+                created_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (question_key, date_bucket, data_version)
+            )
+        """)
+
+        # 7. 챗봇 생성 SQL 캐시 — 질문 지문 → 검증된 SQL (데이터가 바뀌어도 재실행해서 사용)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS chat_sql_cache (
+                fingerprint TEXT,
+                date_bucket TEXT,     -- SQL에 날짜 리터럴이 있으면 생성일, 없으면 ''
+                sql         TEXT,     -- 검증된 SQL 목록 (JSON)
+                hits        INTEGER DEFAULT 0,
+                created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (fingerprint, date_bucket)
+            )
+        """)
+
+        # 8. 집계 요약 테이블 (챗봇 전용 도구용) — transactions 변경 시 해당 월만 재계산
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS monthly_spend_summary (
+                year_month TEXT,     -- YYYY-MM
+                tx_type    TEXT,     -- 수입/지출 (이체 제외)
+                category   TEXT,     -- COALESCE(NULLIF(refined_category_1, ''), category_1)
+                owner      TEXT,
+                amount     INTEGER,  -- 합계 (지출 음수, 수입 양수)
+                tx_count   INTEGER
+            )
+        """)
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_mss_cat_owner_month "
+            "ON monthly_spend_summary (category, owner, year_month)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_mss_month ON monthly_spend_summary (year_month, tx_type)"
+        )
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS monthly_merchant_summary (
+                year_month  TEXT,
+                description TEXT,
+                category    TEXT,
+                owner       TEXT,
+                amount      INTEGER,  -- 지출 합계 (음수)
+                tx_count    INTEGER
+            )
+        """)
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_mms_month ON monthly_merchant_summary (year_month, owner)"
+        )
+
+        # 일 × 카테고리 × 소유자 지출 롤업 (분석 리포트 이상 지출 통계용)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS daily_spend_summary (
+                date         TEXT,     -- YYYY-MM-DD
+                year_month   TEXT,     -- YYYY-MM
+                day_of_month INTEGER,
+                category     TEXT,     -- COALESCE(NULLIF(refined_category_1, ''), category_1)
+                owner        TEXT,
+                amount       INTEGER,  -- 지출 합계 (건별 절댓값의 합, 양수)
+                tx_count     INTEGER
+            )
+        """)
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_dss_month_day ON daily_spend_summary (year_month, day_of_month, category)"
+        )
+
+        # 일 × 유형 × 카테고리 × 소유자 수입·지출 롤업 (수입/지출 현황 KPI용, 이체 제외)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS daily_flow_summary (
+                date         TEXT,     -- YYYY-MM-DD
+                year_month   TEXT,     -- YYYY-MM
+                day_of_month INTEGER,
+                tx_type      TEXT,     -- 수입/지출
+                category     TEXT,     -- COALESCE(NULLIF(refined_category_1, ''), category_1)
+                owner        TEXT,
+                income       INTEGER,  -- 양수 금액 합계
+                expense      INTEGER,  -- 음수 금액 합계 (음수)
+                amount       INTEGER,  -- 전체 합계
+                tx_count     INTEGER
+            )
+        """)
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_dfs_date_owner ON daily_flow_summary (date, owner)"
+        )
+
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_asset_snapshots_date_owner "
+            "ON asset_snapshots (snapshot_date, owner)"
+        )
+
+        # 스냅샷 날짜 × 소유자 순자산 (save_asset_snapshot에서 해당 행만 갱신)
+        # owner = '전체' 행은 날짜마다 각 소유자의 직전 스냅샷을 이월해 합산한 가구 합계
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS net_worth_history (
+                snapshot_date TEXT,
+                owner         TEXT,     -- 소유자 또는 '전체'
+                total_asset   INTEGER,
+                total_debt    INTEGER,  -- 양수
+                net_worth     INTEGER,  -- total_asset - total_debt
+                PRIMARY KEY (snapshot_date, owner)
+            )
+        """)
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_nwh_owner_date ON net_worth_history (owner, snapshot_date)"
+        )
+
+        # 9. LLM 호출 원장 — OpenAI 호출 1건(재시도 포함)당 1행
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS llm_usage_log (
+                id                INTEGER PRIMARY KEY AUTOINCREMENT,
+                called_at         TEXT DEFAULT (datetime('now', 'localtime')),
+                call_type         TEXT,     -- chat / mapping / summary
+                model             TEXT,
+                prompt_tokens     INTEGER DEFAULT 0,
+                completion_tokens INTEGER DEFAULT 0,
+                cached_tokens     INTEGER DEFAULT 0,
+                latency_ms        REAL,     -- 재시도·백오프 포함 전체 소요 시간
+                retries           INTEGER DEFAULT 0,
+                outcome           TEXT,     -- ok / error / circuit_open
+                error             TEXT,
+                cost_usd          REAL DEFAULT 0
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_called_at ON llm_usage_log (called_at)")
+
+        # 10. 분석 리포트 GPT 요약 — 메트릭 해시 단위로 저장 (같은 수치면 재생성하지 않음)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS analysis_summaries (
+                metrics_hash TEXT PRIMARY KEY,
+                summary      TEXT,
+                metrics      TEXT,     -- [anomaly_metrics, burnrate_metrics] JSON
+                created_at   TEXT DEFAULT (datetime('now', 'localtime'))
+            )
+        """)
+
+        # 11. 백그라운드 작업 (utils.job_runner) — 상태·진행률·로그·결과
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id      TEXT PRIMARY KEY,
+                kind        TEXT,               -- upload_mapping / recat_apply 등
+                label       TEXT,               -- 화면 표시용 설명
+                status      TEXT DEFAULT 'queued',  -- queued / running / done / failed
+                progress    REAL DEFAULT 0,     -- 0.0 ~ 1.0
+                message     TEXT,               -- 현재 단계 설명
+                logs        TEXT DEFAULT '',    -- 줄 단위 로그
+                result      BLOB,               -- pickle (DataFrame 포함 가능)
+                error       TEXT,
+                created_at  TEXT DEFAULT (datetime('now', 'localtime')),
+                started_at  TEXT,
+                finished_at TEXT
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs (created_at)")
+
+        # 12. 재분류 워터마크 — (description, category_1)별 마지막 재분류 시점의 거래 서명
+        #     서명(건수·합계·최종일)이 그대로면 다음 증분 재분류에서 GPT에 다시 보내지 않음
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS recat_watermarks (
+                description        TEXT,
+                category_1         TEXT,
+                tx_count           INTEGER,  -- 재분류한 기간의 거래 건수
+                amount_sum         INTEGER,  -- 재분류한 기간의 금액 합계
+                last_date          TEXT,     -- 재분류한 기간의 최종 거래일
+                mapped_at          TEXT DEFAULT (datetime('now', 'localtime')),
+                PRIMARY KEY (description, category_1)
+            )
+        """)
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_transactions_desc_cat ON transactions (description, category_1)"
+        )
+
+        # 13. 월 × 카테고리 × 소유자 이상 지출 (직전 12개월 평균 ± 2σ, analytics.refresh_spending_anomalies)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS spending_anomalies (
+                year_month TEXT,
+                category   TEXT,
+                owner      TEXT,     -- 소유자 또는 '전체'
+                amount     INTEGER,  -- 해당 월 지출 (양수)
+                mean       REAL,     -- 직전 12개월 평균
+                std        REAL,     -- 직전 12개월 표본 표준편차
+                z          REAL,     -- (amount - mean) / std, std = 0이면 NULL
+                is_anomaly INTEGER,  -- |amount - mean| > 2σ
+                PRIMARY KEY (year_month, category, owner)
+            )
+        """)
+
+        # 14. 자산 트렌드 예측 모델 적합 결과 (utils.forecasting) — data_version이 같으면 재사용
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS forecast_fits (
+                owner         TEXT,
+                model         TEXT,     -- linear / damped / seasonal
+                data_version  INTEGER,  -- 적합 당시 data_version
+                params        TEXT,     -- 모델 파라미터 JSON
+                base_date     TEXT,     -- 예측 시작점 (최신 스냅샷 날짜)
+                base_value    REAL,     -- 예측 시작점 순자산
+                fit_ms        REAL,
+                backtest_mape REAL,     -- 최근 6개월 홀드아웃 평균 절대 백분율 오차 (%)
+                created_at    TEXT DEFAULT (datetime('now', 'localtime')),
+                PRIMARY KEY (owner, model)
+            )
+        """)
+
+        # 15. 소유자 귀속 규칙 — 결제수단/내용에 pattern이 포함되면(대소문자 무시) owner로 귀속 (save_transactions에서 적용)
+        seed_owner_rules = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'owner_rules'"
+        ).fetchone() is None
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS owner_rules (
+                id       INTEGER PRIMARY KEY AUTOINCREMENT,
+                field    TEXT CHECK (field IN ('source', 'description')),
+                pattern  TEXT NOT NULL,
+                owner    TEXT NOT NULL,
+                priority INTEGER DEFAULT 0  -- 여러 규칙이 맞으면 큰 값 우선, 같으면 먼저 만든 규칙
+            )
+        """)
+
+        # 마이그레이션: source_owner 컬럼이 없는 기존 DB에 추가 (기존 행은 업로드 소유자 = owner)
+        # (컬럼을 새로 추가한 경우에만 한 번 채움 — 매 초기화마다 전체 스캔하지 않도록)
+        try:
+            cursor.execute("ALTER TABLE transactions ADD COLUMN source_owner TEXT")
+            cursor.execute("UPDATE transactions SET source_owner = owner WHERE source_owner IS NULL")
+        except Exception:
+            pass
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_transactions_source_owner_date ON transactions (source_owner, date)"
+        )
+        # 상세 내역 키셋 페이지네이션 (date DESC, time DESC, id DESC) — id는 rowid라 인덱스에 포함됨
+        add_keyset_index = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_transactions_date_time'"
+        ).fetchone() is None
+        if add_keyset_index:
+            # 인덱스를 처음 만들 때 한 번만: 키셋 비교에서 NULL 시간이 빠지지 않도록 저장 시 기본값과 맞춤
+            # (이후 행은 save_transactions가 시간을 채움)
+            cursor.execute("UPDATE transactions SET time = '00:00:00' WHERE time IS NULL")
+            cursor.execute("CREATE INDEX idx_transactions_date_time ON transactions (date, time)")
+
+        # 규칙 테이블을 처음 만들 때 기존 화면 보정(Mega·페이코 결제수단 → 윤희)을 규칙으로 옮기고 이력에 적용
+        if seed_owner_rules:
+            cursor.executemany(
+                "INSERT INTO owner_rules (field, pattern, owner) VALUES (?, ?, ?)",
+                [('source', 'Mega', '윤희'), ('source', '페이코', '윤희')],
+            )
+            if _apply_owner_rules(conn):
+                _refresh_summary_tables(conn)
+                _bump_data_version(conn)
+
+        # 기존 DB: 요약 테이블이 비어 있으면 한 번 채움 (새로 추가된 요약 테이블 포함)
+        if (cursor.execute("SELECT 1 FROM transactions LIMIT 1").fetchone() is not None
+                and any(cursor.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() is None
+                        for table in ('monthly_spend_summary', 'daily_spend_summary', 'daily_flow_summary'))):
+            _refresh_summary_tables(conn)
+        if (cursor.execute("SELECT 1 FROM net_worth_history LIMIT 1").fetchone() is None
+                and cursor.execute("SELECT 1 FROM asset_snapshots LIMIT 1").fetchone() is not None):
+            _refresh_net_worth_history(conn)
+
 def get_connection():
     """데이터베이스 연결 객체를 반환합니다."""
     # DB 파일이 존재하는지 체크 (선택 사항)
@@ -99,6 +402,210 @@ def get_connection():
     conn = sqlite3.connect(DB_PATH)
     return conn
 
+_CATEGORY_EXPR = "COALESCE(NULLIF(refined_category_1, ''), category_1)"
+
+# 요약 테이블 → transactions에서 다시 채우는 INSERT 문 (WHERE 절의 date 범위는 호출 시 지정)
+_SUMMARY_TABLE_INSERTS = {
+    'monthly_spend_summary': f"""
+        INSERT INTO monthly_spend_summary (year_month, tx_type, category, owner, amount, tx_count)
+        SELECT substr(date, 1, 7), tx_type, {_CATEGORY_EXPR}, owner, SUM(amount), COUNT(*)
+        FROM transactions
+        WHERE tx_type != '이체' AND date >= ? AND date <= ?
+        GROUP BY substr(date, 1, 7), tx_type, {_CATEGORY_EXPR}, owner
+    """,
+    'monthly_merchant_summary': f"""
+        INSERT INTO monthly_merchant_summary (year_month, description, category, owner, amount, tx_count)
+        SELECT substr(date, 1, 7), description, {_CATEGORY_EXPR}, owner, SUM(amount), COUNT(*)
+        FROM transactions
+        WHERE tx_type = '지출' AND description IS NOT NULL AND date >= ? AND date <= ?
+        GROUP BY substr(date, 1, 7), description, {_CATEGORY_EXPR}, owner
+    """,
+    'daily_spend_summary': f"""
+        INSERT INTO daily_spend_summary (date, year_month, day_of_month, category, owner, amount, tx_count)
+        SELECT date, substr(date, 1, 7), CAST(substr(date, 9, 2) AS INTEGER), {_CATEGORY_EXPR}, owner,
+               SUM(ABS(amount)), COUNT(*)
+        FROM transactions
+        WHERE tx_type = '지출' AND date >= ? AND date <= ?
+        GROUP BY date, {_CATEGORY_EXPR}, owner
+    """,
+    'daily_flow_summary': f"""
+        INSERT INTO daily_flow_summary
+            (date, year_month, day_of_month, tx_type, category, owner, income, expense, amount, tx_count)
+        SELECT date, substr(date, 1, 7), CAST(substr(date, 9, 2) AS INTEGER), tx_type, {_CATEGORY_EXPR},
+               owner,
+               SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END),
+               SUM(CASE WHEN amount < 0 THEN amount ELSE 0 END),
+               SUM(amount), COUNT(*)
+        FROM transactions
+        WHERE tx_type != '이체' AND date >= ? AND date <= ?
+        GROUP BY date, tx_type, {_CATEGORY_EXPR}, owner
+    """,
+}
+
+
+def _refresh_summary_tables(conn: sqlite3.Connection, start_date: str = None, end_date: str = None):
+    """
+    집계 요약 테이블을 transactions 기준으로 다시 계산합니다.
+    start_date/end_date가 주어지면 해당 기간이 걸친 월만 지우고 다시 채웁니다 (증분 갱신).
+    호출자의 트랜잭션 안에서 실행되므로 commit은 호출자가 합니다.
+    """
+    if start_date is None or end_date is None:
+        start_ym, end_ym = '0000-00', '9999-99'
+    else:
+        start_ym, end_ym = str(start_date)[:7], str(end_date)[:7]
+    for table, insert_sql in _SUMMARY_TABLE_INSERTS.items():
+        conn.execute(f"DELETE FROM {table} WHERE year_month >= ? AND year_month <= ?", (start_ym, end_ym))
+        conn.execute(insert_sql, (f"{start_ym}-01", f"{end_ym}-31"))
+
+
+# 거래 1건에 맞는 소유자 규칙의 owner (없으면 업로드 소유자)
+_RULE_OWNER_EXPR = """COALESCE((
+    SELECT r.owner FROM owner_rules r
+    WHERE instr(lower(CASE r.field WHEN 'source' THEN transactions.source ELSE transactions.description END),
+                lower(r.pattern)) > 0
+    ORDER BY r.priority DESC, r.id
+    LIMIT 1
+), transactions.source_owner)"""
+
+
+def _apply_owner_rules(conn: sqlite3.Connection, start_date: str = None, end_date: str = None,
+                       source_owner: str = None) -> int:
+    """
+    owner_rules를 transactions.owner에 적용하고 실제로 바뀐 행 수를 반환합니다.
+    기간·업로드 소유자를 주면 해당 범위만 처리합니다. 호출자의 트랜잭션 안에서 실행되므로 commit은 호출자가 합니다.
+    """
+    conditions, params = [f"owner IS NOT {_RULE_OWNER_EXPR}"], []
+    if start_date is not None and end_date is not None:
+        conditions.append("date >= ? AND date <= ?")
+        params += [str(start_date), str(end_date)]
+    if source_owner is not None:
+        conditions.append("source_owner = ?")
+        params.append(source_owner)
+    cursor = conn.execute(
+        f"UPDATE transactions SET owner = {_RULE_OWNER_EXPR} WHERE {' AND '.join(conditions)}", params
+    )
+    return cursor.rowcount
+
+
+def _refresh_net_worth_history(conn: sqlite3.Connection, snapshot_date: str = None, owner: str = None):
+    """
+    net_worth_history를 asset_snapshots 기준으로 갱신합니다.
+    snapshot_date/owner가 주어지면 그 (날짜, 소유자) 행과, 그 날짜 이후의 '전체' 행만 다시 계산합니다.
+    호출자의 트랜잭션 안에서 실행되므로 commit은 호출자가 합니다.
+    """
+    if snapshot_date is None or owner is None:
+        conn.execute("DELETE FROM net_worth_history")
+        owner_filter, owner_params, household_from = "", (), '0000-00-00'
+    else:
+        conn.execute("DELETE FROM net_worth_history WHERE snapshot_date = ? AND owner = ?", (snapshot_date, owner))
+        owner_filter, owner_params, household_from = "WHERE snapshot_date = ? AND owner = ?", (snapshot_date, owner), snapshot_date
+    conn.execute(f"""
+        INSERT INTO net_worth_history (snapshot_date, owner, total_asset, total_debt, net_worth)
+        SELECT
+            snapshot_date,
+            owner,
+            SUM(CASE WHEN balance_type = '자산' THEN amount ELSE 0 END),
+            SUM(CASE WHEN balance_type = '부채' THEN amount ELSE 0 END),
+            SUM(CASE WHEN balance_type = '자산' THEN amount
+                     WHEN balance_type = '부채' THEN -amount
+                     ELSE 0 END)
+        FROM asset_snapshots
+        {owner_filter}
+        GROUP BY snapshot_date, owner
+    """, owner_params)
+
+    # 가구 합계: 각 날짜에 소유자별 가장 최근(해당 날짜 이하) 스냅샷을 합산
+    conn.execute("DELETE FROM net_worth_history WHERE owner = '전체' AND snapshot_date >= ?", (household_from,))
+    conn.execute("""
+        INSERT INTO net_worth_history (snapshot_date, owner, total_asset, total_debt, net_worth)
+        SELECT d.snapshot_date, '전체', SUM(h.total_asset), SUM(h.total_debt), SUM(h.net_worth)
+        FROM (SELECT DISTINCT snapshot_date FROM net_worth_history
+              WHERE owner != '전체' AND snapshot_date >= ?) d
+        JOIN net_worth_history h
+          ON h.owner != '전체'
+         AND h.snapshot_date = (
+                SELECT MAX(h2.snapshot_date) FROM net_worth_history h2
+                WHERE h2.owner = h.owner AND h2.snapshot_date <= d.snapshot_date
+             )
+        GROUP BY d.snapshot_date
+    """, (household_from,))
+
+
+def _bump_data_version(conn: sqlite3.Connection) -> int:
+    """
+    데이터가 바뀔 때마다 호출하여 data_version을 1 올립니다.
+    이전 버전 기준으로 만들어진 챗봇 답변 캐시는 함께 삭제됩니다.
+    호출자의 트랜잭션 안에서 실행되므로 commit은 호출자가 합니다.
+    """
+    conn.execute("INSERT OR IGNORE INTO app_meta (key, value) VALUES ('data_version', '0')")
+    conn.execute(
+        "UPDATE app_meta SET value = CAST(CAST(value AS INTEGER) + 1 AS TEXT) WHERE key = 'data_version'"
+    )
+    version = int(conn.execute("SELECT value FROM app_meta WHERE key = 'data_version'").fetchone()[0])
+    conn.execute("DELETE FROM chat_answer_cache WHERE data_version < ?", (version,))
+    return version
+
+
+def get_data_version() -> int:
+    """현재 data_version을 반환합니다. 거래·자산·예산 데이터가 바뀔 때마다 증가합니다."""
+    if not os.path.exists(DB_PATH):
+        return 0
+    try:
+        with sqlite3.connect(DB_PATH) as conn:
+            row = conn.execute("SELECT value FROM app_meta WHERE key = 'data_version'").fetchone()
+            return int(row[0]) if row else 0
+    except sqlite3.OperationalError:
+        return 0
+
+
+# WITH 절에서 정의한 CTE 이름 (authorizer는 CTE 읽기도 테이블 읽기로 알림)
+_CTE_NAME_RE = re.compile(r'(?:\bWITH(?:\s+RECURSIVE)?|,)\s*("?)(\w+)\1\s*(?:\([^)]*\))?\s*AS\s*(?:NOT\s+)?(?:MATERIALIZED\s*)?\(', re.IGNORECASE)
+
+
+def _chatbot_authorizer(action, arg1, arg2, db_name, trigger, cte_names: frozenset = frozenset()):
+    """
+    챗봇 쿼리용 SQLite authorizer. SELECT·허용 테이블 읽기·일반 함수·재귀 CTE만 허용합니다.
+    SQLITE_READ의 arg1은 테이블명(쿼리에서 정의한 CTE 이름 포함), SQLITE_FUNCTION의 arg2는 함수명입니다.
+    """
+    if action not in _CHATBOT_ALLOWED_ACTIONS:
+        return sqlite3.SQLITE_DENY
+    if action == sqlite3.SQLITE_READ and arg1 not in _CHATBOT_READABLE_TABLES and arg1 not in cte_names:
+        return sqlite3.SQLITE_DENY
+    if action == sqlite3.SQLITE_FUNCTION and (arg2 or '').lower() in _CHATBOT_DENIED_FUNCTIONS:
+        return sqlite3.SQLITE_DENY
+    return sqlite3.SQLITE_OK
+
+
+def _open_readonly_connection() -> sqlite3.Connection:
+    """
+    mode=ro URI로 읽기 전용 연결을 열고 챗봇용 authorizer를 등록합니다.
+    스레드 간 반납·재사용을 위해 check_same_thread=False.
+    """
+    uri = f"file:{os.path.abspath(DB_PATH)}?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    conn.set_authorizer(_chatbot_authorizer)
+    return conn
+
+
+@contextmanager
+def _readonly_connection():
+    """
+    풀에서 읽기 전용 연결을 빌려오고, 사용 후 반납합니다.
+    풀이 비어 있으면 새로 열고, 풀이 가득 차 있으면 반납 대신 닫습니다.
+    """
+    try:
+        conn = _ro_pool.get_nowait()
+    except queue.Empty:
+        conn = _open_readonly_connection()
+    try:
+        yield conn
+    finally:
+        try:
+            _ro_pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
 def save_transactions(df, owner=None, filename="unknown.xlsx"):
     """
     지정된 기간과 소유자에 해당하는 기존 데이터를 삭제한 후, 새로운 데이터를 저장합니다.
@@ -122,6 +629,7 @@ def save_transactions(df, owner=None, filename="unknown.xlsx"):
     rename_df = df.rename(columns=mapping).copy()
 
     rename_df['owner'] = owner
+    rename_df['source_owner'] = owner
     rename_df['source_file'] = filename
     rename_df['date'] = pd.to_datetime(rename_df['date']).dt.strftime('%Y-%m-%d')
     
@@ -132,7 +640,7 @@ def save_transactions(df, owner=None, filename="unknown.xlsx"):
         rename_df['time'] = '00:00:00'
 
     # 4. DB에 저장할 최종 컬럼 리스트 정의
-    valid_columns = list(mapping.values()) + ['owner', 'refined_category_1']
+    valid_columns = list(mapping.values()) + ['owner', 'source_owner', 'refined_category_1']
 
     # 5. 데이터프레임에 해당 컬럼들이 있는지 확인 후 필터링
     # (혹시라도 매핑되지 않은 컬럼이 있을 경우를 대비해 존재하는 것만 추림)
@@ -145,12 +653,15 @@ def save_transactions(df, owner=None, filename="unknown.xlsx"):
     with sqlite3.connect(DB_PATH) as conn:
         cursor = conn.cursor()
         
-        # 2. "감지된 기간" 내의 "해당 소유자" 데이터만 삭제
-        delete_query = "DELETE FROM transactions WHERE owner = ? AND date >= ? AND date <= ?"
+        # 2. "감지된 기간" 내의 "해당 소유자 파일" 데이터만 삭제 (규칙으로 다른 소유자에 귀속된 행 포함)
+        delete_query = "DELETE FROM transactions WHERE source_owner = ? AND date >= ? AND date <= ?"
         cursor.execute(delete_query, (owner, min_date, max_date))
         
-        # 3. 새로운 데이터 삽입 (Bulk Insert)
+        # 3. 새로운 데이터 삽입 (Bulk Insert) 후 소유자 규칙 적용
         final_df.to_sql('transactions', conn, if_exists='append', index=False)
+        _apply_owner_rules(conn, min_date, max_date, owner)
+        _refresh_summary_tables(conn, min_date, max_date)
+        _bump_data_version(conn)
         conn.commit()
 
     return len(final_df)    
@@ -223,6 +734,8 @@ def save_asset_snapshot(df, owner=None, snapshot_date=None):
             (target_date, target_owner)
         )
         df.to_sql('asset_snapshots', conn, if_exists='append', index=False)
+        _refresh_net_worth_history(conn, target_date, target_owner)
+        _bump_data_version(conn)
         conn.commit()
 
     return len(df)
@@ -239,16 +752,23 @@ def clear_all_data():
         conn.execute("DELETE FROM transactions")
         conn.execute("DELETE FROM asset_snapshots")
         conn.execute("DELETE FROM processed_files")
+        conn.execute("DELETE FROM recat_watermarks")
+        conn.execute("DELETE FROM spending_anomalies")
+        conn.execute("DELETE FROM app_meta WHERE key = ?", (_ANOMALY_WATERMARK_KEY,))
+        conn.execute("DELETE FROM net_worth_history")
+        conn.execute("DELETE FROM forecast_fits")
+        _refresh_summary_tables(conn)
+        _bump_data_version(conn)
         conn.commit()
 
 
 def has_transactions_in_range(owner: str, start_date: str, end_date: str) -> bool:
-    """지정 기간에 해당 소유자의 거래내역이 존재하는지 확인합니다."""
+    """지정 기간에 해당 소유자가 업로드한 거래내역이 존재하는지 확인합니다."""
     if not os.path.exists(DB_PATH):
         return False
     with sqlite3.connect(DB_PATH) as conn:
         cursor = conn.execute(
-            "SELECT 1 FROM transactions WHERE owner = ? AND date >= ? AND date <= ? LIMIT 1",
+            "SELECT 1 FROM transactions WHERE source_owner = ? AND date >= ? AND date <= ? LIMIT 1",
             (owner, start_date, end_date),
         )
         return cursor.fetchone() is not None
@@ -526,9 +1046,61 @@ def save_budgets(df: pd.DataFrame):
     with sqlite3.connect(db_path_fixed) as conn:
         conn.execute("DELETE FROM budgets")
         save_df.to_sql('budgets', conn, if_exists='append', index=False)
+        _bump_data_version(conn)
+        conn.commit()
+
+
+def get_owner_rules() -> pd.DataFrame:
+    """소유자 귀속 규칙 [id, field, pattern, owner, priority]를 우선순위 순으로 반환합니다."""
+    if not os.path.exists(DB_PATH):
+        return pd.DataFrame(columns=['id', 'field', 'pattern', 'owner', 'priority'])
+    with sqlite3.connect(DB_PATH) as conn:
+        return pd.read_sql_query(
+            "SELECT id, field, pattern, owner, priority FROM owner_rules ORDER BY priority DESC, id", conn
+        )
+
+
+def save_owner_rules(df: pd.DataFrame):
+    """
+    소유자 귀속 규칙을 모두 교체합니다. 기존 거래에는 reapply_owner_rules()를 호출해야 반영됩니다.
+    pattern·owner가 빈 행은 무시합니다.
+    """
+    _init_db()
+    required = {'field', 'pattern', 'owner'}
+    if not required.issubset(df.columns):
+        raise ValueError(f"owner_rules 저장에 필요한 컬럼이 없습니다: {required - set(df.columns)}")
+
+    save_df = df.copy()
+    save_df['pattern'] = save_df['pattern'].fillna('').astype(str).str.strip()
+    save_df['owner'] = save_df['owner'].fillna('').astype(str).str.strip()
+    save_df = save_df[(save_df['pattern'] != '') & (save_df['owner'] != '')]
+    invalid = set(save_df['field']) - {'source', 'description'}
+    if invalid:
+        raise ValueError(f"규칙 대상은 source 또는 description이어야 합니다: {invalid}")
+    save_df['priority'] = save_df.get('priority', 0)
+    save_df['priority'] = save_df['priority'].fillna(0).astype(int)
+
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.execute("DELETE FROM owner_rules")
+        save_df[['field', 'pattern', 'owner', 'priority']].to_sql('owner_rules', conn, if_exists='append', index=False)
         conn.commit()
 
 
+def reapply_owner_rules() -> int:
+    """
+    현재 소유자 규칙을 전체 거래 이력에 다시 적용하고 소유자가 바뀐 거래 수를 반환합니다.
+    바뀐 거래가 있으면 요약 테이블을 다시 계산하고 data_version을 올립니다.
+    """
+    _init_db()
+    with sqlite3.connect(DB_PATH) as conn:
+        changed = _apply_owner_rules(conn)
+        if changed:
+            _refresh_summary_tables(conn)
+            _bump_data_version(conn)
+        conn.commit()
+    return changed
+
+
 def get_category_avg_monthly(months: int = 12) -> pd.DataFrame:
     """
     최근 N개월간 카테고리별 월평균 지출 금액을 반환합니다.
@@ -582,22 +1154,39 @@ def get_transactions_for_reclassification(start_date: str, end_date: str) -> pd.
     """
     지정 기간 내 고유 description별 (category_1, refined_category_1, 건수)를 반환합니다.
     카테고리 재분류 UI의 입력 데이터로 사용됩니다.
+
+    is_stale 컬럼: 재분류 이력이 없거나, 마지막 재분류 때와 조회 기간의 거래가 달라
+    (기간 내 건수·합계·최종일 서명이 다름 — 다른 기간이거나 거래 추가·삭제·변경) 다시 분류해야 하면 1.
+    증분 재분류는 is_stale = 1인 항목만 GPT에 보냅니다.
     """
     if not os.path.exists(DB_PATH):
         return pd.DataFrame()
     query = """
+        WITH in_range AS (
+            SELECT
+                description,
+                category_1,
+                MIN(tx_type)                                AS tx_type,
+                MAX(COALESCE(refined_category_1, ''))       AS current_refined,
+                COUNT(*)                                    AS tx_count,
+                SUM(amount)                                 AS amount_sum,
+                MAX(date)                                   AS last_date
+            FROM transactions
+            WHERE date >= ? AND date <= ?
+              AND tx_type != '이체'
+              AND description IS NOT NULL
+            GROUP BY description, category_1
+        )
         SELECT
-            description,
-            category_1,
-            MIN(tx_type)                                AS tx_type,
-            MAX(COALESCE(refined_category_1, ''))       AS current_refined,
-            COUNT(*)                                    AS tx_count
-        FROM transactions
-        WHERE date >= ? AND date <= ?
-          AND tx_type != '이체'
-          AND description IS NOT NULL
-        GROUP BY description, category_1
-        ORDER BY category_1, description
+            r.description, r.category_1, r.tx_type, r.current_refined, r.tx_count,
+            CASE WHEN w.description IS NULL
+                   OR w.tx_count   IS NOT r.tx_count
+                   OR w.amount_sum IS NOT r.amount_sum
+                   OR w.last_date  IS NOT r.last_date
+                 THEN 1 ELSE 0 END                      AS is_stale
+        FROM in_range r
+        LEFT JOIN recat_watermarks w ON w.description = r.description AND w.category_1 IS r.category_1
+        ORDER BY r.category_1, r.description
     """
     with sqlite3.connect(DB_PATH) as conn:
         return pd.read_sql_query(query, conn, params=(start_date, end_date))
@@ -606,6 +1195,7 @@ def get_transactions_for_reclassification(start_date: str, end_date: str) -> pd.
 def update_refined_categories(mapping: dict, start_date: str, end_date: str) -> int:
     """
     지정 기간 내 transactions.refined_category_1을 (description, category_1) 기준으로 일괄 업데이트합니다.
+    반영한 항목마다 같은 기간의 거래 서명으로 recat_watermarks를 갱신합니다. (값이 그대로인 항목 포함)
 
     Args:
         mapping    : {(description, category_1): refined_category_1} 딕셔너리
@@ -623,18 +1213,325 @@ def update_refined_categories(mapping: dict, start_date: str, end_date: str) ->
             cursor = conn.execute(
                 """UPDATE transactions
                    SET refined_category_1 = ?
-                   WHERE description = ? AND category_1 = ? AND date >= ? AND date <= ?""",
+                   WHERE description = ? AND category_1 IS ? AND date >= ? AND date <= ?""",
                 (refined_cat, description, category_1, start_date, end_date),
             )
             total += cursor.rowcount
+        conn.executemany(
+            """INSERT OR REPLACE INTO recat_watermarks
+                   (description, category_1, tx_count, amount_sum, last_date, mapped_at)
+               SELECT ?, ?, COUNT(*), SUM(amount), MAX(date), datetime('now', 'localtime')
+               FROM transactions
+               WHERE description = ? AND category_1 IS ? AND date >= ? AND date <= ? AND tx_type != '이체'""",
+            [(d, c, d, c, start_date, end_date) for d, c in mapping],
+        )
+        if total:
+            _refresh_summary_tables(conn, start_date, end_date)
+            _bump_data_version(conn)
         conn.commit()
     return total
 
 
-def get_asset_history() -> pd.DataFrame:
+def get_same_period_spend_stats(current_ym: str, day: int, lookback_months: int = 12) -> tuple:
+    """
+    이상 지출 비교용 카테고리별 통계를 daily_spend_summary에서 SQL로 계산합니다.
+    과거 lookback_months개월 각각의 1일~day일 누적 지출로 평균·표본 분산을 구하고,
+    이번 달(current_ym) 누적과 함께 카테고리당 1행만 반환합니다.
+
+    Returns:
+        (stats_df, past_months)
+        stats_df   : [category, current_amount, mean, var, n_months] — 이번 달 지출이 있는 카테고리만
+        past_months: 과거 구간 중 지출이 있는 개월 수 (일자 제한 없음)
+    """
+    empty = pd.DataFrame(columns=['category', 'current_amount', 'mean', 'var', 'n_months'])
+    if not os.path.exists(DB_PATH):
+        return empty, 0
+    past_start = _month_offset(current_ym, -lookback_months)
+    query = """
+        WITH past_monthly AS (
+            SELECT year_month, category, SUM(amount) AS amount
+            FROM daily_spend_summary
+            WHERE year_month >= ? AND year_month < ? AND day_of_month <= ?
+            GROUP BY year_month, category
+        ),
+        past_stats AS (
+            SELECT category,
+                   COUNT(*)                     AS n_months,
+                   AVG(amount)                  AS mean,
+                   CASE WHEN COUNT(*) > 1
+                        THEN (SUM(amount * amount) - SUM(amount) * SUM(amount) * 1.0 / COUNT(*)) / (COUNT(*) - 1)
+                   END                          AS var
+            FROM past_monthly
+            GROUP BY category
+        ),
+        current_month AS (
+            SELECT category, SUM(amount) AS current_amount
+            FROM daily_spend_summary
+            WHERE year_month = ?
+            GROUP BY category
+        )
+        SELECT c.category, c.current_amount, p.mean, p.var, p.n_months
+        FROM current_month c
+        LEFT JOIN past_stats p ON p.category = c.category
+        ORDER BY c.category
+    """
+    with sqlite3.connect(DB_PATH) as conn:
+        stats = pd.read_sql_query(query, conn, params=(past_start, current_ym, int(day), current_ym))
+        past_months = conn.execute(
+            "SELECT COUNT(DISTINCT year_month) FROM daily_spend_summary WHERE year_month >= ? AND year_month < ?",
+            (past_start, current_ym),
+        ).fetchone()[0]
+    return stats, past_months
+
+
+def get_owner_monthly_flows(start_date: str, end_date: str, max_day: int) -> pd.DataFrame:
+    """
+    수입/지출 현황 KPI용 소유자 × 월 합계를 daily_flow_summary에서 한 번에 집계합니다.
+    start_date~end_date 중 매월 1일~max_day일 거래만 포함합니다. (이번 달 누적과 과거 동기간 비교를 한 쿼리로)
+
+    Returns:
+        [owner, year_month, income, expense, expense_ex, fixed, variable, variable_ex]
+        expense·fixed·variable은 음수 합계, *_ex는 예비비 제외
+    """
+    columns = ['owner', 'year_month', 'income', 'expense', 'expense_ex', 'fixed', 'variable', 'variable_ex']
+    if not os.path.exists(DB_PATH):
+        return pd.DataFrame(columns=columns)
+    query = """
+        SELECT
+            f.owner,
+            f.year_month,
+            SUM(f.income)                                                        AS income,
+            SUM(f.expense)                                                       AS expense,
+            SUM(CASE WHEN f.category = '예비비' THEN 0 ELSE f.expense END)       AS expense_ex,
+            SUM(CASE WHEN f.tx_type = '지출' AND B.is_fixed_cost = 1 THEN f.amount ELSE 0 END) AS fixed,
+            SUM(CASE WHEN f.tx_type = '지출' AND COALESCE(B.is_fixed_cost, 0) != 1
+                     THEN f.amount ELSE 0 END)                                   AS variable,
+            SUM(CASE WHEN f.tx_type = '지출' AND COALESCE(B.is_fixed_cost, 0) != 1 AND COALESCE(f.category, '') != '예비비'
+                     THEN f.amount ELSE 0 END)                                   AS variable_ex
+        FROM daily_flow_summary f
+        LEFT JOIN budgets B ON B.category = f.category
+        WHERE f.date >= ? AND f.date <= ? AND f.day_of_month <= ?
+        GROUP BY f.owner, f.year_month
+    """
+    with sqlite3.connect(DB_PATH) as conn:
+        return pd.read_sql_query(query, conn, params=(str(start_date), str(end_date), int(max_day)))
+
+
+_EXPENSE_TYPE_EXPR = """CASE
+                WHEN T.tx_type != '지출' THEN NULL
+                WHEN B.is_fixed_cost = 1 THEN '고정 지출'
+                ELSE '변동 지출'
+            END"""
+
+
+def get_transaction_facets() -> pd.DataFrame:
+    """
+    수입/지출 현황 페이지의 선택기·필터 목록용 조합을 daily_flow_summary에서 가져옵니다. (거래 원본을 읽지 않음)
+
+    Returns:
+        [year_month, owner, tx_type, category, expense_type, last_date]
+    """
+    columns = ['year_month', 'owner', 'tx_type', 'category', 'expense_type', 'last_date']
+    if not os.path.exists(DB_PATH):
+        return pd.DataFrame(columns=columns)
+    query = f"""
+        SELECT T.year_month, T.owner, T.tx_type, T.category,
+               {_EXPENSE_TYPE_EXPR} AS expense_type,
+               MAX(T.date) AS last_date
+        FROM daily_flow_summary T
+        LEFT JOIN budgets B ON B.category = T.category
+        GROUP BY T.year_month, T.owner, T.tx_type, T.category, expense_type
+    """
+    with sqlite3.connect(DB_PATH) as conn:
+        return pd.read_sql_query(query, conn)
+
+
+def _transaction_detail_where(owner: str = None, start_date: str = None, end_date: str = None,
+                              tx_types: list = None, categories: list = None,
+                              expense_types: list = None, search: str = None) -> tuple:
+    """상세 내역 필터 → (WHERE 절, 파라미터). owner가 None·'전체'면 전체 소유자."""
+    conditions, params = ["T.tx_type != '이체'"], []
+    if owner and owner != '전체':
+        conditions.append("T.owner = ?")
+        params.append(owner)
+    if start_date:
+        conditions.append("T.date >= ?")
+        params.append(str(start_date))
+    if end_date:
+        conditions.append("T.date <= ?")
+        params.append(str(end_date))
+    for expr, values in (("T.tx_type", tx_types),
+                         (f"COALESCE(NULLIF(T.refined_category_1, ''), T.category_1)", categories),
+                         (_EXPENSE_TYPE_EXPR, expense_types)):
+        if values:
+            conditions.append(f"{expr} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+    if search:
+        conditions.append("instr(lower(T.description), lower(?)) > 0")  # 대소문자 무시 부분 일치
+        params.append(search)
+    return " AND ".join(conditions), params
+
+
+def get_transaction_page(filters: dict, after: tuple = None, page_size: int = 50) -> tuple:
+    """
+    상세 내역 한 페이지를 (date, time, id) 내림차순 키셋 페이지네이션으로 가져옵니다.
+    OFFSET 없이 직전 페이지 마지막 행의 키 다음부터 읽으므로 페이지 위치와 관계없이 비용이 같습니다.
+
+    Args:
+        filters  : _transaction_detail_where 인자 (owner, start_date, end_date, tx_types, categories, expense_types, search)
+        after    : 직전 페이지 마지막 행의 (date, time, id). None이면 첫 페이지
+        page_size: 페이지당 행 수
+
+    Returns:
+        (page_df, next_after) — next_after는 다음 페이지가 없으면 None
+    """
+    columns = ['id', 'date', 'time', 'tx_type', 'category_1', 'description', 'amount',
+               'memo', 'owner', 'source', 'expense_type']
+    if not os.path.exists(DB_PATH):
+        return pd.DataFrame(columns=columns), None
+    where, params = _transaction_detail_where(**filters)
+    if after is not None:
+        where += " AND (T.date, T.time, T.id) < (?, ?, ?)"
+        params = params + list(after)
+    query = f"""
+        SELECT
+            T.id,
+            T.date,
+            T.time,
+            T.tx_type,
+            COALESCE(NULLIF(T.refined_category_1, ''), T.category_1) AS category_1,
+            T.description,
+            T.amount,
+            T.memo,
+            T.owner,
+            T.source,
+            {_EXPENSE_TYPE_EXPR} AS expense_type
+        FROM transactions T
+        LEFT JOIN budgets B ON COALESCE(NULLIF(T.refined_category_1, ''), T.category_1) = B.category
+        WHERE {where}
+        ORDER BY T.date DESC, T.time DESC, T.id DESC
+        LIMIT ?
+    """
+    with sqlite3.connect(DB_PATH) as conn:
+        page = pd.read_sql_query(query, conn, params=params + [page_size + 1])
+    if len(page) <= page_size:
+        return page, None
+    page = page.iloc[:page_size]
+    last = page.iloc[-1]
+    return page, (last['date'], last['time'], int(last['id']))
+
+
+def get_transaction_totals(filters: dict) -> dict:
+    """상세 내역 필터에 맞는 전체 건수·수입·지출 합계 {'count', 'income', 'expense'} (지출은 음수)."""
+    if not os.path.exists(DB_PATH):
+        return {'count': 0, 'income': 0, 'expense': 0}
+    where, params = _transaction_detail_where(**filters)
+    query = f"""
+        SELECT COUNT(*),
+               COALESCE(SUM(CASE WHEN T.amount > 0 THEN T.amount END), 0),
+               COALESCE(SUM(CASE WHEN T.amount < 0 THEN T.amount END), 0)
+        FROM transactions T
+        LEFT JOIN budgets B ON COALESCE(NULLIF(T.refined_category_1, ''), T.category_1) = B.category
+        WHERE {where}
+    """
+    with sqlite3.connect(DB_PATH) as conn:
+        count, income, expense = conn.execute(query, params).fetchone()
+    return {'count': count, 'income': income, 'expense': expense}
+
+
+def get_monthly_category_spend(start_ym: str = None, end_ym: str = None) -> tuple:
+    """
+    daily_spend_summary를 월 × 카테고리 × 소유자 지출 합계로 묶어 반환합니다. (이상 지출 히트맵 계산용)
+
+    Returns:
+        (monthly_df, owner_first_months)
+        monthly_df        : [year_month, category, owner, amount]
+        owner_first_months: {owner: 전체 이력 중 첫 지출 월} — 기간을 잘라 읽어도 데이터 시작점 판단용
+    """
+    if not os.path.exists(DB_PATH):
+        return pd.DataFrame(columns=['year_month', 'category', 'owner', 'amount']), {}
+    with sqlite3.connect(DB_PATH) as conn:
+        monthly = pd.read_sql_query(
+            """SELECT year_month, category, owner, SUM(amount) AS amount
+               FROM daily_spend_summary
+               WHERE year_month >= ? AND year_month <= ?
+               GROUP BY year_month, category, owner""",
+            conn, params=(start_ym or '0000-00', end_ym or '9999-99'),
+        )
+        first_months = dict(conn.execute(
+            "SELECT owner, MIN(year_month) FROM daily_spend_summary GROUP BY owner"
+        ).fetchall())
+    return monthly, first_months
+
+
+def replace_spending_anomalies(df: pd.DataFrame, start_ym: str, end_ym: str):
+    """spending_anomalies의 start_ym~end_ym 구간을 df로 교체합니다."""
+    _init_db()
+    columns = ['year_month', 'category', 'owner', 'amount', 'mean', 'std', 'z', 'is_anomaly']
+    rows = [
+        tuple(None if pd.isna(v) else v for v in row)
+        for row in df[columns].astype(object).itertuples(index=False, name=None)
+    ]
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.execute("DELETE FROM spending_anomalies WHERE year_month >= ? AND year_month <= ?", (start_ym, end_ym))
+        conn.executemany(
+            f"INSERT INTO spending_anomalies ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            rows,
+        )
+        conn.commit()
+
+
+# app_meta 키: 이상 지출 결과가 어느 data_version·월까지 반영됐는지 ("버전:YYYY-MM")
+_ANOMALY_WATERMARK_KEY = 'spending_anomalies_watermark'
+
+
+def get_anomaly_watermark() -> tuple | None:
+    """spending_anomalies 워터마크 (data_version, 반영된 마지막 월). 기록이 없으면 None."""
+    if not os.path.exists(DB_PATH):
+        return None
+    try:
+        with sqlite3.connect(DB_PATH) as conn:
+            row = conn.execute("SELECT value FROM app_meta WHERE key = ?", (_ANOMALY_WATERMARK_KEY,)).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    if not row:
+        return None
+    version, year_month = row[0].split(':', 1)
+    return int(version), year_month
+
+
+def set_anomaly_watermark(version: int, year_month: str):
+    """spending_anomalies가 data_version 기준 year_month까지 최신임을 기록합니다."""
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO app_meta (key, value) VALUES (?, ?)",
+            (_ANOMALY_WATERMARK_KEY, f"{int(version)}:{year_month}"),
+        )
+        conn.commit()
+
+
+def get_spending_anomalies(owner: str = '전체') -> pd.DataFrame:
+    """
+    저장된 월별 이상 지출 결과를 반환합니다.
+    Returns: DataFrame with [year_month, category, owner, amount, mean, std, z, is_anomaly]
     """
-    전체 자산 스냅샷 이력을 snapshot_date × owner 기준으로 집계합니다.
+    if not os.path.exists(DB_PATH):
+        return pd.DataFrame()
+    with sqlite3.connect(DB_PATH) as conn:
+        return pd.read_sql_query(
+            """SELECT year_month, category, owner, amount, mean, std, z, is_anomaly
+               FROM spending_anomalies WHERE owner = ? ORDER BY year_month, category""",
+            conn, params=(owner,),
+        )
+
+
+def get_asset_history(owner: str = None) -> pd.DataFrame:
+    """
+    자산 스냅샷 이력을 snapshot_date × owner 기준으로 반환합니다. (net_worth_history 사전 집계)
     부채는 DB에 양수로 저장되므로 net_worth 계산 시 차감합니다.
+
+    Args:
+        owner: None이면 소유자별 행 전체, '전체'면 직전 스냅샷을 이월한 가구 합계, 그 외는 해당 소유자만
     Returns: DataFrame with [snapshot_date, owner, total_asset, total_debt, net_worth]
     """
     base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -643,29 +1540,96 @@ def get_asset_history() -> pd.DataFrame:
     if not os.path.exists(db_path_fixed):
         return pd.DataFrame(columns=['snapshot_date', 'owner', 'total_asset', 'total_debt', 'net_worth'])
 
-    query = """
-        SELECT
-            snapshot_date,
-            owner,
-            SUM(CASE WHEN balance_type = '자산' THEN amount ELSE 0 END) AS total_asset,
-            SUM(CASE WHEN balance_type = '부채' THEN amount ELSE 0 END) AS total_debt,
-            SUM(CASE WHEN balance_type = '자산' THEN amount
-                     WHEN balance_type = '부채' THEN -amount
-                     ELSE 0 END) AS net_worth
-        FROM asset_snapshots
-        GROUP BY snapshot_date, owner
-        ORDER BY snapshot_date ASC
+    condition, params = ("owner != '전체'", ()) if owner is None else ("owner = ?", (owner,))
+    query = f"""
+        SELECT snapshot_date, owner, total_asset, total_debt, net_worth
+        FROM net_worth_history
+        WHERE {condition}
+        ORDER BY snapshot_date ASC, owner
     """
     with sqlite3.connect(db_path_fixed) as conn:
-        return pd.read_sql_query(query, conn)
+        return pd.read_sql_query(query, conn, params=params)
+
+
+def get_monthly_net_savings(owner: str = None) -> pd.DataFrame:
+    """
+    월별 순저축(수입 + 지출, 지출은 음수)을 monthly_spend_summary에서 조회합니다.
+    owner가 None 또는 '전체'면 가구 전체 합계입니다.
+    Returns: DataFrame with [year_month, savings]
+    """
+    if not os.path.exists(DB_PATH):
+        return pd.DataFrame(columns=['year_month', 'savings'])
+    condition, params = ("", ()) if owner in (None, '전체') else ("WHERE owner = ?", (owner,))
+    with sqlite3.connect(DB_PATH) as conn:
+        return pd.read_sql_query(
+            f"""SELECT year_month, SUM(amount) AS savings
+                FROM monthly_spend_summary {condition}
+                GROUP BY year_month ORDER BY year_month""",
+            conn, params=params,
+        )
 
 
-def execute_query_safe(sql: str, max_rows: int = 200) -> str:
+def get_forecast_fit(owner: str, model: str) -> dict | None:
+    """
+    저장된 예측 모델 적합 결과를 조회합니다.
+    Returns: {'data_version', 'params'(dict), 'base_date', 'base_value', 'fit_ms', 'backtest_mape'} 또는 None
+    """
+    if not os.path.exists(DB_PATH):
+        return None
+    try:
+        with sqlite3.connect(DB_PATH) as conn:
+            row = conn.execute(
+                """SELECT data_version, params, base_date, base_value, fit_ms, backtest_mape
+                   FROM forecast_fits WHERE owner = ? AND model = ?""",
+                (owner, model),
+            ).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    if row is None:
+        return None
+    return {
+        'data_version': row[0], 'params': json.loads(row[1]), 'base_date': row[2],
+        'base_value': row[3], 'fit_ms': row[4], 'backtest_mape': row[5],
+    }
+
+
+def save_forecast_fit(owner: str, model: str, data_version: int, params: dict,
+                      base_date: str, base_value: float, fit_ms: float, backtest_mape: float | None):
+    """예측 모델 적합 결과를 (owner, model) 단위로 저장(덮어쓰기)합니다."""
+    _init_db()
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.execute(
+            """INSERT OR REPLACE INTO forecast_fits
+                   (owner, model, data_version, params, base_date, base_value, fit_ms, backtest_mape, created_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, datetime('now', 'localtime'))""",
+            (owner, model, data_version, json.dumps(params), base_date, base_value, fit_ms, backtest_mape),
+        )
+        conn.commit()
+
+
+def execute_query_safe(
+    sql: str,
+    max_rows: int = 200,
+    timeout_ms: int = _QUERY_TIMEOUT_MS,
+    max_vm_steps: int = _QUERY_MAX_VM_STEPS,
+    count_total: bool = False,
+) -> str:
     """
     챗봇이 생성한 SELECT 쿼리를 안전하게 실행합니다.
-    SELECT/WITH 쿼리만 허용하고, 결과를 문자열로 반환합니다.
+    SELECT/WITH 쿼리만 허용하고, 결과를 utils.result_encoder 형식의 압축 문자열로 반환합니다.
+    읽기 전용 연결 풀을 사용하므로 여러 스레드에서 동시에 호출해도 됩니다.
+
+    비용 제한:
+      - mode=ro 연결 + authorizer 화이트리스트 (SELECT, 허용 테이블 READ, 함수, 재귀 CTE)
+      - progress handler로 VM 명령 수(max_vm_steps, 기본 1천만 ≈ 수백 ms)와
+        실행 시간(timeout_ms, 기본 2초) 중 먼저 넘는 쪽에서 중단
+      - 바깥에 LIMIT max_rows + 1을 씌워 필요한 행까지만 계산
+      - 커서에서 fetchmany(max_rows + 1)로 가져와 잘림 여부만 판단 (전체 결과를 DataFrame으로 올리지 않음)
+      - count_total=True이고 결과가 잘렸을 때만 COUNT(*)로 전체 행 수를 추가 계산
+    중단된 경우 GPT가 쿼리를 고칠 수 있도록 이유를 담은 "쿼리 중단:" 메시지를 반환합니다.
     """
-    sql_stripped = sql.strip()
+    # 끝의 세미콜론과 그 뒤 한 줄 주석 제거 (안쪽 쿼리로 감쌀 때 문법 오류 방지)
+    sql_stripped = re.sub(r'(\s*;)+\s*(--[^\n]*)?\s*$', '', sql.strip()).strip()
     sql_upper = sql_stripped.upper()
 
     if not (sql_upper.startswith('SELECT') or sql_upper.startswith('WITH')):
@@ -679,24 +1643,477 @@ def execute_query_safe(sql: str, max_rows: int = 200) -> str:
     if not os.path.exists(DB_PATH):
         return "데이터베이스가 없습니다. 먼저 데이터를 업로드해주세요."
 
+    # 안쪽 쿼리를 별도 줄에 두어 끝에 남은 '-- 주석'이 닫는 괄호·LIMIT을 삼키지 않게 함
+    limited_sql = "SELECT * FROM (\n" + sql_stripped + f"\n) LIMIT {int(max_rows) + 1}"
+    deadline = time.monotonic() + timeout_ms / 1000
+    budget = {'steps': 0, 'reason': None}
+
+    def _guard():
+        budget['steps'] += _PROGRESS_INTERVAL
+        if budget['steps'] > max_vm_steps:
+            budget['reason'] = f"실행 단계 한도({max_vm_steps:,} VM steps) 초과"
+            return 1
+        if time.monotonic() > deadline:
+            budget['reason'] = f"실행 시간 한도({timeout_ms:,}ms) 초과"
+            return 1
+        return 0
+
     try:
-        with sqlite3.connect(DB_PATH) as conn:
-            df = pd.read_sql_query(sql_stripped, conn)
-            if df.empty:
+        with _readonly_connection() as conn:
+            conn.set_progress_handler(_guard, _PROGRESS_INTERVAL)
+            cte_names = frozenset(m.group(2) for m in _CTE_NAME_RE.finditer(sql_stripped))
+            if cte_names:
+                conn.set_authorizer(functools.partial(_chatbot_authorizer, cte_names=cte_names))
+            try:
+                cursor = conn.execute(limited_sql)
+                columns = [d[0] for d in cursor.description]
+                rows = cursor.fetchmany(max_rows + 1)
+                cursor.close()
+
+                truncated = len(rows) > max_rows
+                total_rows = None
+                if truncated and count_total:
+                    total_rows = conn.execute("SELECT COUNT(*) FROM (\n" + sql_stripped + "\n)").fetchone()[0]
+            finally:
+                conn.set_progress_handler(None, 0)
+                if cte_names:
+                    conn.set_authorizer(_chatbot_authorizer)
+
+            if not rows:
                 return "조회 결과가 없습니다."
 
-            suffix = ""
-            if len(df) > max_rows:
-                df = df.head(max_rows)
-                suffix = f"\n(전체 결과 중 상위 {max_rows}건만 표시)"
-
-            # 금액 컬럼 포맷팅
-            for col in df.columns:
-                if col in ('amount', 'total') and pd.api.types.is_numeric_dtype(df[col]):
-                    df[col] = df[col].apply(lambda x: f"{int(x):,}원" if pd.notna(x) else "")
-
-            return df.to_string(index=False) + suffix
+            df = pd.DataFrame.from_records(rows[:max_rows], columns=columns)
+            # 헤더 1회 TSV + (행이 많으면) 합계/상위 K 요약, 토큰 예산 적용
+            return encode_result(df, truncated=truncated, total_rows=total_rows)
     except Exception as e:
+        if budget['reason']:
+            return (
+                f"쿼리 중단: {budget['reason']}. "
+                "조인 조건·기간 조건을 추가하거나 GROUP BY 집계로 범위를 좁혀 다시 작성하세요."
+            )
+        if 'not authorized' in str(e) or 'prohibited' in str(e):
+            return "쿼리 중단: 허용되지 않은 테이블·함수·명령입니다. transactions, asset_snapshots, budgets 및 월별 요약 테이블 조회만 가능합니다."
         return f"쿼리 실행 오류: {str(e)}"
 
 
+def _month_offset(year_month: str, months: int) -> str:
+    """'YYYY-MM'에서 months개월 이동한 'YYYY-MM'을 반환합니다."""
+    year, month = int(year_month[:4]), int(year_month[5:7])
+    index = year * 12 + (month - 1) + months
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def _parse_period(period: str) -> tuple:
+    """
+    챗봇 도구의 기간 인자를 (시작 YYYY-MM, 종료 YYYY-MM)으로 변환합니다.
+    허용 형식: 'YYYY-MM', 'YYYY', 'YYYY-MM~YYYY-MM'. 형식이 틀리면 ValueError.
+    """
+    text = (period or '').strip()
+    if re.fullmatch(r'\d{4}-\d{2}', text):
+        return text, text
+    if re.fullmatch(r'\d{4}', text):
+        return f"{text}-01", f"{text}-12"
+    match = re.fullmatch(r'(\d{4}-\d{2})\s*~\s*(\d{4}-\d{2})', text)
+    if match:
+        return match.group(1), match.group(2)
+    raise ValueError(f"기간 형식이 올바르지 않습니다: '{period}' (YYYY-MM, YYYY, YYYY-MM~YYYY-MM 중 하나)")
+
+
+def _read_summary(query: str, params: tuple) -> pd.DataFrame:
+    """챗봇 도구용 조회. 읽기 전용 연결 풀을 사용하므로 동시에 호출해도 됩니다."""
+    if not os.path.exists(DB_PATH):
+        return pd.DataFrame()
+    with _readonly_connection() as conn:
+        return pd.read_sql_query(query, conn, params=params)
+
+
+def get_monthly_spend(category: str = None, owner: str = None, months: int = 6) -> pd.DataFrame:
+    """
+    최근 months개월(이번 달 포함)의 월별 지출 합계를 monthly_spend_summary에서 조회합니다.
+    category/owner가 없으면 전체 합계입니다.
+    Returns: DataFrame with [year_month, amount(양수), tx_count]
+    """
+    months = max(1, min(int(months), 120))
+    start_ym = _month_offset(pd.Timestamp.today().strftime('%Y-%m'), -(months - 1))
+    conditions, params = ["tx_type = '지출'", "year_month >= ?"], [start_ym]
+    if category:
+        conditions.append("category = ?")
+        params.append(category)
+    if owner:
+        conditions.append("owner = ?")
+        params.append(owner)
+    query = f"""
+        SELECT year_month, -SUM(amount) AS amount, SUM(tx_count) AS tx_count
+        FROM monthly_spend_summary
+        WHERE {' AND '.join(conditions)}
+        GROUP BY year_month
+        ORDER BY year_month
+    """
+    return _read_summary(query, tuple(params))
+
+
+def get_top_merchants(period: str, owner: str = None, limit: int = 10) -> pd.DataFrame:
+    """
+    기간 내 지출 금액 상위 가맹점(description)을 monthly_merchant_summary에서 조회합니다.
+    Returns: DataFrame with [description, category, amount(양수), tx_count]
+    """
+    start_ym, end_ym = _parse_period(period)
+    limit = max(1, min(int(limit), 50))
+    conditions, params = ["year_month >= ?", "year_month <= ?"], [start_ym, end_ym]
+    if owner:
+        conditions.append("owner = ?")
+        params.append(owner)
+    query = f"""
+        SELECT description, MAX(category) AS category,
+               -SUM(amount) AS amount, SUM(tx_count) AS tx_count
+        FROM monthly_merchant_summary
+        WHERE {' AND '.join(conditions)}
+        GROUP BY description
+        ORDER BY amount DESC
+        LIMIT ?
+    """
+    return _read_summary(query, tuple(params + [limit]))
+
+
+def get_budget_status(month: str = None) -> pd.DataFrame:
+    """
+    month(YYYY-MM, 기본 이번 달)의 카테고리별 예산 대비 지출을 조회합니다.
+    예산이 설정된 카테고리와 그 달 지출이 있는 카테고리를 모두 포함합니다.
+    Returns: DataFrame with [category, budget, spent, remaining, usage_pct]
+    """
+    month = (month or pd.Timestamp.today().strftime('%Y-%m')).strip()
+    if not re.fullmatch(r'\d{4}-\d{2}', month):
+        raise ValueError(f"월 형식이 올바르지 않습니다: '{month}' (YYYY-MM)")
+    query = """
+        WITH spent AS (
+            SELECT category, -SUM(amount) AS spent
+            FROM monthly_spend_summary
+            WHERE year_month = ? AND tx_type = '지출'
+            GROUP BY category
+        ),
+        cats AS (
+            SELECT category FROM budgets WHERE monthly_amount > 0
+            UNION
+            SELECT category FROM spent
+        )
+        SELECT
+            c.category,
+            COALESCE(b.monthly_amount, 0)                        AS budget,
+            COALESCE(s.spent, 0)                                 AS spent,
+            COALESCE(b.monthly_amount, 0) - COALESCE(s.spent, 0) AS remaining,
+            CASE WHEN COALESCE(b.monthly_amount, 0) > 0
+                 THEN ROUND(COALESCE(s.spent, 0) * 100.0 / b.monthly_amount, 1)
+            END                                                  AS usage_pct
+        FROM cats c
+        LEFT JOIN budgets b ON b.category = c.category
+        LEFT JOIN spent   s ON s.category = c.category
+        ORDER BY spent DESC
+    """
+    return _read_summary(query, (month,))
+
+
+def get_net_worth_history(owner: str = None, months: int = 12) -> pd.DataFrame:
+    """
+    최근 months개월의 스냅샷 날짜별 순자산 추이를 net_worth_history에서 조회합니다.
+    owner가 없으면 소유자별 행과 가구 합계('전체') 행을 모두 반환합니다.
+    Returns: DataFrame with [snapshot_date, owner, total_asset, total_debt, net_worth]
+    """
+    months = max(1, min(int(months), 120))
+    start_date = _month_offset(pd.Timestamp.today().strftime('%Y-%m'), -(months - 1)) + '-01'
+    conditions, params = ["snapshot_date >= ?"], [start_date]
+    if owner:
+        conditions.append("owner = ?")
+        params.append(owner)
+    query = f"""
+        SELECT snapshot_date, owner, total_asset, total_debt, net_worth
+        FROM net_worth_history
+        WHERE {' AND '.join(conditions)}
+        ORDER BY snapshot_date ASC, owner
+    """
+    return _read_summary(query, tuple(params))
+
+
+def get_cached_answer(question_key: str, date_bucket: str, data_version: int) -> dict | None:
+    """
+    챗봇 답변 캐시를 조회합니다. 적중 시 hits를 1 올리고
+    {'answer', 'sql', 'result'} 를 반환합니다. (sql/result는 JSON 문자열)
+    """
+    if not os.path.exists(DB_PATH):
+        return None
+    try:
+        with sqlite3.connect(DB_PATH) as conn:
+            row = conn.execute(
+                """SELECT answer, sql, result FROM chat_answer_cache
+                   WHERE question_key = ? AND date_bucket = ? AND data_version = ?""",
+                (question_key, date_bucket, data_version),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                """UPDATE chat_answer_cache SET hits = hits + 1
+                   WHERE question_key = ? AND date_bucket = ? AND data_version = ?""",
+                (question_key, date_bucket, data_version),
+            )
+            conn.commit()
+            return {'answer': row[0], 'sql': row[1], 'result': row[2]}
+    except sqlite3.OperationalError:
+        return None
+
+
+def save_cached_answer(
+    question_key: str, date_bucket: str, data_version: int,
+    question: str, sql: str, result: str, answer: str,
+):
+    """챗봇 답변을 캐시에 저장합니다. 지난 날짜의 캐시는 함께 정리됩니다."""
+    _init_db()
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.execute("DELETE FROM chat_answer_cache WHERE date_bucket < ?", (date_bucket,))
+        conn.execute(
+            """INSERT OR REPLACE INTO chat_answer_cache
+               (question_key, date_bucket, data_version, question, sql, result, answer)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (question_key, date_bucket, data_version, question, sql, result, answer),
+        )
+        conn.commit()
+
+
+def get_cached_sql(fingerprint: str, date_bucket: str) -> list | None:
+    """
+    질문 지문에 대해 저장된 SQL 목록을 반환합니다. 적중 시 hits를 1 올립니다.
+    날짜 리터럴이 없는 SQL(date_bucket='')을 우선 사용하고, 없으면 오늘 날짜 항목을 찾습니다.
+    """
+    if not os.path.exists(DB_PATH):
+        return None
+    try:
+        with sqlite3.connect(DB_PATH) as conn:
+            row = conn.execute(
+                """SELECT date_bucket, sql FROM chat_sql_cache
+                   WHERE fingerprint = ? AND date_bucket IN ('', ?)
+                   ORDER BY date_bucket ASC LIMIT 1""",
+                (fingerprint, date_bucket),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE chat_sql_cache SET hits = hits + 1 WHERE fingerprint = ? AND date_bucket = ?",
+                (fingerprint, row[0]),
+            )
+            conn.commit()
+            return json.loads(row[1])
+    except (sqlite3.OperationalError, ValueError):
+        return None
+
+
+def save_cached_sql(fingerprint: str, date_bucket: str, sqls: list):
+    """execute_query_safe로 검증된 SQL 목록을 질문 지문과 함께 저장합니다."""
+    _init_db()
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.execute(
+            "DELETE FROM chat_sql_cache WHERE date_bucket != '' AND date_bucket < ?", (date_bucket,)
+        )
+        conn.execute(
+            """INSERT OR REPLACE INTO chat_sql_cache (fingerprint, date_bucket, sql)
+               VALUES (?, ?, ?)""",
+            (fingerprint, date_bucket, json.dumps(sqls, ensure_ascii=False)),
+        )
+        conn.commit()
+
+
+def delete_cached_sql(fingerprint: str):
+    """재실행에 실패한 SQL 캐시 항목을 삭제합니다."""
+    if not os.path.exists(DB_PATH):
+        return
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.execute("DELETE FROM chat_sql_cache WHERE fingerprint = ?", (fingerprint,))
+        conn.commit()
+
+
+def log_llm_call(
+    call_type: str, model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int,
+    latency_ms: float, retries: int, outcome: str, error: str = None, cost_usd: float = 0.0,
+):
+    """
+    OpenAI 호출 1건을 llm_usage_log에 기록합니다.
+    기록 실패가 AI 기능을 막으면 안 되므로 DB 오류는 무시합니다.
+    """
+    if not os.path.exists(DB_PATH):
+        return
+    try:
+        with sqlite3.connect(DB_PATH, timeout=1.0) as conn:
+            conn.execute(
+                """INSERT INTO llm_usage_log
+                   (call_type, model, prompt_tokens, completion_tokens, cached_tokens,
+                    latency_ms, retries, outcome, error, cost_usd)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (call_type, model, prompt_tokens, completion_tokens, cached_tokens,
+                 round(latency_ms, 1), retries, outcome, error, cost_usd),
+            )
+            conn.commit()
+    except sqlite3.Error:
+        pass
+
+
+def get_llm_usage_summary(months: int = 3) -> pd.DataFrame:
+    """
+    최근 months개월의 LLM 호출을 월 × 기능(call_type)별로 집계합니다.
+    지연 시간 백분위는 SQLite에 함수가 없어 pandas로 계산합니다.
+    Returns: DataFrame with [month, call_type, calls, failures, retries, p50_ms, p95_ms,
+                             prompt_tokens, cached_tokens, completion_tokens, cost_usd]
+    """
+    columns = ['month', 'call_type', 'calls', 'failures', 'retries', 'p50_ms', 'p95_ms',
+               'prompt_tokens', 'cached_tokens', 'completion_tokens', 'cost_usd']
+    if not os.path.exists(DB_PATH):
+        return pd.DataFrame(columns=columns)
+    start = _month_offset(pd.Timestamp.today().strftime('%Y-%m'), -(max(int(months), 1) - 1)) + '-01'
+    with sqlite3.connect(DB_PATH) as conn:
+        df = pd.read_sql_query(
+            """SELECT substr(called_at, 1, 7) AS month, call_type, latency_ms, retries, outcome,
+                      prompt_tokens, cached_tokens, completion_tokens, cost_usd
+               FROM llm_usage_log WHERE called_at >= ?""",
+            conn, params=(start,),
+        )
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+
+    grouped = df.groupby(['month', 'call_type'])
+    summary = grouped.agg(
+        calls=('outcome', 'size'),
+        failures=('outcome', lambda s: int((s != 'ok').sum())),
+        retries=('retries', 'sum'),
+        prompt_tokens=('prompt_tokens', 'sum'),
+        cached_tokens=('cached_tokens', 'sum'),
+        completion_tokens=('completion_tokens', 'sum'),
+        cost_usd=('cost_usd', 'sum'),
+    )
+    # 지연 시간은 성공 호출 기준 (차단·실패 호출은 0ms/타임아웃 값이라 분포를 왜곡함)
+    ok = df[df['outcome'] == 'ok'].groupby(['month', 'call_type'])['latency_ms']
+    summary['p50_ms'] = ok.quantile(0.5)
+    summary['p95_ms'] = ok.quantile(0.95)
+    summary = summary.reset_index().sort_values(['month', 'cost_usd'], ascending=[False, False])
+    return summary[columns].reset_index(drop=True)
+
+
+def get_analysis_summary(metrics_hash: str = None) -> dict | None:
+    """
+    저장된 분석 요약을 조회합니다. metrics_hash가 없으면 가장 최근 요약을 반환합니다.
+    Returns: {'metrics_hash', 'summary', 'created_at'} 또는 None
+    """
+    if not os.path.exists(DB_PATH):
+        return None
+    try:
+        with sqlite3.connect(DB_PATH) as conn:
+            if metrics_hash is None:
+                row = conn.execute(
+                    """SELECT metrics_hash, summary, created_at FROM analysis_summaries
+                       ORDER BY created_at DESC LIMIT 1"""
+                ).fetchone()
+            else:
+                row = conn.execute(
+                    "SELECT metrics_hash, summary, created_at FROM analysis_summaries WHERE metrics_hash = ?",
+                    (metrics_hash,),
+                ).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    if row is None:
+        return None
+    return {'metrics_hash': row[0], 'summary': row[1], 'created_at': row[2]}
+
+
+def save_analysis_summary(metrics_hash: str, summary: str, metrics_json: str, keep: int = 30):
+    """분석 요약을 저장하고, 최근 keep개만 남깁니다."""
+    _init_db()
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.execute(
+            """INSERT OR REPLACE INTO analysis_summaries (metrics_hash, summary, metrics, created_at)
+               VALUES (?, ?, ?, datetime('now', 'localtime'))""",
+            (metrics_hash, summary, metrics_json),
+        )
+        conn.execute(
+            """DELETE FROM analysis_summaries WHERE metrics_hash NOT IN (
+                   SELECT metrics_hash FROM analysis_summaries ORDER BY created_at DESC LIMIT ?)""",
+            (keep,),
+        )
+        conn.commit()
+
+
+_JOB_COLUMNS = ['job_id', 'kind', 'label', 'status', 'progress', 'message', 'logs',
+                'error', 'created_at', 'started_at', 'finished_at']
+
+
+def create_job(job_id: str, kind: str, label: str):
+    """대기(queued) 상태의 작업 행을 만듭니다."""
+    _init_db()
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.execute(
+            "INSERT INTO jobs (job_id, kind, label, message) VALUES (?, ?, ?, '대기 중')",
+            (job_id, kind, label),
+        )
+        conn.commit()
+
+
+def update_job(job_id: str, **fields):
+    """
+    작업 행의 일부 컬럼을 갱신합니다. (status, progress, message, error, started_at, finished_at)
+    log=문자열 을 넘기면 logs 끝에 한 줄 추가하고, result=객체 를 넘기면 pickle로 저장합니다.
+    """
+    log_line = fields.pop('log', None)
+    if 'result' in fields:
+        fields['result'] = pickle.dumps(fields['result'])
+    assignments = [f"{col} = ?" for col in fields]
+    params = list(fields.values())
+    if log_line is not None:
+        assignments.append("logs = logs || ?")
+        params.append(f"[{pd.Timestamp.now():%H:%M:%S}] {log_line}\n")
+    if not assignments:
+        return
+    with sqlite3.connect(DB_PATH, timeout=5.0) as conn:
+        conn.execute(f"UPDATE jobs SET {', '.join(assignments)} WHERE job_id = ?", (*params, job_id))
+        conn.commit()
+
+
+def get_job(job_id: str) -> dict | None:
+    """작업 상태를 dict로 반환합니다. (결과는 get_job_result로 따로 조회)"""
+    if not os.path.exists(DB_PATH):
+        return None
+    with sqlite3.connect(DB_PATH) as conn:
+        row = conn.execute(
+            f"SELECT {', '.join(_JOB_COLUMNS)} FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+    return dict(zip(_JOB_COLUMNS, row)) if row else None
+
+
+def get_job_result(job_id: str):
+    """완료된 작업의 결과 객체를 반환합니다. 없으면 None."""
+    if not os.path.exists(DB_PATH):
+        return None
+    with sqlite3.connect(DB_PATH) as conn:
+        row = conn.execute("SELECT result FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return pickle.loads(row[0]) if row and row[0] is not None else None
+
+
+def list_jobs(limit: int = 20) -> pd.DataFrame:
+    """최근 작업 목록 (결과 제외)."""
+    if not os.path.exists(DB_PATH):
+        return pd.DataFrame(columns=_JOB_COLUMNS)
+    with sqlite3.connect(DB_PATH) as conn:
+        return pd.read_sql_query(
+            f"SELECT {', '.join(_JOB_COLUMNS)} FROM jobs ORDER BY created_at DESC, rowid DESC LIMIT ?",
+            conn, params=(limit,),
+        )
+
+
+def fail_orphaned_jobs() -> int:
+    """이전 프로세스에서 끝나지 못한 queued/running 작업을 실패로 표시합니다. (앱 재시작 시)"""
+    if not os.path.exists(DB_PATH):
+        return 0
+    try:
+        with sqlite3.connect(DB_PATH) as conn:
+            cursor = conn.execute(
+                """UPDATE jobs SET status = 'failed', error = '앱 재시작으로 중단되었습니다.',
+                          finished_at = datetime('now', 'localtime')
+                   WHERE status IN ('queued', 'running')"""
+            )
+            conn.commit()
+            return cursor.rowcount
+    except sqlite3.OperationalError:
+        return 0
@@ -0,0 +1,180 @@
+"""
+오프라인 LLM 대체 백엔드 (벤치마크·부하 측정용).
+
+환경변수 INASSET_LLM_BACKEND=fake 이면 llm_client.get_openai_client()가 OpenAI 대신
+FakeLLMClient를 돌려줍니다. client.chat.completions.create(**kwargs) 인터페이스와
+응답 모양(choices[0].message, usage, model)이 같으므로 ai_agent 코드는 그대로 동작하고,
+네트워크·API 키·비용 없이 적재·재분류·챗봇 경로의 처리량을 재현 가능하게 측정할 수 있습니다.
+
+응답 결정 순서:
+  1) 재생 파일 (INASSET_FAKE_LLM_REPLAY, JSON 리스트)
+       [{"match": "예산", "tool_calls": [{"name": "budget_status", "arguments": {}}],
+         "answer": "이번 달 예산 현황입니다."}, ...]
+     마지막 user 메시지에 match 문자열이 포함된 첫 항목을 사용합니다.
+  2) 규칙 기반
+       - 카테고리 매핑(JSON 응답 요청): category_1이 표준 카테고리면 그대로, 아니면 키워드 규칙 → 미분류
+       - 챗봇(tools 있음): 질문 키워드로 집계 도구 호출 → tool 결과를 받으면 첫 줄들로 답변
+       - 그 외(분석 요약 등): 고정 문장
+지연 시간은 INASSET_FAKE_LLM_LATENCY_MS(호출당 고정) + INASSET_FAKE_LLM_MS_PER_TOKEN(출력 토큰당)으로 흉내 냅니다.
+"""
+import json
+import os
+import re
+import time
+from types import SimpleNamespace
+
+from utils.token_utils import estimate_message_tokens, estimate_tokens
+
+FAKE_MODEL = "fake-gpt-4o"
+
+# description 키워드 → 표준 카테고리 (category_1이 표준 카테고리가 아닐 때만 사용)
+_KEYWORD_CATEGORIES = [
+    (('카페', '커피', '스타벅스', '편의점', 'GS25', 'CU', '마트', '배달', '식당'), '식비'),
+    (('택시', '카카오T', '지하철', '버스', '교통'), '교통비'),
+    (('주유', '주차', '세차', '하이패스'), '차량비'),
+    (('병원', '약국', '의원', '치과'), '의료비'),
+    (('관리비', '월세', '전기', '가스', '수도'), '주거비'),
+    (('보험',), '보험'),
+]
+
+_ITEM_RE = re.compile(r'^(\d+)\. description="(.*)", category_1="(.*)"$')
+
+
+def _message(content=None, tool_calls=None):
+    return SimpleNamespace(role="assistant", content=content, tool_calls=tool_calls)
+
+
+def _tool_call(index: int, name: str, arguments: dict):
+    return SimpleNamespace(
+        id=f"fake_call_{index}",
+        type="function",
+        function=SimpleNamespace(name=name, arguments=json.dumps(arguments, ensure_ascii=False)),
+    )
+
+
+def _content(message) -> str:
+    content = message.get('content') if isinstance(message, dict) else getattr(message, 'content', None)
+    return content or ""
+
+
+def _role(message) -> str:
+    return message.get('role') if isinstance(message, dict) else getattr(message, 'role', '')
+
+
+class _FakeCompletions:
+    def __init__(self, owner):
+        self._owner = owner
+
+    def create(self, model: str = FAKE_MODEL, messages: list = None, tools: list = None,
+               response_format: dict = None, **_kwargs):
+        messages = messages or []
+        message = self._owner._respond(messages, tools, response_format)
+        completion_text = _content(message) or json.dumps(
+            [tc.function.arguments for tc in (message.tool_calls or [])], ensure_ascii=False
+        )
+        completion_tokens = estimate_tokens(completion_text)
+        self._owner._sleep(completion_tokens)
+        return SimpleNamespace(
+            model=FAKE_MODEL,
+            choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")],
+            usage=SimpleNamespace(
+                prompt_tokens=estimate_message_tokens(messages),
+                completion_tokens=completion_tokens,
+                prompt_tokens_details=SimpleNamespace(cached_tokens=0),
+            ),
+        )
+
+
+class FakeLLMClient:
+    """OpenAI 클라이언트의 chat.completions.create만 흉내 내는 결정적 대체 클라이언트."""
+
+    def __init__(self, latency_ms: float = 0.0, ms_per_token: float = 0.0, replay: list = None):
+        self.latency_ms = latency_ms
+        self.ms_per_token = ms_per_token
+        self.replay = replay or []
+        self.chat = SimpleNamespace(completions=_FakeCompletions(self))
+
+    @classmethod
+    def from_env(cls) -> "FakeLLMClient":
+        replay = []
+        replay_path = os.getenv("INASSET_FAKE_LLM_REPLAY")
+        if replay_path and os.path.exists(replay_path):
+            with open(replay_path, encoding='utf-8') as f:
+                replay = json.load(f)
+        return cls(
+            latency_ms=float(os.getenv("INASSET_FAKE_LLM_LATENCY_MS", "0")),
+            ms_per_token=float(os.getenv("INASSET_FAKE_LLM_MS_PER_TOKEN", "0")),
+            replay=replay,
+        )
+
+    def _sleep(self, completion_tokens: int):
+        delay_ms = self.latency_ms + self.ms_per_token * completion_tokens
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+
+    # ── 응답 결정 ─────────────────────────────────────────
+    def _respond(self, messages: list, tools: list, response_format: dict):
+        last = messages[-1] if messages else {}
+        question = next((_content(m) for m in reversed(messages) if _role(m) == 'user'), "")
+
+        if response_format and response_format.get('type') == 'json_object':
+            return _message(content=self._map_categories(_content(last)))
+
+        if tools:
+            if _role(last) == 'tool':
+                return _message(content=self._answer_from_tools(messages, question))
+            entry = self._find_replay(question)
+            calls = entry['tool_calls'] if entry else self._choose_tools(question)
+            return _message(tool_calls=[_tool_call(i, c['name'], c.get('arguments', {})) for i, c in enumerate(calls)])
+
+        return _message(content="이번 달 지출은 평소 흐름과 비슷해요. 자세한 내용은 아래 차트를 확인해 주세요.")
+
+    def _find_replay(self, question: str) -> dict | None:
+        return next((e for e in self.replay if e.get('match', '') in question), None)
+
+    def _map_categories(self, prompt: str) -> str:
+        standard = []
+        match = re.search(r'## 표준 카테고리\n(.+)\n', prompt)
+        if match:
+            standard = [c.strip() for c in match.group(1).split(',')]
+        mappings = []
+        for line in prompt.splitlines():
+            item = _ITEM_RE.match(line.strip())
+            if not item:
+                continue
+            index, description, category_1 = int(item.group(1)), item.group(2), item.group(3)
+            refined = category_1 if category_1 in standard else next(
+                (cat for keywords, cat in _KEYWORD_CATEGORIES
+                 if cat in standard and any(k in description for k in keywords)),
+                '미분류',
+            )
+            mappings.append({"index": index, "refined_category_1": refined})
+        return json.dumps({"mappings": mappings}, ensure_ascii=False)
+
+    def _choose_tools(self, question: str) -> list:
+        from utils.ai_agent import STANDARD_CATEGORIES
+
+        month = time.strftime('%Y-%m')
+        if '예산' in question:
+            return [{"name": "budget_status", "arguments": {"month": month}}]
+        if '자산' in question:
+            return [{"name": "net_worth_history", "arguments": {"months": 12}}]
+        if any(k in question for k in ('가맹점', '어디', '높은 금액', '가장 큰')):
+            return [{"name": "top_merchants", "arguments": {"period": month, "limit": 10}}]
+        category = next((c for c in STANDARD_CATEGORIES if c in question), None)
+        arguments = {"months": 3 if '3개월' in question else 6}
+        if category:
+            arguments["category"] = category
+        return [{"name": "monthly_spend", "arguments": arguments}]
+
+    def _answer_from_tools(self, messages: list, question: str) -> str:
+        entry = self._find_replay(question)
+        if entry and entry.get('answer'):
+            return entry['answer']
+        results = []
+        for m in reversed(messages):
+            if _role(m) != 'tool':
+                break
+            results.insert(0, _content(m))
+        preview = "\n".join("\n".join(r.split('\n')[:3]) for r in results)
+        return f"[오프라인 응답] '{question}'에 대한 조회 결과입니다.\n{preview}"
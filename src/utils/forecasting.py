@@ -0,0 +1,226 @@
+"""
+자산 트렌드 예측 모델 (Streamlit 비의존).
+
+순자산 스냅샷 이력에 모델을 적합하고, data_version이 같으면 forecast_fits 테이블에 저장해 둔
+파라미터를 재사용합니다. 모든 모델은 기준일로부터의 일수(day offset) NumPy 배열로 한 번에 계산합니다.
+
+모델:
+  - linear  : 최근 2년 스냅샷의 선형 기울기(원/일). 시작점은 최신 순자산으로 고정
+  - damped  : 선형 기울기를 월 단위 감쇠 계수 phi로 점점 줄임 (최근 구간 홀드아웃으로 phi 선택)
+  - seasonal: 선형 기울기 + 월별 순저축(수입 - 지출)의 달력 월 편차 누적
+              (편차가 실제 순자산 변화에 반영되는 비율을 함께 적합)
+"""
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from utils.db_handler import get_data_version, get_forecast_fit, get_monthly_net_savings, save_forecast_fit
+
+MODELS = ('linear', 'damped', 'seasonal')
+MODEL_LABELS = {'linear': '선형 추세', 'damped': '감쇠 추세', 'seasonal': '계절성 (월별 저축)'}
+
+# 예측 구간 (개월)
+FORECAST_MONTHS = 24
+# 적합에 쓰는 최근 기간 (스냅샷이 3개 미만이면 전체 사용)
+FIT_WINDOW_DAYS = 730
+MIN_POINTS = 3
+# 백테스트: 마지막 HOLDOUT_DAYS 구간을 가리고 그 이전 데이터로 예측해 오차 측정
+HOLDOUT_DAYS = 182
+# 감쇠 계수 후보 (월 단위)
+DAMPING_GRID = np.array([0.80, 0.85, 0.90, 0.93, 0.95, 0.97, 0.98, 0.99])
+DAYS_PER_MONTH = 365.25 / 12
+
+
+def _to_days(dates) -> np.ndarray:
+    """날짜 배열 → datetime64[D] 배열."""
+    return np.asarray(pd.to_datetime(dates).values.astype('datetime64[D]'))
+
+
+def _window(days: np.ndarray, values: np.ndarray) -> tuple:
+    recent = days >= days[-1] - np.timedelta64(FIT_WINDOW_DAYS, 'D')
+    if recent.sum() < MIN_POINTS:
+        return days, values
+    return days[recent], values[recent]
+
+
+def _slope_per_day(days: np.ndarray, values: np.ndarray) -> float:
+    x = (days - days[0]).astype(float)
+    if len(x) < 2 or np.ptp(x) == 0:
+        return 0.0
+    return float(np.polyfit(x, values.astype(float), 1)[0])  # 기울기(원/일)만 사용, 절편 버림
+
+
+def _damped_growth(slope_per_day: float, phi, offsets_days: np.ndarray) -> np.ndarray:
+    """기울기 × Σ phi^i (i=1..h개월)의 연속형. 결과는 (len(phi), len(offsets)) 행렬."""
+    phi = np.atleast_1d(np.asarray(phi, dtype=float))[:, None]
+    months = offsets_days / DAYS_PER_MONTH
+    factor = np.where(phi >= 1.0, months, phi * (1 - phi ** months) / (1 - np.minimum(phi, 0.999999)))
+    return slope_per_day * DAYS_PER_MONTH * factor
+
+
+def _month_index(days: np.ndarray) -> np.ndarray:
+    """datetime64[D] → 연*12 + (월-1)."""
+    return days.astype('datetime64[M]').astype(int)
+
+
+def _seasonal_offsets(seasonal: np.ndarray, base_day: np.datetime64, target_days: np.ndarray) -> np.ndarray:
+    """기준월 다음 달부터 대상 월까지 지나는 달들의 계절 편차 누적합."""
+    steps = _month_index(target_days) - _month_index(np.array([base_day]))[0]
+    max_step = int(max(steps.max(initial=0), 0))
+    base_month = int(_month_index(np.array([base_day]))[0]) % 12
+    month_of_step = (base_month + np.arange(1, max_step + 1)) % 12
+    cumulative = np.concatenate([[0.0], np.cumsum(seasonal[month_of_step])])
+    return cumulative[np.clip(steps, 0, None)]
+
+
+def _savings_weight(days: np.ndarray, values: np.ndarray, slope_per_day: float, seasonal: np.ndarray) -> float:
+    """
+    저축 계절 편차가 실제 순자산 월 변화에 반영되는 비율(0~1).
+    월말 순자산 변화에서 선형 추세를 뺀 잔차를 계절 편차에 회귀합니다. (투자 평가손익 등으로 안 맞으면 0에 가까움)
+    """
+    months = _month_index(days)
+    month_end = np.r_[months[1:] != months[:-1], True]
+    if month_end.sum() < MIN_POINTS or not seasonal.any():
+        return 0.0
+    end_days, end_values, end_months = days[month_end], values[month_end], months[month_end]
+    residual = np.diff(end_values) - slope_per_day * np.diff(end_days).astype(float)
+    deviation = seasonal[end_months[1:] % 12]
+    denom = float(deviation @ deviation)
+    if denom == 0:
+        return 0.0
+    return round(float(np.clip(residual @ deviation / denom, 0.0, 1.0)), 3)
+
+
+# ── 모델별 적합 ─────────────────────────────────────────
+
+def fit_params(model: str, days: np.ndarray, values: np.ndarray, savings: pd.DataFrame = None) -> dict:
+    """
+    모델 파라미터를 적합합니다.
+
+    Args:
+        days   : 스냅샷 날짜 (datetime64[D], 오름차순)
+        values : 순자산
+        savings: [year_month, savings] — seasonal 모델에서만 사용
+    """
+    days, values = _window(days, values)
+    slope = _slope_per_day(days, values)
+    if model == 'linear':
+        return {'slope_per_day': slope}
+
+    if model == 'damped':
+        # 적합 구간 앞 2/3로 기울기를 구하고 뒤 1/3 예측 오차가 가장 작은 phi 선택
+        split = max(int(len(days) * 2 / 3), MIN_POINTS - 1)
+        phi = 0.95
+        if len(days) - split >= 2:
+            train_slope = _slope_per_day(days[:split], values[:split])
+            offsets = (days[split:] - days[split - 1]).astype(float)
+            preds = values[split - 1] + _damped_growth(train_slope, DAMPING_GRID, offsets)
+            errors = np.abs(preds - values[split:]).mean(axis=1)
+            phi = float(DAMPING_GRID[int(np.argmin(errors))])
+        return {'slope_per_day': slope, 'phi': phi}
+
+    if model == 'seasonal':
+        seasonal = np.zeros(12)
+        # 기준일 이전의 완료된 달만 사용 (진행 중인 달·백테스트 미래 구간 제외)
+        s = savings[savings['year_month'] < str(days[-1])[:7]].copy() if savings is not None else pd.DataFrame()
+        if not s.empty:
+            s['month'] = s['year_month'].str[5:7].astype(int)
+            by_month = s.groupby('month')['savings'].mean()
+            seasonal[by_month.index.to_numpy() - 1] = by_month.to_numpy() - s['savings'].mean()
+        weight = _savings_weight(days, values, slope, seasonal)
+        return {'slope_per_day': slope, 'savings_weight': weight, 'seasonal': (seasonal * weight).round().tolist()}
+
+    raise ValueError(f"알 수 없는 예측 모델입니다: {model}")
+
+
+def predict(model: str, params: dict, base_day: np.datetime64, base_value: float,
+            target_days: np.ndarray, origin_day: np.datetime64 = None) -> np.ndarray:
+    """
+    기준점(base_value)에서 target_days까지의 예측값. 경과 일수는 origin_day(기본: base_day)부터 셉니다.
+    """
+    origin_day = base_day if origin_day is None else origin_day
+    offsets = (target_days - origin_day).astype(float)
+    slope = params['slope_per_day']
+    if model == 'linear':
+        return base_value + slope * offsets
+    if model == 'damped':
+        return base_value + _damped_growth(slope, params['phi'], offsets)[0]
+    if model == 'seasonal':
+        seasonal = np.asarray(params['seasonal'], dtype=float)
+        return base_value + slope * offsets + _seasonal_offsets(seasonal, origin_day, target_days)
+    raise ValueError(f"알 수 없는 예측 모델입니다: {model}")
+
+
+def backtest_mape(model: str, days: np.ndarray, values: np.ndarray, savings: pd.DataFrame = None,
+                  holdout_days: int = HOLDOUT_DAYS) -> float | None:
+    """마지막 holdout_days 구간을 가리고 예측했을 때의 평균 절대 백분율 오차(%). 데이터 부족 시 None."""
+    cutoff = days[-1] - np.timedelta64(holdout_days, 'D')
+    train = days <= cutoff
+    test = ~train & (values != 0)
+    if train.sum() < MIN_POINTS or not test.any():
+        return None
+    params = fit_params(model, days[train], values[train], savings)
+    last = np.flatnonzero(train)[-1]
+    preds = predict(model, params, days[last], float(values[last]), days[test])
+    return float(np.mean(np.abs(preds - values[test]) / np.abs(values[test])) * 100)
+
+
+# ── 적합 결과 캐시 ───────────────────────────────────────
+
+@dataclass(frozen=True)
+class ForecastFit:
+    """적합된 예측 모델. path()로 예측 곡선을 만듭니다."""
+    model: str
+    params: dict = field(repr=False)
+    base_date: str
+    base_value: float
+    fit_ms: float
+    backtest_mape: float | None
+
+    def path(self, start: pd.Timestamp, months: int = FORECAST_MONTHS) -> tuple:
+        """start부터 months개월 앞까지 월 간격 (날짜 리스트, 정수 예측값 배열). 시작값은 최신 순자산."""
+        dates = [start + pd.DateOffset(months=i) for i in range(0, months + 1)]
+        values = predict(
+            self.model, self.params, np.datetime64(self.base_date, 'D'), self.base_value,
+            _to_days(dates), origin_day=_to_days([start])[0],
+        )
+        return dates, np.round(values).astype(int)
+
+
+def fit_forecast(model: str, history: pd.DataFrame, owner: str = '전체') -> ForecastFit:
+    """history([snapshot_date, net_worth])에 모델을 적합하고 백테스트 오차를 함께 계산합니다."""
+    history = history.sort_values('snapshot_date')
+    days = _to_days(history['snapshot_date'])
+    values = history['net_worth'].to_numpy(dtype=float)
+    savings = get_monthly_net_savings(owner) if model == 'seasonal' else None
+
+    started = time.perf_counter()
+    params = fit_params(model, days, values, savings)
+    fit_ms = (time.perf_counter() - started) * 1000
+    return ForecastFit(
+        model=model, params=params, base_date=str(days[-1]), base_value=float(values[-1]),
+        fit_ms=round(fit_ms, 3), backtest_mape=backtest_mape(model, days, values, savings),
+    )
+
+
+def get_forecast(owner: str, model: str, history: pd.DataFrame) -> ForecastFit | None:
+    """
+    저장된 적합 결과가 현재 data_version·최신 스냅샷 기준이면 그대로, 아니면 다시 적합해 저장합니다.
+    스냅샷이 MIN_POINTS개 미만이면 None.
+    """
+    if len(history) < MIN_POINTS:
+        return None
+    version = get_data_version()
+    base_date = str(_to_days([history['snapshot_date'].max()])[0])
+    stored = get_forecast_fit(owner, model)
+    if stored and stored['data_version'] == version and stored['base_date'] == base_date:
+        return ForecastFit(
+            model=model, params=stored['params'], base_date=stored['base_date'],
+            base_value=stored['base_value'], fit_ms=stored['fit_ms'], backtest_mape=stored['backtest_mape'],
+        )
+    fit = fit_forecast(model, history, owner)
+    save_forecast_fit(owner, model, version, fit.params, fit.base_date, fit.base_value,
+                      fit.fit_ms, fit.backtest_mape)
+    return fit
@@ -0,0 +1,87 @@
+"""
+프로세스 내 백그라운드 작업 실행기.
+
+GPT 카테고리 매핑·일괄 적재·재분류 저장처럼 오래 걸리는 관리 작업을 스레드 풀에서 실행하고,
+상태·진행률·로그·결과를 SQLite jobs 테이블에 기록합니다. 페이지는 작업 ID만 session_state에
+들고 있다가 폴링하므로, 작업 중에도 화면 조작(재실행)이 막히지 않고 여러 작업을 대기열에 쌓을 수 있습니다.
+브라우저 탭을 닫아도 작업은 서버 프로세스에서 계속되며, 결과는 작업 목록에서 다시 불러올 수 있습니다.
+
+작업 함수 규약:
+    def my_job(ctx: JobContext, *args) -> dict
+        ctx.progress(0.5, "GPT 분류 중")  # 진행률(0~1)과 현재 단계
+        ctx.log("파일 3개 파싱 완료")       # 로그 한 줄
+        return {...}                        # 결과 (pickle 가능 객체, DataFrame 포함 가능)
+"""
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from utils.db_handler import create_job, fail_orphaned_jobs, update_job
+
+# 동시에 실행할 작업 수 (나머지는 queued 상태로 대기)
+JOB_WORKERS = 2
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class JobContext:
+    """작업 함수에 전달되는 진행 상황 기록기."""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+
+    def progress(self, fraction: float, message: str = None):
+        fields = {'progress': max(0.0, min(float(fraction), 1.0))}
+        if message is not None:
+            fields['message'] = message
+        update_job(self.job_id, **fields)
+
+    def log(self, message: str):
+        update_job(self.job_id, log=message)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # 이전 프로세스가 남긴 미완료 작업 정리 (프로세스당 한 번)
+            fail_orphaned_jobs()
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="inasset-job")
+        return _executor
+
+
+def _now() -> str:
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _run(job_id: str, fn, args: tuple):
+    ctx = JobContext(job_id)
+    try:
+        # 상태 기록·결과 직렬화·저장 실패도 실패로 기록되도록 전부 try 안에서 처리
+        update_job(job_id, status='running', message='실행 중', started_at=_now())
+        result = fn(ctx, *args)
+        update_job(job_id, status='done', progress=1.0, message='완료', result=result, finished_at=_now())
+    except Exception as e:
+        update_job(
+            job_id, status='failed', error=str(e) or type(e).__name__, finished_at=_now(),
+            log=traceback.format_exc(limit=3).strip(),
+        )
+
+
+def submit_job(kind: str, label: str, fn, *args) -> str:
+    """
+    작업을 대기열에 넣고 작업 ID를 반환합니다.
+
+    Args:
+        kind : 작업 종류 (작업 목록 표시·필터용)
+        label: 화면 표시용 설명
+        fn   : fn(ctx: JobContext, *args) -> 결과
+    """
+    executor = _get_executor()  # 최초 호출 시 미완료 작업 정리가 새 작업보다 먼저 실행되도록
+    job_id = uuid.uuid4().hex[:12]
+    create_job(job_id, kind, label)
+    executor.submit(_run, job_id, fn, args)
+    return job_id
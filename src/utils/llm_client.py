@@ -0,0 +1,211 @@
+"""
+프로세스 공용 OpenAI 클라이언트와 호출 정책.
+
+Streamlit은 위젯 조작마다 페이지 스크립트를 다시 실행하므로, 페이지에서 OpenAI()를 만들면
+매번 새 HTTP 연결(TLS 핸드셰이크 포함)을 맺게 됩니다. 여기서는 keep-alive 연결 풀을 가진
+클라이언트 하나를 프로세스 전체에서 재사용하고, 모든 chat 호출에
+  - 호출 종류별 타임아웃
+  - 지터를 섞은 지수 백오프 재시도 (일시적 오류만)
+  - 연속 실패 시 일정 시간 호출을 막는 회로 차단기
+를 적용합니다. 회로가 열려 있으면 LLMUnavailableError를 즉시 던지므로 호출부는
+원본 카테고리 유지·요약 생략 등으로 바로 대체 동작을 하면 됩니다.
+
+INASSET_LLM_BACKEND=fake 이면 네트워크 없이 동작하는 utils.fake_llm.FakeLLMClient를 돌려줍니다.
+
+모든 호출은 결과와 관계없이 llm_usage_log 원장(db_handler.log_llm_call)에
+토큰·지연 시간·재시도 횟수·결과·추정 비용이 기록됩니다. (fake 백엔드 호출은 원장을 오염시키지 않도록 기록하지 않음)
+"""
+import os
+import random
+import threading
+import time
+
+import httpx
+from openai import (
+    OpenAI, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError,
+)
+
+# 호출 종류별 타임아웃 (초)
+CALL_TIMEOUTS = {
+    'chat': 30.0,      # 챗봇 답변 (tool 호출 루프의 GPT 1회)
+    'mapping': 60.0,   # 카테고리 일괄 매핑 (항목이 많으면 응답이 김)
+    'summary': 15.0,   # 분석 요약 카드 (없어도 페이지는 동작)
+}
+_DEFAULT_TIMEOUT = 30.0
+_CONNECT_TIMEOUT = 5.0
+
+# 재시도: 일시적 오류(타임아웃·연결·429·5xx)만, 최대 횟수와 백오프 상한
+MAX_RETRIES = 2
+_BACKOFF_BASE_SEC = 0.5
+_BACKOFF_CAP_SEC = 4.0
+
+# 회로 차단기: 연속 실패 N회 → COOLDOWN초 동안 호출 차단, 이후 1회 시험 호출
+_BREAKER_FAILURE_THRESHOLD = 3
+_BREAKER_COOLDOWN_SEC = 60.0
+
+# 모델별 가격 (USD / 1M 토큰): (입력, 캐시된 입력, 출력)
+MODEL_PRICES = {
+    'gpt-4o': (2.50, 1.25, 10.00),
+    'gpt-4o-mini': (0.15, 0.075, 0.60),
+}
+KRW_RATE = 1_350  # 1 USD = 1,350 KRW
+
+_RETRYABLE_ERRORS = (APITimeoutError, APIConnectionError, RateLimitError, InternalServerError)
+
+# LLM 백엔드 선택: openai(기본) / fake(오프라인 대체, 벤치마크용)
+LLM_BACKEND_ENV = "INASSET_LLM_BACKEND"
+
+_client = None
+_client_key = None
+_client_lock = threading.Lock()
+
+_breaker = {'failures': 0, 'opened_at': None}
+_breaker_lock = threading.Lock()
+
+
+class LLMUnavailableError(RuntimeError):
+    """회로 차단기가 열려 OpenAI 호출을 시도하지 않았을 때 발생합니다."""
+
+
+def _is_fake_backend() -> bool:
+    return os.getenv(LLM_BACKEND_ENV, "openai").lower() == "fake"
+
+
+def get_openai_client() -> OpenAI | None:
+    """
+    keep-alive 연결 풀을 공유하는 OpenAI 클라이언트를 반환합니다. (프로세스당 1개)
+    OPENAI_API_KEY가 없으면 None을 반환합니다. 키가 바뀌면 새로 만듭니다.
+    SDK 자체 재시도는 끄고(max_retries=0) chat_completion()의 정책을 사용합니다.
+    INASSET_LLM_BACKEND=fake 이면 API 키 없이 FakeLLMClient를 반환합니다.
+    """
+    global _client, _client_key
+    if _is_fake_backend():
+        from utils.fake_llm import FakeLLMClient
+        with _client_lock:
+            if _client_key != "fake":
+                _client = FakeLLMClient.from_env()
+                _client_key = "fake"
+            return _client
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        return None
+    with _client_lock:
+        if _client is None or _client_key != api_key:
+            http_client = httpx.Client(
+                timeout=httpx.Timeout(_DEFAULT_TIMEOUT, connect=_CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=120),
+            )
+            _client = OpenAI(api_key=api_key, http_client=http_client, max_retries=0)
+            _client_key = api_key
+        return _client
+
+
+def breaker_state() -> dict:
+    """회로 차단기 상태 {'open': bool, 'failures': 연속 실패 수, 'retry_in': 재시도까지 남은 초}."""
+    with _breaker_lock:
+        opened_at = _breaker['opened_at']
+        remaining = 0.0
+        if opened_at is not None:
+            remaining = max(_BREAKER_COOLDOWN_SEC - (time.monotonic() - opened_at), 0.0)
+        return {'open': remaining > 0, 'failures': _breaker['failures'], 'retry_in': round(remaining, 1)}
+
+
+def _check_breaker():
+    with _breaker_lock:
+        opened_at = _breaker['opened_at']
+        if opened_at is not None and time.monotonic() - opened_at < _BREAKER_COOLDOWN_SEC:
+            raise LLMUnavailableError("AI 서버 연결이 잠시 차단되었습니다. 잠시 후 다시 시도해주세요.")
+
+
+def _record_success():
+    with _breaker_lock:
+        _breaker['failures'] = 0
+        _breaker['opened_at'] = None
+
+
+def _record_failure():
+    with _breaker_lock:
+        _breaker['failures'] += 1
+        if _breaker['failures'] >= _BREAKER_FAILURE_THRESHOLD:
+            _breaker['opened_at'] = time.monotonic()
+
+
+def _backoff_delay(attempt: int) -> float:
+    """지수 백오프 × 지터 (attempt=0부터). 여러 요청이 같은 순간에 재시도하지 않도록 분산합니다."""
+    return min(_BACKOFF_CAP_SEC, _BACKOFF_BASE_SEC * (2 ** attempt)) * random.uniform(0.5, 1.5)
+
+
+def estimate_cost_usd(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    """
+    토큰 수로 추정 비용(USD)을 계산합니다. 응답 모델명(gpt-4o-2024-08-06 등)은 접두어로 매칭하고,
+    가격표에 없는 모델(오프라인 대체 백엔드 등)은 0으로 봅니다.
+    """
+    prices = next(
+        (p for name, p in sorted(MODEL_PRICES.items(), key=lambda kv: -len(kv[0])) if (model or '').startswith(name)),
+        (0.0, 0.0, 0.0),
+    )
+    input_price, cached_price, output_price = prices
+    return (
+        (prompt_tokens - cached_tokens) * input_price
+        + cached_tokens * cached_price
+        + completion_tokens * output_price
+    ) / 1_000_000
+
+
+def _log_call(call_type: str, model: str, response, started: float, retries: int, outcome: str, error: str = None):
+    from utils.db_handler import log_llm_call
+
+    if _is_fake_backend():
+        return  # 오프라인 대체 호출은 실제 비용·지연 원장에 남기지 않음
+    usage = getattr(response, 'usage', None)
+    prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+    completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+    details = getattr(usage, 'prompt_tokens_details', None)
+    cached_tokens = getattr(details, 'cached_tokens', 0) or 0
+    model = getattr(response, 'model', None) or model
+    log_llm_call(
+        call_type, model, prompt_tokens, completion_tokens, cached_tokens,
+        (time.perf_counter() - started) * 1000, retries, outcome, error,
+        estimate_cost_usd(model, prompt_tokens, completion_tokens, cached_tokens),
+    )
+
+
+def chat_completion(client: OpenAI, call_type: str, **kwargs):
+    """
+    client.chat.completions.create를 호출 정책(타임아웃·재시도·회로 차단)과 함께 실행합니다.
+
+    Args:
+        client   : get_openai_client() 클라이언트 (또는 같은 인터페이스의 대체 클라이언트)
+        call_type: CALL_TIMEOUTS 키 ('chat', 'mapping', 'summary')
+        **kwargs : chat.completions.create 인자 (model, messages, tools 등)
+
+    Raises:
+        LLMUnavailableError: 회로 차단 중
+        openai 예외        : 재시도 후에도 실패했거나 재시도 대상이 아닌 오류
+    """
+    started = time.perf_counter()
+    model = kwargs.get('model', '')
+    try:
+        _check_breaker()
+    except LLMUnavailableError as e:
+        _log_call(call_type, model, None, started, 0, 'circuit_open', str(e))
+        raise
+
+    kwargs.setdefault('timeout', CALL_TIMEOUTS.get(call_type, _DEFAULT_TIMEOUT))
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            response = client.chat.completions.create(**kwargs)
+        except _RETRYABLE_ERRORS as e:
+            if attempt == MAX_RETRIES:
+                _record_failure()
+                _log_call(call_type, model, None, started, attempt, 'error', f"{type(e).__name__}: {e}")
+                raise
+            time.sleep(_backoff_delay(attempt))
+            continue
+        except Exception as e:
+            _log_call(call_type, model, None, started, attempt, 'error', f"{type(e).__name__}: {e}")
+            raise
+        _record_success()
+        _log_call(call_type, model, response, started, attempt, 'ok')
+        return response
@@ -0,0 +1,133 @@
+"""
+챗봇 tool 결과(SQL 조회 결과) 인코더.
+
+df.to_string()은 열 정렬용 공백과 "1,234원" 형식 문자열 때문에 토큰을 많이 씁니다.
+여기서는 헤더를 한 번만 쓰는 TSV로 원본 숫자를 그대로 보내고,
+행이 많으면 합계·상위 K개·건수 요약으로 바꾸며, 최종 결과를 토큰 예산 안으로 자릅니다.
+"""
+import pandas as pd
+
+from utils.token_utils import estimate_tokens
+
+# tool 결과 1건당 토큰 예산
+RESULT_TOKEN_BUDGET = 1500
+
+# 이 행 수를 넘으면 원본 행 대신 요약(합계/상위 K/건수)으로 보냄
+SUMMARY_ROW_THRESHOLD = 40
+
+# 요약 시 보여줄 상위 행·범주 개수
+SUMMARY_TOP_K = 10
+
+# 잘린 결과에 붙이는 안내 — 부분 합계를 전체 답으로 쓰지 않도록 집계 쿼리로 유도
+TRUNCATED_HINT = "※ 조회 제한으로 잘린 결과입니다. 합계·건수가 필요하면 SUM/COUNT·GROUP BY 집계 쿼리로 다시 조회하세요."
+
+# 금액으로 간주해 요약 정렬 기준으로 우선 사용할 컬럼명
+_AMOUNT_COLUMNS = ('amount', 'total', 'total_amount', 'sum', 'net_worth')
+
+
+def _format_value(value) -> str:
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ""
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else f"{value:.2f}"
+    return str(value).replace('\t', ' ').replace('\n', ' ')
+
+
+def _to_tsv(df: pd.DataFrame) -> list:
+    """헤더 1줄 + 데이터 행들을 TSV 문자열 리스트로 반환합니다."""
+    lines = ['\t'.join(str(c) for c in df.columns)]
+    for row in df.itertuples(index=False, name=None):
+        lines.append('\t'.join(_format_value(v) for v in row))
+    return lines
+
+
+def _main_numeric_column(df: pd.DataFrame) -> str | None:
+    numeric = [c for c in df.columns if pd.api.types.is_numeric_dtype(df[c])]
+    for name in _AMOUNT_COLUMNS:
+        if name in numeric:
+            return name
+    return numeric[-1] if numeric else None
+
+
+def _summarize(df: pd.DataFrame, top_k: int, partial: bool = False) -> list:
+    """
+    행이 많은 결과를 숫자 요약 + 범주별 건수 + 상위 K행으로 줄입니다.
+    partial=True(조회 제한으로 잘림)면 합계는 빼고, 나머지 통계는 조회된 행 기준임을 표시합니다.
+    """
+    lines = []
+    scope = f"(조회된 {len(df)}행 기준)" if partial else ""
+    numeric_cols = [c for c in df.columns if pd.api.types.is_numeric_dtype(df[c])]
+    main = _main_numeric_column(df)
+    for col in numeric_cols:
+        s = df[col].dropna()
+        if s.empty:
+            continue
+        total = "" if partial else f"sum={_format_value(float(s.sum()))} "
+        lines.append(
+            f"{col}{scope}: {total}min={_format_value(float(s.min()))} "
+            f"max={_format_value(float(s.max()))} mean={_format_value(round(float(s.mean()), 2))}"
+        )
+
+    for col in df.columns:
+        if col in numeric_cols:
+            continue
+        counts = df[col].value_counts()
+        if len(counts) <= 1 or len(counts) >= len(df):
+            continue  # 상수 컬럼이나 고유값 컬럼(내용 등)은 건수 요약 의미 없음
+        if main is not None and not partial:
+            sums = df.groupby(col)[main].sum().reindex(counts.index)
+            parts = [f"{k}={n}건/{_format_value(float(sums[k]))}" for k, n in counts.head(top_k).items()]
+        else:
+            parts = [f"{k}={n}" for k, n in counts.head(top_k).items()]
+        extra = f" 외 {len(counts) - top_k}개" if len(counts) > top_k else ""
+        lines.append(f"{col} 건수{scope}: " + ", ".join(parts) + extra)
+
+    top = df.reindex(df[main].abs().sort_values(ascending=False).index) if main else df
+    lines.append(f"[상위 {min(top_k, len(df))}행" + (f" — |{main}| 기준]" if main else "]"))
+    lines.extend(_to_tsv(top.head(top_k)))
+    return lines
+
+
+def encode_result(
+    df: pd.DataFrame,
+    truncated: bool = False,
+    total_rows: int | None = None,
+    token_budget: int = RESULT_TOKEN_BUDGET,
+    summary_threshold: int = SUMMARY_ROW_THRESHOLD,
+    top_k: int = SUMMARY_TOP_K,
+) -> str:
+    """
+    SQL 결과 DataFrame을 GPT에 보낼 압축 문자열로 변환합니다.
+
+    Args:
+        df               : 조회 결과
+        truncated        : 조회 단계에서 행 수 제한으로 잘렸는지 여부
+        total_rows       : 잘린 경우 전체 행 수 (계산하지 않았으면 None)
+        token_budget     : 결과 문자열의 최대 토큰 수
+        summary_threshold: 이 행 수를 넘으면 요약 형식 사용
+        top_k            : 요약 시 상위 행·범주 개수
+
+    Returns:
+        str: 헤더 1줄 + TSV 행, 또는 요약. 예산 초과 시 뒤쪽 행을 생략하고 안내를 붙입니다.
+    """
+    if truncated and total_rows is not None:
+        row_note = f"{len(df)}행 (전체 {total_rows:,}행 중 조회 제한으로 잘림)"
+    else:
+        row_note = f"{len(df)}행" + (" 이상 (조회 제한으로 잘림)" if truncated else "")
+    if len(df) > summary_threshold:
+        head = f"[요약] {row_note}"
+        body = _summarize(df, top_k, partial=truncated)
+    else:
+        head = f"[결과] {row_note}"
+        body = _to_tsv(df)
+    if truncated:
+        head += "\n" + TRUNCATED_HINT
+
+    lines = [head] + body
+    text = '\n'.join(lines)
+    dropped = 0
+    while estimate_tokens(text) > token_budget and len(lines) > 2:
+        lines.pop()
+        dropped += 1
+        text = '\n'.join(lines) + f"\n(토큰 예산으로 {dropped}행 생략)"
+    return text
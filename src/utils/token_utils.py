@@ -0,0 +1,35 @@
+"""
+프롬프트 토큰 수 추정 유틸리티.
+
+tiktoken이 설치되어 있으면 실제 토크나이저(o200k_base, gpt-4o 계열)로 계산하고,
+없으면 문자 종류별 근사치로 계산합니다.
+  - ASCII 문자: 약 4자당 1토큰
+  - 한글 등 비 ASCII 문자: 약 1자당 1토큰
+"""
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("o200k_base")
+except Exception:  # 미설치 또는 인코딩 파일 다운로드 불가
+    _ENCODING = None
+
+# 메시지 1개당 role/구분자 오버헤드 (OpenAI chat 포맷 기준 근사치)
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """문자열의 토큰 수를 추정합니다."""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def estimate_message_tokens(messages: list) -> int:
+    """chat 메시지(dict) 목록의 토큰 수를 추정합니다. content가 없는 메시지는 오버헤드만 셉니다."""
+    total = 0
+    for m in messages:
+        content = m.get('content') if isinstance(m, dict) else getattr(m, 'content', None)
+        total += _MESSAGE_OVERHEAD_TOKENS + estimate_tokens(content or "")
+    return total